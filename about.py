@@ -24,22 +24,21 @@ components inventory
 from __future__ import print_function
 from __future__ import with_statement
 
+import bisect
 import codecs
 import csv
 import errno
 import fnmatch
 import getopt
-import httplib
+import os
 import posixpath
-import socket
+import re
 import string
 import sys
-import urlparse
-from collections import namedtuple
-from datetime import datetime
-from email.parser import HeaderParser
+import time
+from contextlib import contextmanager
 from os import listdir, walk
-from os.path import exists, dirname, join, abspath, isdir, basename, normpath, relpath
+from os.path import exists, dirname, join, abspath, isdir, isfile, basename, normpath, relpath
 from StringIO import StringIO
 
 
@@ -48,8 +47,50 @@ __version__ = '0.9.0'
 # see http://dejacode.org
 __about_spec_version__ = '0.8.0'
 
-Warn = namedtuple('Warn', 'code field_name field_value message',)
-Error = namedtuple('Error', 'code field_name field_value message',)
+class Problem(object):
+    """
+    A problem found in an ABOUT file. The message is a template formatted
+    with the optional args when accessed, so that the messages of the many
+    problems sharing a template are only formatted for reporting. Field
+    names and message templates are interned.
+    """
+    __slots__ = ('code', 'field_name', 'field_value', 'template', 'args')
+
+    def __init__(self, code, field_name, field_value, message, *args):
+        self.code = code
+        if isinstance(field_name, str):
+            field_name = intern(field_name)
+        self.field_name = field_name
+        self.field_value = field_value
+        self.template = intern(message)
+        self.args = args
+
+    @property
+    def message(self):
+        if self.args:
+            return self.template % self.args
+        return self.template
+
+    def _key(self):
+        return (self.__class__, self.code, self.field_name, self.field_value,
+                self.message)
+
+    def __eq__(self, other):
+        return isinstance(other, Problem) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+class Warn(Problem):
+    __slots__ = ()
+
+
+class Error(Problem):
+    __slots__ = ()
 
 
 def repr_problem(obj):
@@ -64,6 +105,31 @@ def repr_problem(obj):
 Error.__repr__ = repr_problem
 Warn.__repr__ = repr_problem
 
+
+def summarize_problems(about_objects):
+    """
+    Return a list of (count, kind, code, field name) tuples counting the
+    warnings and errors of about_objects by code and field name, the most
+    frequent first.
+    """
+    counts = {}
+    for about_object in about_objects:
+        for kind, problems in (('error', about_object.errors),
+                               ('warning', about_object.warnings)):
+            for problem in problems:
+                key = kind, problem.code, problem.field_name
+                counts[key] = counts.get(key, 0) + 1
+    return sorted(((count,) + key for key, count in counts.items()),
+                  key=lambda item: (-item[0], item[1:]))
+
+
+def print_problems_summary(summary):
+    """
+    Print a summary list as returned by summarize_problems.
+    """
+    for count, kind, code, field_name in summary:
+        print('%8d %-8s %-32s %s' % (count, kind, code, field_name or ''))
+
 IGNORED = 'field or line ignored problem'
 VALUE = 'missing or empty value problem'
 FILE = 'file problem'
@@ -72,17 +138,35 @@ VCS = 'Version control problem'
 DATE = 'Date problem'
 ASCII = 'ASCII problem'
 SPDX = 'SPDX license problem'
+CHECKSUM = 'Checksum problem'
 UNKNOWN = 'Unknown problem'
 
+# characters supported in field names and ABOUT file names, from spec 0.8.0
+FIELD_NAME_CHARS = string.digits + string.ascii_letters + '_'
+FILE_NAME_CHARS = FIELD_NAME_CHARS + '-.'
+
+# matches the whole content of a well formed ABOUT file: only empty lines
+# and field lines with a valid field name, each optionally followed by
+# continuation lines. Such a file has no line-level problem and the detailed
+# per-line checks of pre_process are skipped.
+WELL_FORMED_ABOUT = re.compile(r'\A(?:\n|[0-9A-Za-z_]+:[^\n]*(?:\n|\Z)'
+                               r'(?: [^\n]*(?:\n|\Z))*)*\Z')
+
+EMPTY_LINES = re.compile(r'^\n+', re.MULTILINE)
+
 
 class AboutFile(object):
     """
     Represent an ABOUT file and functions to parse and validate a file.
     """
-    def __init__(self, location=None):
+    def __init__(self, location=None, archive=None):
         self.about_resource_path = None
         self.location = location
 
+        # ArchiveIndex used to resolve and read locations when this ABOUT file
+        # is an archive member, None for files on the file system
+        self.archive = archive
+
         self.parsed = None
         self.parsed_fields = None
         self.validated_fields = {}
@@ -97,29 +181,62 @@ class AboutFile(object):
         if self.location:
             self.parse()
 
-    def parse(self):
+    @classmethod
+    def from_stream(cls, file_in, location, archive=None):
+        """
+        Return an AboutFile parsed and validated from a file-like object.
+        The location is used to report problems and to resolve the files
+        referenced by the ABOUT data, either on the file system or against
+        the members of an archive ArchiveIndex.
+        """
+        about_file = cls(archive=archive)
+        about_file.location = location
+        about_file.parse(file_in)
+        return about_file
+
+    @classmethod
+    def from_string(cls, content, location, archive=None):
+        """
+        Return an AboutFile parsed and validated from a string of ABOUT data.
+        See from_stream for the location and archive arguments.
+        """
+        # normalize line endings as the "rU" mode would do for a file
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return cls.from_stream(StringIO(content), location, archive)
+
+    def parse(self, file_in=None):
         """
         Parse and validates a file-like object in an ABOUT structure.
+        The file at location is read if no file_in is provided.
         """
         try:
-            with open(self.location, "rU") as file_in:
-                #FIXME: we should open the file only once, it is always small enough to be kept in memory
-                no_blank_lines, pre_proc_warnings = self.pre_process(file_in)
-                self.warnings.extend(pre_proc_warnings)
-                # HeaderParser.parse returns the parsed file as keys and
-                # values (allows for multiple keys, and it doesn't validate)
-                self.parsed = HeaderParser().parse(no_blank_lines)
+            if file_in is None:
+                with open(self.location, "rU") as file_in:
+                    self.parse_headers(file_in)
+            else:
+                self.parse_headers(file_in)
         except IOError as e:
-            err_msg = 'Cannot read ABOUT file:' + repr(e)
-            self.errors.append(Error(FILE, None, self.location, err_msg))
+            self.errors.append(Error(FILE, None, self.location,
+                                     'Cannot read ABOUT file:%s', repr(e)))
         except Exception as e:
-            err_msg = 'Unknown ABOUT processing error:' + repr(e)
-            self.errors.append(Error(UNKNOWN, None, self.location, err_msg))
+            self.errors.append(Error(UNKNOWN, None, self.location,
+                                     'Unknown ABOUT processing error:%s', repr(e)))
 
         if self.parsed:
             self.warnings.extend(self.normalize())
             self.validate()
 
+    def parse_headers(self, file_in):
+        """
+        Pre-process and parse the ABOUT data read from file_in.
+        """
+        from email.parser import HeaderParser
+        no_blank_lines, pre_proc_warnings = self.pre_process(file_in)
+        self.warnings.extend(pre_proc_warnings)
+        # HeaderParser.parse returns the parsed file as keys and
+        # values (allows for multiple keys, and it doesn't validate)
+        self.parsed = HeaderParser().parse(no_blank_lines)
+
     def pre_process(self, file_in):
         """
         Pre-process an ABOUT file before using the email header parser.
@@ -132,16 +249,20 @@ class AboutFile(object):
         not be otherwise parsed.
         """
         #TODO: add line endings normalization to LF
-        about_string = ''
+        content = file_in.read()
+        if WELL_FORMED_ABOUT.match(content):
+            return StringIO(EMPTY_LINES.sub('', content)), []
+
+        about_lines = []
         warnings = []
         last_line_is_field_or_continuation = False
 
-        for line in file_in.readlines():
+        for line in StringIO(content).readlines():
             # continuation line
             if line.startswith(' '):
                 warn = self.check_line_continuation(line, last_line_is_field_or_continuation)
                 if last_line_is_field_or_continuation:
-                    about_string += line
+                    about_lines.append(line)
                 if warn:
                     warnings.append(warn)
                 continue
@@ -179,10 +300,10 @@ class AboutFile(object):
 
             # finally add valid field lines
             last_line_is_field_or_continuation = True
-            about_string += line
+            about_lines.append(line)
 
         # TODO: we should either yield and not return a stringIO or return a string
-        return StringIO(about_string), warnings
+        return StringIO(''.join(about_lines)), warnings
 
     @staticmethod
     def check_line_continuation(line, continuation):
@@ -220,12 +341,11 @@ class AboutFile(object):
             <li> uppercase and lowercase letters from A to Z</li>
             <li> the _ underscore sign. </li>
         """
-        supported = string.digits + string.ascii_letters + '_'
         warnings = ""
-        invalid_chars = [char for char in field_name if char not in supported]
+        invalid_chars = [char for char in field_name if char not in FIELD_NAME_CHARS]
         if invalid_chars:
-            msg = "Field name contains invalid characters: '%s': line ignored." % ''.join(invalid_chars)
-            warnings = Warn(IGNORED, field_name, line, msg)
+            msg = "Field name contains invalid characters: '%s': line ignored."
+            warnings = Warn(IGNORED, field_name, line, msg, ''.join(invalid_chars))
         return invalid_chars, warnings
 
     def normalize(self):
@@ -292,7 +412,28 @@ class AboutFile(object):
         Return True if path exists.
         """
         if file_path:
-            return exists(self._location(file_path))
+            location = self._location(file_path)
+            if self.archive:
+                return self.archive.exists(location)
+            return exists(location)
+
+    def _listdir(self, location):
+        """
+        Return the names of the files and directories in the directory at
+        location.
+        """
+        if self.archive:
+            return self.archive.listdir(location)
+        return listdir(location)
+
+    def _read(self, location):
+        """
+        Return the content of the file at location.
+        """
+        if self.archive:
+            return self.archive.read(location)
+        with open(location, 'rU') as f:
+            return f.read()
 
     def _location(self, file_path):
         """
@@ -345,12 +486,15 @@ class AboutFile(object):
         self._save_location(field_name, file_path)
 
         try:
-            with codecs.open(self._location(file_path), 'r', 'utf8', errors='replace') as f:
-                # attempt to read the file to catch codec errors
-                f.readlines()
+            if self.archive:
+                self.archive.read(self._location(file_path)).decode('utf8', 'replace')
+            else:
+                with codecs.open(self._location(file_path), 'r', 'utf8', errors='replace') as f:
+                    # attempt to read the file to catch codec errors
+                    f.readlines()
         except Exception as e:
             self.errors.append(Error(FILE, field_name, file_path,
-                                     'Cannot read file: %s' % repr(e)))
+                                     'Cannot read file: %s', repr(e)))
             return
 
     def validate_mandatory_fields_are_present(self):
@@ -374,24 +518,19 @@ class AboutFile(object):
         if not field_name == 'license_spdx':
             return
 
-        spdx_ids = field_value.split()
-        for sid in spdx_ids:
-            # valid sid, matching the case
-            if sid in SPDX_LICENSE_IDS.values():
-                continue
-
+        license_ids = get_spdx_license_ids()
+        for sid in spdx_license_ids(field_value):
             sidl = sid.lower()
 
-            # conjunctions
-            if sidl in ['or', 'and']:
+            # valid sid, matching the case
+            if license_ids.get(sidl) == sid:
                 continue
 
             # lowercase check
             try:
-                standard_id = SPDX_LICENSE_IDS[sidl]
-                msg = "Non standard SPDX license id case. Should be '%s'." % (
-                    standard_id)
-                self.warnings.append(Warn(SPDX, field_name, sid, msg))
+                standard_id = license_ids[sidl]
+                msg = "Non standard SPDX license id case. Should be '%s'."
+                self.warnings.append(Warn(SPDX, field_name, sid, msg, standard_id))
             except KeyError:
                 self.errors.append(Error(SPDX, field_name, sid,
                                          'Invalid SPDX license id.'))
@@ -426,8 +565,8 @@ class AboutFile(object):
         try:
             str.decode('ascii')
         except (UnicodeEncodeError, UnicodeDecodeError):
-            msg = '%s is not valid US-ASCII.' % str
-            self.errors.append(Error(ASCII, str, None, msg))
+            msg = '%s is not valid US-ASCII.'
+            self.errors.append(Error(ASCII, str, None, msg, str))
             return False
         return True
 
@@ -442,6 +581,7 @@ class AboutFile(object):
         if not date_strings:
             return
 
+        from datetime import datetime
         supported_dateformat = '%Y-%m-%d'
         try:
             return bool(datetime.strptime(date_strings, supported_dateformat))
@@ -455,6 +595,7 @@ class AboutFile(object):
         Return True if a URL is valid. Optionally check that this is a live URL
         (using a HEAD request without downloading the whole file).
         """
+        import urlparse
         scheme, netloc, path, _p, _q, _frg = urlparse.urlparse(url)
 
         url_has_valid_format = scheme in ('http', 'https', 'ftp') and netloc
@@ -475,6 +616,8 @@ class AboutFile(object):
         """
         Return True if an HTTP connection to the live internet is possible.
         """
+        import httplib
+        import socket
         try:
             http_connection = httplib.HTTPConnection('dejacode.org')
             http_connection.connect()
@@ -485,6 +628,8 @@ class AboutFile(object):
     def check_url_reachable(self, host, path):
         # FIXME: we are only checking netloc and path ... NOT the whole url
         # FXIME: this will not work with FTP
+        import httplib
+        import socket
         try:
             conn = httplib.HTTPConnection(host)
             conn.request('HEAD', path)
@@ -520,9 +665,8 @@ class AboutFile(object):
             <li> uppercase and lowercase letters from A to Z</li>
             <li> the _ underscore, - dash and . period signs. </li>
         """
-        supported = string.digits + string.ascii_letters + '_-.'
         file_name = resource_name(file_path)
-        return [char for char in file_name if char not in supported]
+        return [char for char in file_name if char not in FILE_NAME_CHARS]
 
     def duplicate_file_names_when_lowercased(self, file_location):
         """
@@ -539,7 +683,7 @@ class AboutFile(object):
         file_name_lower = file_name.lower()
         parent_dir = dirname(file_location)
         names = []
-        for name in listdir(parent_dir):
+        for name in self._listdir(parent_dir):
             if name.lower() in names:
                 names.append(name)
         return names
@@ -547,13 +691,21 @@ class AboutFile(object):
     def license_text(self):
         try:
             license_text_path = self.file_fields_locations["license_text_file"]
-            with open(license_text_path, 'rU') as f:
-                return f.read()
+            return self._read(license_text_path)
         except Exception as e: 
             pass
         #return empty string if the license file does not exist
         return ""
 
+def spdx_license_ids(license_spdx):
+    """
+    Return the license ids of a license_spdx field value, skipping the
+    and/or conjunctions.
+    """
+    return [sid for sid in license_spdx.split()
+            if sid.lower() not in ('or', 'and')]
+
+
 def resource_name(resource_path):
     """
     Return a resource name based on a posix path, which is either the filename
@@ -570,6 +722,107 @@ def resource_name(resource_path):
         return ''
 
 
+def is_archive(location):
+    """
+    Return True if the file at location is a zip or tar archive.
+    """
+    import tarfile
+    import zipfile
+    return (not isdir(location)
+            and (zipfile.is_zipfile(location) or tarfile.is_tarfile(location)))
+
+
+class ArchiveIndex(object):
+    """
+    Index the members of a zip or tar archive so that ABOUT files and the
+    files they reference can be read and checked without extracting the
+    archive. A member is addressed by the location it would have if the
+    archive at location were a directory, e.g. /tmp/foo.zip/foo/foo.ABOUT
+    """
+    def __init__(self, location):
+        import tarfile
+        import zipfile
+        self.location = abspath(location)
+        # map of member path to the zip or tar member info
+        self.members = {}
+        # map of directory path to the names it contains, '' being the root
+        self.children = {'': set()}
+
+        if zipfile.is_zipfile(self.location):
+            self._archive = zipfile.ZipFile(self.location)
+            members = [(info.filename, info) for info in self._archive.infolist()
+                       if not info.filename.endswith('/')]
+            self._open_member = self._archive.open
+        else:
+            self._archive = tarfile.open(self.location)
+            members = [(info.name, info) for info in self._archive.getmembers()
+                       if info.isfile()]
+            self._open_member = self._archive.extractfile
+
+        for name, info in members:
+            path = posixpath.normpath(name).lstrip('/')
+            if path.startswith('./'):
+                path = path[2:]
+            self.members[path] = info
+            self._add_child(path)
+
+    def _add_child(self, path):
+        parent, name = posixpath.split(path)
+        self.children.setdefault(parent, set()).add(name)
+        if parent and parent not in self.children.get(posixpath.dirname(parent), ()):
+            self._add_child(parent)
+
+    def member_path(self, location):
+        """
+        Return the posix path of location inside the archive, or None if
+        location is not inside the archive.
+        """
+        path = relpath(abspath(location), self.location)
+        if path == '.':
+            return ''
+        path = path.replace('\\', '/')
+        if path == '..' or path.startswith('../'):
+            return None
+        return path
+
+    def files(self):
+        """
+        Return the locations of all the file members of the archive.
+        """
+        return [join(self.location, *path.split('/'))
+                for path in sorted(self.members)]
+
+    def exists(self, location):
+        path = self.member_path(location)
+        return path is not None and (path in self.members
+                                     or path in self.children)
+
+    def isdir(self, location):
+        return self.member_path(location) in self.children
+
+    def listdir(self, location):
+        path = self.member_path(location)
+        if path not in self.children:
+            raise OSError(errno.ENOENT, 'No such directory in archive', location)
+        return sorted(self.children[path])
+
+    def read(self, location):
+        """
+        Return the content of the file member at location.
+        """
+        path = self.member_path(location)
+        if path not in self.members:
+            raise IOError(errno.ENOENT, 'No such file in archive', location)
+        member = self._open_member(self.members[path])
+        try:
+            return member.read()
+        finally:
+            member.close()
+
+    def close(self):
+        self._archive.close()
+
+
 #==============================================================================
 
 MANDATORY_FIELDS = ['about_resource', 'name', 'version']
@@ -641,6 +894,9 @@ FILE_LOCATIONS_FIELDS = ['about_resource_location',
                          'notice_file_location',
                          'license_text_file_location']
 
+CSV_COLUMNS = (['about_file'] + MANDATORY_FIELDS + OPTIONAL_FIELDS
+               + ['warnings', 'errors'])
+
 #==============================================================================
 # SPDX License List version 1.18, which was released on Apr 10, 2013.
 # These are Identifiers from http://spdx.org/licenses/
@@ -856,14 +1112,625 @@ SPDX_LICENSES = [
     'ZPL-2.0',
     'ZPL-2.1']
 
-# maps lowercase id to standard ids with official case
-SPDX_LICENSE_IDS = dict((i.lower(), i) for i in SPDX_LICENSES)
+_spdx_license_ids = None
+
+
+def get_spdx_license_ids():
+    """
+    Return a mapping of lowercase SPDX license ids to the standard ids with
+    official case. The mapping is built on first use.
+    """
+    global _spdx_license_ids
+    if _spdx_license_ids is None:
+        _spdx_license_ids = dict((i.lower(), i) for i in SPDX_LICENSES)
+    return _spdx_license_ids
+
+#=============================================================================
+
+
+class _NullPhase(object):
+    """
+    A do-nothing context manager returned for every phase when profiling is
+    disabled.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullProfiler(object):
+    """
+    A profiler that records nothing. It is used when profiling is not
+    requested: phases are a shared no-op context manager and no method is
+    wrapped, so the instrumentation costs close to nothing.
+    """
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def report(self):
+        return {}
+
+NO_PROFILER = NullProfiler()
+
+# AboutFile methods called from validate() that are timed when profiling
+VALIDATORS = ['invalid_chars_in_about_file_name',
+              'duplicate_file_names_when_lowercased',
+              'validate_field_values_are_not_empty',
+              'validate_about_resource_exist',
+              'validate_mandatory_fields_are_present',
+              'check_is_ascii',
+              'validate_known_optional_fields',
+              'validate_file_field_exists',
+              'validate_url_field',
+              'validate_spdx_license',
+              'check_date_format']
+
+
+def _cpu_time():
+    """
+    Return the user and system CPU time used by this process so far.
+    """
+    user, system = os.times()[:2]
+    return user + system
+
+
+class PhaseProfiler(NullProfiler):
+    """
+    Record the wall and CPU time spent in each named phase of a run and the
+    cumulative time and call counts of each AboutFile validator.
+    On stop, the timings are written as a JSON report at report_path and
+    the cProfile statistics are dumped at pstats_path if these are provided.
+    """
+    def __init__(self, report_path=None, pstats_path=None):
+        self.report_path = report_path
+        self.pstats_path = pstats_path
+        self.phases = {}
+        self.validators = {}
+        self._wrapped = []
+        self._cprofile = None
+        self._started = None
+
+    @contextmanager
+    def phase(self, name):
+        wall, cpu = time.time(), _cpu_time()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, {'wall': 0.0, 'cpu': 0.0,
+                                                  'calls': 0})
+            stats['wall'] += time.time() - wall
+            stats['cpu'] += _cpu_time() - cpu
+            stats['calls'] += 1
+
+    def start(self):
+        """
+        Wrap the AboutFile validators with timers and start cProfile if a
+        pstats_path was provided.
+        """
+        self._started = time.time(), _cpu_time()
+        for name in VALIDATORS:
+            original = AboutFile.__dict__[name]
+            self._wrapped.append((name, original))
+            setattr(AboutFile, name, self._timed(name, original))
+
+        if self.pstats_path:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def _timed(self, name, func):
+        stats = self.validators.setdefault(name, {'time': 0.0, 'calls': 0})
+
+        def timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats['time'] += time.time() - start
+                stats['calls'] += 1
+        timed.__name__ = func.__name__
+        timed.__doc__ = func.__doc__
+        return timed
+
+    def stop(self):
+        """
+        Restore the original validators and write the report and pstats
+        files.
+        """
+        if self._cprofile:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.pstats_path)
+            self._cprofile = None
+
+        for name, original in self._wrapped:
+            setattr(AboutFile, name, original)
+        self._wrapped = []
+
+        if self.report_path:
+            write_json_report(self.report_path, self.report())
+
+    def report(self):
+        """
+        Return a mapping of the recorded timings, suitable for JSON.
+        """
+        report = {'phases': self.phases, 'validators': self.validators}
+        if self._started:
+            wall, cpu = self._started
+            report['total'] = {'wall': time.time() - wall,
+                               'cpu': _cpu_time() - cpu}
+        return report
+
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process in bytes or None if
+    this cannot be measured on this platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on Mac and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak
+    return peak * 1024
+
+
+def top_object_types(limit=10):
+    """
+    Return a list of the object types using the most memory among the
+    objects tracked by the garbage collector, largest first.
+    This is used when tracemalloc is not available.
+    """
+    import gc
+    sizes = {}
+    for obj in gc.get_objects():
+        type_name = type(obj).__name__
+        size, count = sizes.get(type_name, (0, 0))
+        sizes[type_name] = size + sys.getsizeof(obj), count + 1
+    largest = sorted(sizes.items(), key=lambda item: item[1][0], reverse=True)
+    return [{'type': type_name, 'size': size, 'count': count}
+            for type_name, (size, count) in largest[:limit]]
+
+
+class MemoryProfiler(NullProfiler):
+    """
+    Take a memory snapshot at the end of each named phase of a run with the
+    peak RSS and the top allocation sites. Allocation sites are collected
+    with tracemalloc when available and otherwise approximated by the
+    object types using the most memory.
+    On stop, the snapshots are written as a JSON report at report_path.
+    """
+    def __init__(self, report_path=None, limit=10):
+        self.report_path = report_path
+        self.limit = limit
+        self.snapshots = []
+        self._tracemalloc = None
+
+    def start(self):
+        try:
+            import tracemalloc
+        except ImportError:
+            return
+        tracemalloc.start()
+        self._tracemalloc = tracemalloc
+
+    @contextmanager
+    def phase(self, name):
+        try:
+            yield
+        finally:
+            self.snapshots.append(self.snapshot(name))
+
+    def snapshot(self, name):
+        """
+        Return a mapping describing the memory used at the end of phase name.
+        """
+        snapshot = {'phase': name, 'peak_rss': peak_rss()}
+        tracemalloc = self._tracemalloc
+        if tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics('lineno')
+            snapshot['traced'] = current
+            snapshot['traced_peak'] = peak
+            snapshot['top_allocations'] = [
+                {'site': str(stat.traceback), 'size': stat.size,
+                 'count': stat.count}
+                for stat in statistics[:self.limit]]
+        else:
+            snapshot['top_types'] = top_object_types(self.limit)
+        return snapshot
+
+    def stop(self):
+        if self._tracemalloc:
+            self._tracemalloc.stop()
+            self._tracemalloc = None
+        if self.report_path:
+            write_json_report(self.report_path, self.report())
+
+    def report(self):
+        return {'phases': self.snapshots, 'peak_rss': peak_rss()}
+
+
+class ProfilerGroup(NullProfiler):
+    """
+    Run several profilers over the same phases. Profilers are entered in
+    order, so that a memory snapshot listed first is not counted in the
+    timings of a profiler listed after it.
+    """
+    def __init__(self, profilers):
+        self.profilers = profilers
+
+    @contextmanager
+    def phase(self, name):
+        phases = [profiler.phase(name) for profiler in self.profilers]
+        for phase in phases:
+            phase.__enter__()
+        try:
+            yield
+        finally:
+            for phase in reversed(phases):
+                phase.__exit__(None, None, None)
+
+    def start(self):
+        for profiler in self.profilers:
+            profiler.start()
+
+    def stop(self):
+        for profiler in reversed(self.profilers):
+            profiler.stop()
+
+    def report(self):
+        return [profiler.report() for profiler in self.profilers]
+
+
+def write_json_report(location, report):
+    """
+    Write a report mapping as JSON at location.
+    """
+    import json
+    with open(location, 'wb') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+def get_profiler(report_path=None, pstats_path=None, memory_report_path=None):
+    """
+    Return a profiler for the requested reports or the no-op profiler if no
+    report is requested.
+    """
+    profilers = []
+    if memory_report_path:
+        profilers.append(MemoryProfiler(memory_report_path))
+    if report_path or pstats_path:
+        profilers.append(PhaseProfiler(report_path, pstats_path))
+
+    if not profilers:
+        return NO_PROFILER
+    if len(profilers) == 1:
+        return profilers[0]
+    return ProfilerGroup(profilers)
 
 #=============================================================================
 
+# number of ABOUT files read ahead of the parsing and the number of threads
+# reading them in a pipelined collection
+PIPELINE_WINDOW = 64
+PIPELINE_READERS = 4
+
+
+def pipelined_reads(locations, readers=PIPELINE_READERS, window=PIPELINE_WINDOW):
+    """
+    Yield a tuple of (location, content) for each location of the locations
+    iterable, in order. The content is None if the file cannot be read.
+    The locations iterable is consumed in a walker thread and the files are
+    read by a pool of reader threads while the caller processes the previous
+    files. At most window files are in flight: the walker waits for the
+    caller to catch up.
+    """
+    import threading
+    import Queue
+
+    paths = Queue.Queue()
+    results = Queue.Queue()
+    slots = threading.Semaphore(window)
+    stopped = threading.Event()
+    failure = []
+
+    def walk_stage():
+        try:
+            for sequence, location in enumerate(locations):
+                slots.acquire()
+                if stopped.is_set():
+                    break
+                paths.put((sequence, location))
+        except Exception:
+            failure.append(sys.exc_info())
+        finally:
+            for _ in range(readers):
+                paths.put(None)
+
+    def read_stage():
+        while True:
+            item = paths.get()
+            if item is None:
+                results.put(None)
+                return
+            sequence, location = item
+            try:
+                with open(location, 'rb') as f:
+                    content = f.read()
+            except (IOError, OSError):
+                content = None
+            results.put((sequence, location, content))
+
+    threads = [threading.Thread(target=walk_stage)]
+    threads.extend(threading.Thread(target=read_stage) for _ in range(readers))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        # results are reordered by sequence to keep the order of locations
+        pending = {}
+        next_sequence = 0
+        finished = 0
+        while finished < readers:
+            item = results.get()
+            if item is None:
+                finished += 1
+                continue
+            pending[item[0]] = item
+            while next_sequence in pending:
+                _, location, content = pending.pop(next_sequence)
+                next_sequence += 1
+                slots.release()
+                yield location, content
+        if failure:
+            exc_type, exc_value, exc_traceback = failure[0]
+            raise exc_type, exc_value, exc_traceback
+    finally:
+        # unblock the walker if the caller stops early
+        stopped.set()
+        for _ in range(window):
+            slots.release()
+
+
+CHECKSUM_ALGORITHMS = [('checksum_sha1', 'sha1'),
+                       ('checksum_md5', 'md5'),
+                       ('checksum_sha256', 'sha256')]
+
+# large reads keep the hashing in C code which releases the GIL
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+
+def stat_signature(location):
+    """
+    Return a (modification time, size) tuple for the file at location or
+    None if it does not exist.
+    """
+    try:
+        stat = os.stat(location)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+def compute_checksums(location, chunk_size=CHECKSUM_CHUNK_SIZE):
+    """
+    Return a mapping of the CHECKSUM_FIELDS names to the hex digests of the
+    file at location. The file is read once and each chunk feeds all the
+    hashers.
+    """
+    import hashlib
+    hashers = [(field_name, hashlib.new(algorithm))
+               for field_name, algorithm in CHECKSUM_ALGORITHMS]
+    with open(location, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            for _, hasher in hashers:
+                hasher.update(chunk)
+    return dict((field_name, hasher.hexdigest())
+                for field_name, hasher in hashers)
+
+
+def compute_checksums_or_none(location):
+    """
+    Return the checksums mapping of the file at location or None if it
+    cannot be read.
+    """
+    try:
+        return compute_checksums(location)
+    except (IOError, OSError):
+        return None
+
+
+class ChecksumCache(object):
+    """
+    Cache of the checksums of files by location, valid as long as the stat
+    signature of a file is unchanged. Files not in the cache are hashed in
+    a pool of threads: hashlib releases the GIL while hashing the chunks so
+    several files are hashed in parallel.
+    Directories have Merkle-style checksums computed from the checksums of
+    their files and subdirectories. The listings of directories are cached
+    too and reused while the directory modification time is unchanged.
+    """
+    def __init__(self, workers=None):
+        # map of location to a tuple of (stat signature, checksums)
+        self.entries = {}
+        # map of directory location to a tuple of (stat signature,
+        # subdirectory names, file names)
+        self.listings = {}
+        self.workers = workers
+
+    def checksums(self, locations):
+        """
+        Return a mapping of location to the checksums mapping of the files at
+        locations or None for the files that cannot be read. Each file is
+        hashed at most once.
+        """
+        results = {}
+        stale = []
+        for location in set(locations):
+            signature = stat_signature(location)
+            entry = self.entries.get(location)
+            if entry and entry[0] == signature:
+                results[location] = entry[1]
+            else:
+                stale.append((location, signature))
+
+        if len(stale) > 1:
+            from multiprocessing import cpu_count
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(min(self.workers or cpu_count(), len(stale)))
+            try:
+                computed = pool.map(compute_checksums_or_none,
+                                    [location for location, _ in stale])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            computed = [compute_checksums_or_none(location) for location, _ in stale]
+
+        for (location, signature), checksums in zip(stale, computed):
+            if checksums is not None:
+                self.entries[location] = signature, checksums
+            results[location] = checksums
+        return results
+
+    def listing(self, location):
+        """
+        Return a tuple of sorted (subdirectory names, file names) for the
+        directory at location. Symbolic links to directories are skipped.
+        """
+        signature = stat_signature(location)
+        entry = self.listings.get(location)
+        if entry and entry[0] == signature:
+            return entry[1], entry[2]
+        dirnames = []
+        filenames = []
+        for name in listdir(location):
+            path = join(location, name)
+            if os.path.islink(path) and isdir(path):
+                continue
+            if isdir(path):
+                dirnames.append(name)
+            elif isfile(path):
+                filenames.append(name)
+        dirnames.sort()
+        filenames.sort()
+        self.listings[location] = signature, dirnames, filenames
+        return dirnames, filenames
+
+    def tree_checksums(self, locations):
+        """
+        Return a mapping of location to the checksums mapping of the
+        directories at locations. The checksum of a directory is the digest
+        of the sorted kind, checksum and name lines of its files and
+        subdirectories. The .ABOUT files are left out so that the checksums
+        populated in an ABOUT file documenting its own directory still verify.
+        The files of all the trees are hashed in one pass and the checksum of
+        a subtree shared by nested directories is computed once. The checksums
+        are None for a directory with a file or subdirectory that cannot be
+        read.
+        """
+        trees = {}
+        files = []
+        pending = list(set(locations))
+        while pending:
+            directory = pending.pop()
+            if directory in trees:
+                continue
+            try:
+                dirnames, filenames = self.listing(directory)
+            except OSError:
+                trees[directory] = None
+                continue
+            filenames = [name for name in filenames
+                         if not isvalid_about_file(name)]
+            trees[directory] = dirnames, filenames
+            pending.extend(join(directory, name) for name in dirnames)
+            files.extend(join(directory, name) for name in filenames)
+        file_checksums = self.checksums(files)
+
+        import hashlib
+        tree_checksums = {}
+
+        def tree_checksum(directory):
+            if directory in tree_checksums:
+                return tree_checksums[directory]
+            tree_checksums[directory] = None
+            if trees[directory] is None:
+                return
+            dirnames, filenames = trees[directory]
+            children = [(name, 'd', tree_checksum(join(directory, name)))
+                        for name in dirnames]
+            children.extend((name, 'f', file_checksums[join(directory, name)])
+                            for name in filenames)
+            if any(child_checksums is None for _, _, child_checksums in children):
+                return
+            children.sort()
+            checksums = {}
+            for field_name, algorithm in CHECKSUM_ALGORITHMS:
+                hasher = hashlib.new(algorithm)
+                for name, kind, child_checksums in children:
+                    hasher.update('%s %s %s\n' % (kind, child_checksums[field_name], name))
+                checksums[field_name] = hasher.hexdigest()
+            tree_checksums[directory] = checksums
+            return checksums
+
+        return dict((location, tree_checksum(location)) for location in set(locations))
+
+    def save(self, location):
+        """
+        Save the cache entries and directory listings as JSON at location.
+        """
+        with open(location, 'wb') as cache_file:
+            cache_file.write(json_dumps({'files': self.entries,
+                                         'directories': self.listings}))
+
+    @classmethod
+    def load(cls, location, workers=None):
+        """
+        Return a ChecksumCache with the entries saved at location, or an
+        empty cache if there is no readable cache at location.
+        """
+        import json
+        cache = cls(workers)
+        try:
+            with open(location, 'rb') as cache_file:
+                saved = _encode_strings(json.load(cache_file))
+            entries = saved['files']
+            listings = saved['directories']
+        except (IOError, ValueError, KeyError, TypeError):
+            return cache
+        for file_location, (signature, checksums) in entries.items():
+            if signature:
+                cache.entries[file_location] = tuple(signature), checksums
+        for directory, (signature, dirnames, filenames) in listings.items():
+            if signature:
+                cache.listings[directory] = tuple(signature), dirnames, filenames
+        return cache
+
 
 class AboutCollector(object):
-    def __init__(self, input_path, output_path, opt_arg_num):
+    def __init__(self, input_path, output_path, opt_arg_num, profiler=None,
+                 git_revisions=None, checksum_cache=None, vcs_mirrors=None,
+                 shard=None, sorted_output=False, pipelined=False,
+                 compression_level=None, previous_inventory=None):
         # Setup the input and output paths
         self.original_input_path = input_path
         self.input_path = abspath(input_path)
@@ -871,6 +1738,12 @@ class AboutCollector(object):
         self.input_path_is_dir = isdir(self.input_path)
         self.output_path = output_path
 
+        # ABOUT files are read from the archive members when the input is an
+        # archive, without extracting it
+        self.archive = None
+        if not self.input_path_is_dir and is_archive(self.input_path):
+            self.archive = ArchiveIndex(self.input_path)
+
         # Setup the verbosity
         self.display_error = self.display_error_and_warning = False
         if opt_arg_num == '1':
@@ -878,12 +1751,60 @@ class AboutCollector(object):
         elif opt_arg_num == '2':
             self.display_error_and_warning = True
 
+        self.profiler = profiler or NO_PROFILER
+
+        # When git revisions are provided, only the ABOUT files changed in
+        # these revisions or referencing changed files are collected
+        self.git_revisions = git_revisions
+        self.removed_about_files = []
+        # The about_resource and _file columns of the previous CSV inventory
+        # locate the ABOUT files referencing changed files without reading
+        # all the ABOUT files
+        self.previous_inventory = previous_inventory
+
         self.about_files = []
         self.about_objects = []
 
-        # Running the files collection and objects creation on instantiation
-        self.collect_about_files()
-        self.create_about_objects_from_files()
+        # used to find the ABOUT files to refresh when a file changes
+        self.reference_index = None
+        self.next_identifier = 0
+
+        # When a (zero-based index, count) shard is provided, only the ABOUT
+        # files of this shard are collected and the rows are sorted by
+        # about_file so that the shard outputs can be merged
+        self.shard = shard
+
+        # CSV rows are written sorted by about_file for a sorted output
+        self.sorted_output = sorted_output or bool(shard)
+
+        # When a ChecksumCache is provided, the checksum fields are verified
+        # against the about_resource files
+        self.checksum_cache = checksum_cache
+
+        # When a directory of local git mirrors is provided, the VCS fields
+        # are verified against the mirrors of the vcs_repository
+        self.vcs_mirrors = vcs_mirrors
+
+        # level of the compression of .gz or .zst CSV and JSON Lines outputs
+        # or None for the default level of the codec
+        self.compression_level = compression_level
+
+        # Running the files collection and objects creation on instantiation,
+        # overlapping the walk, reads and parsing of a directory if pipelined
+        if pipelined and self.input_path_is_dir and not self.git_revisions:
+            with self.profiler.phase('collect_and_parse'):
+                self.collect_and_parse_pipelined()
+        else:
+            with self.profiler.phase('collect'):
+                self.collect_about_files()
+            with self.profiler.phase('parse'):
+                self.create_about_objects_from_files()
+        if self.checksum_cache is not None:
+            with self.profiler.phase('checksum'):
+                self.verify_checksums(self.about_objects)
+        if self.vcs_mirrors:
+            with self.profiler.phase('vcs'):
+                verify_vcs_fields(self.about_objects, self.vcs_mirrors)
 
     def collect_about_files(self):
         """
@@ -891,14 +1812,111 @@ class AboutCollector(object):
         results in a about_files list on the collector instance.
         """
         files = []
-        if self.input_path_is_dir:
-            for root, _, filenames in walk(self.input_path):
-                for filename in filenames:
-                    files += [join(root, filename)]
+        if self.git_revisions:
+            reference_index = None
+            if self.previous_inventory:
+                reference_index = self.previous_reference_index()
+            files, self.removed_about_files = git_changed_about_files(
+                self.input_path, self.git_revisions, reference_index)
+        elif self.input_path_is_dir:
+            files = list(self._walk_files())
+        elif self.archive:
+            files = self.archive.files()
         else:
             files = [self.input_path]
 
+        if self.shard:
+            files = filter(self._in_shard, files)
+
+        self.about_files = files
+
+    def previous_reference_index(self):
+        """
+        Return a ReferenceIndex built from the about_resource and _file
+        columns of the rows of the previous_inventory CSV, with their
+        about_file paths mapped back to locations under the input path.
+        Return None and print a warning if the inventory has rows but none
+        of them is under the input path, such as an inventory written for
+        another input path.
+        """
+        prefix = self.about_file_path(self.input_path)
+        index = ReferenceIndex()
+        rows = matched = 0
+        with open_compressed(self.previous_inventory, 'rb') as previous_file:
+            for row in csv.DictReader(previous_file):
+                rows += 1
+                about_file = row['about_file']
+                if not about_file.startswith(prefix):
+                    continue
+                matched += 1
+                subpath = about_file[len(prefix):].replace('/', os.sep)
+                fields = dict((field_name, row.get(field_name) or '')
+                              for field_name in MANDATORY_FIELDS + OPTIONAL_FIELDS)
+                index.add(self.input_path + subpath, fields)
+        if rows and not matched:
+            print('Warning: no about_file of the previous inventory %s starts with '
+                  '%s. Reading all the ABOUT files to find the references to the '
+                  'changed files.' % (self.previous_inventory, prefix))
+            return None
+        return index
+
+    def _walk_files(self):
+        for root, _, filenames in walk(self.input_path):
+            for filename in filenames:
+                yield join(root, filename)
+
+    def _in_shard(self, location):
+        """
+        Return True if location is an ABOUT file of the collector shard.
+        """
+        index, count = self.shard
+        return (isvalid_about_file(location)
+                and shard_index(self.shard_path(location), count) == index)
+
+    def shard_path(self, location):
+        """
+        Return the posix path of location relative to the input path, used to
+        assign an ABOUT file to a shard.
+        """
+        if self.input_path_is_dir or self.archive:
+            location = relpath(location, self.input_path)
+        else:
+            location = basename(location)
+        return location.replace('\\', '/')
+
+    def collect_and_parse_pipelined(self):
+        """
+        Collect the files of the input directory and create the AboutFile
+        objects of the ABOUT files in a pipeline: the directory is walked
+        and the ABOUT files are read in threads while the files read are
+        parsed and validated. The result is the same as collect_about_files
+        followed by create_about_objects_from_files.
+        """
+        files = []
+
+        def about_locations():
+            for location in self._walk_files():
+                if self.shard and not self._in_shard(location):
+                    continue
+                files.append(location)
+                if isvalid_about_file(location):
+                    yield location
+
+        about_objects = []
+        for identifier, (location, content) in enumerate(
+                pipelined_reads(about_locations())):
+            if content is None:
+                # report the read error as the sequential collection does
+                about_object = AboutFile(location)
+            else:
+                about_object = AboutFile.from_string(content, location)
+            about_object.unique_identifier = identifier
+            about_objects.append(about_object)
+
         self.about_files = files
+        self.about_objects = about_objects
+        self.next_identifier = len(about_objects)
+        self.reference_index = None
 
     def create_about_objects_from_files(self):
         """
@@ -907,107 +1925,1817 @@ class AboutCollector(object):
         about_objects = []
         identifier = 0
         for about_file in filter(isvalid_about_file, self.about_files):
-            about_object = AboutFile(about_file)
+            if self.archive:
+                about_object = AboutFile.from_string(
+                    self.archive.read(about_file), about_file, self.archive)
+            else:
+                about_object = AboutFile(about_file)
             about_object.unique_identifier = identifier
             about_objects.append(about_object)
             identifier += 1
 
         self.about_objects = about_objects
+        self.next_identifier = identifier
+        self.reference_index = None
 
-    def extract_about_info(self):
+    def refresh(self, locations):
         """
-        Builds rows for each stored about objects.
+        Re-parse and re-validate the ABOUT files affected by a change of the
+        files at locations: ABOUT files that were changed, created or
+        deleted and ABOUT files referencing a changed file.
+        Return the set of refreshed ABOUT file locations.
         """
-        about_data_list = []
-        warnings_count = errors_count = 0
-
+        if not self.input_path_is_dir:
+            # a single file or archive is collected again as a whole
+            self.collect_about_files()
+            self.create_about_objects_from_files()
+            if self.checksum_cache is not None:
+                self.verify_checksums(self.about_objects)
+            if self.vcs_mirrors:
+                verify_vcs_fields(self.about_objects, self.vcs_mirrors)
+            return set(about_object.location for about_object in self.about_objects)
+
+        if self.reference_index is None:
+            self.reference_index = ReferenceIndex()
+            for about_object in self.about_objects:
+                self.reference_index.add(about_object.location,
+                                         about_object.validated_fields)
+
+        locations = [abspath(location) for location in locations]
+        affected = set(location for location in locations
+                       if isvalid_about_file(location))
+        affected.update(self.reference_index.about_files_for(locations))
+
+        about_objects = dict((about_object.location, about_object)
+                             for about_object in self.about_objects)
+        created = []
+        for location in affected:
+            self.reference_index.remove(location)
+            about_objects.pop(location, None)
+            if not exists(location):
+                continue
+            about_object = AboutFile(location)
+            about_object.unique_identifier = self.next_identifier
+            self.next_identifier += 1
+            about_objects[location] = about_object
+            created.append(about_object)
+            self.reference_index.add(location, about_object.validated_fields)
+        if self.checksum_cache is not None:
+            self.verify_checksums(created)
+        if self.vcs_mirrors:
+            verify_vcs_fields(created, self.vcs_mirrors)
+
+        # keep the collection order and add new ABOUT files at the end
+        refreshed = []
         for about_object in self.about_objects:
-            warnings_count += len(about_object.warnings)
-            errors_count += len(about_object.errors)
-
-            #FIXME: why are we doing path sep conversion here?
-            #TODO: THis should be refactored in a separate methods.
-            #TODO: For some reasons, the join(input_path, subpath_ doesn't work
-            # if the input_path startswith "../". Therefore, using the
-            # "hardcode" to add/append the path. Need to update the code later.
-            input_path = self.original_input_path
-            if self.input_path_is_dir:
-                subpath = about_object.location.partition(basename(
-                    normpath(input_path)))[2]
-                if input_path[-1] == "/":
-                    input_path = input_path.rpartition("/")[0]
-                if input_path[-1] == "\\":
-                    input_path = input_path.rpartition("\\")[0]
-                update_path = (input_path + subpath).replace("\\", "/")
-            else:
-                update_path = input_path.replace("\\", "/")
-
-            about_data_list.append(about_object.get_about_info(update_path,
-                                                               about_object))
+            if about_object.location in about_objects:
+                refreshed.append(about_objects.pop(about_object.location))
+        refreshed.extend(about_objects[location] for location in sorted(about_objects))
+        self.about_objects = refreshed
+        return affected
 
-            if self.display_error:
-                if about_object.errors:
-                    print("ABOUT File: %s" % update_path)
-                    print("ERROR: %s\n" % about_object.errors)
-            if self.display_error_and_warning:
-                if about_object.errors or about_object.warnings:
-                    print("ABOUT File: %s" % update_path)
-                    if about_object.errors:
-                        print("ERROR: %s" % about_object.errors)
-                    if about_object.warnings:
-                        print("WARNING: %s\n" % about_object.warnings)
-
-        self.write_to_csv(about_data_list)
+    def verify_checksums(self, about_objects):
+        """
+        Add an error to the about_objects which have a checksum field value
+        that does not match the checksum of their about_resource file or
+        directory, or an about_resource that cannot be read. Files referenced
+        by several ABOUT files are hashed only once.
+        """
+        targets = []
+        for about_object in about_objects:
+            # archive members are not hashed
+            if about_object.archive:
+                continue
+            expected = [(field_name, about_object.validated_fields[field_name])
+                        for field_name in CHECKSUM_FIELDS
+                        if about_object.validated_fields.get(field_name, '').strip()]
+            location = about_object.file_fields_locations.get('about_resource')
+            if expected and location and exists(location):
+                targets.append((about_object, location, expected))
+
+        locations = [location for _, location, _ in targets]
+        checksums = self.checksum_cache.checksums(filter(isfile, locations))
+        checksums.update(self.checksum_cache.tree_checksums(filter(isdir, locations)))
+        for about_object, location, expected in targets:
+            if checksums[location] is None:
+                msg = 'Cannot read the about_resource to verify its checksums.'
+                about_object.errors.append(Error(FILE, 'about_resource',
+                                                 about_object.about_resource_path, msg))
+                continue
+            for field_name, value in expected:
+                actual = checksums[location][field_name]
+                if value.strip().lower() != actual:
+                    msg = 'Checksum does not match the about_resource file: %s'
+                    about_object.errors.append(Error(CHECKSUM, field_name,
+                                                     value, msg, actual))
+
+    def extract_about_info(self, merge_path=None):
+        """
+        Builds rows for each stored about objects. The rows are merged into
+        the CSV inventory at merge_path if provided and sorted by about_file
+        for a sorted output.
+        """
+        if is_jsonl_output(self.output_path):
+            # records are built and written one ABOUT file at a time
+            with self.profiler.phase('write_jsonl'):
+                warnings_count, errors_count = self.write_to_jsonl()
+        elif self.sorted_output and not merge_path:
+            # rows are built as they are sorted and written
+            with self.profiler.phase('write_csv'):
+                self.write_to_csv(sorted_rows(self._iter_rows()))
+            warnings_count, errors_count = self._problems_count()
+        else:
+            with self.profiler.phase('extract'):
+                about_data_list, warnings_count, errors_count = self._extract_rows()
+
+            with self.profiler.phase('write_csv'):
+                if is_sqlite_output(self.output_path):
+                    self.write_to_sqlite(about_data_list)
+                elif merge_path:
+                    self.merge_into_csv(merge_path, about_data_list)
+                else:
+                    self.write_to_csv(about_data_list)
         if errors_count:
             print("%d errors detected." % errors_count)
         if warnings_count:
             print("%d warnings detected.\n" % warnings_count)
 
-    def write_to_csv(self, about_data_list):
+    def about_file_path(self, location):
         """
-        Write results in CSV file at output_path.
+        Return the about_file path reported for the ABOUT file at location,
+        relative to the original input path.
         """
-        with open(self.output_path, 'wb') as output_file:
-            about_spec_writer = csv.writer(output_file)
-            about_spec_writer.writerow(['about_file'] + MANDATORY_FIELDS +
-                                       OPTIONAL_FIELDS + ['warnings', 'errors'])
-            for row in about_data_list:
-                about_spec_writer.writerow(row)
+        #FIXME: why are we doing path sep conversion here?
+        #TODO: For some reasons, the join(input_path, subpath_ doesn't work
+        # if the input_path startswith "../". Therefore, using the
+        # "hardcode" to add/append the path. Need to update the code later.
+        input_path = self.original_input_path
+        if self.input_path_is_dir or self.archive:
+            subpath = location.partition(basename(normpath(input_path)))[2]
+            if input_path[-1] == "/":
+                input_path = input_path.rpartition("/")[0]
+            if input_path[-1] == "\\":
+                input_path = input_path.rpartition("\\")[0]
+            return (input_path + subpath).replace("\\", "/")
+        return input_path.replace("\\", "/")
+
+    def _extract_rows(self):
+        """
+        Return a tuple of (rows, warnings count, errors count) for the stored
+        about objects, printing problems according to the verbosity.
+        """
+        about_data_list = list(self._iter_rows())
+        warnings_count, errors_count = self._problems_count()
+        return about_data_list, warnings_count, errors_count
+
+    def _iter_rows(self):
+        """
+        Yield a row for each stored about object, printing problems according
+        to the verbosity.
+        """
+        for about_object in self.about_objects:
+            update_path = self.about_file_path(about_object.location)
+            self._print_problems(update_path, about_object)
+            yield about_object.get_about_info(update_path, about_object)
+
+    def _problems_count(self):
+        """
+        Return a tuple of (warnings count, errors count) for the stored about
+        objects.
+        """
+        warnings_count = errors_count = 0
+        for about_object in self.about_objects:
+            warnings_count += len(about_object.warnings)
+            errors_count += len(about_object.errors)
+        return warnings_count, errors_count
+
+    def _print_problems(self, update_path, about_object):
+        """
+        Print the problems of an about_object according to the verbosity.
+        """
+        if self.display_error:
+            if about_object.errors:
+                print("ABOUT File: %s" % update_path)
+                print("ERROR: %s\n" % about_object.errors)
+        if self.display_error_and_warning:
+            if about_object.errors or about_object.warnings:
+                print("ABOUT File: %s" % update_path)
+                if about_object.errors:
+                    print("ERROR: %s" % about_object.errors)
+                if about_object.warnings:
+                    print("WARNING: %s\n" % about_object.warnings)
+
+    def write_to_csv(self, about_data_list, output_path=None):
+        """
+        Write results in CSV file at output_path.
+        """
+        with open_compressed(output_path or self.output_path, 'wb',
+                             self.compression_level) as output_file:
+            about_spec_writer = csv.writer(output_file)
+            about_spec_writer.writerow(CSV_COLUMNS)
+            for row in about_data_list:
+                about_spec_writer.writerow(row)
+
+    def merge_into_csv(self, previous_path, about_data_list):
+        """
+        Write at output_path the CSV inventory at previous_path updated with
+        the rows in about_data_list: rows for the same about_file are
+        replaced, rows for ABOUT files removed since are dropped and new rows
+        are added. The merged rows are sorted by about_file, as in a sorted
+        output. The previous inventory is streamed, not loaded.
+        """
+        updated = dict((row[0], row) for row in about_data_list)
+        removed = set(self.about_file_path(location)
+                      for location in self.removed_about_files)
+
+        def merged_rows(previous_file):
+            for previous in csv.DictReader(previous_file):
+                about_file = previous['about_file']
+                if about_file in removed:
+                    continue
+                if about_file in updated:
+                    yield updated.pop(about_file)
+                else:
+                    yield [previous.get(column) or '' for column in CSV_COLUMNS]
+            for row in about_data_list:
+                if row[0] in updated:
+                    yield row
+
+        # the output can replace the previous inventory in place
+        output_path = self.output_path
+        if exists(output_path) and abspath(output_path) == abspath(previous_path):
+            # keep the compression extension of the output
+            root = strip_compression_extension(output_path)
+            output_path = root + '.tmp' + output_path[len(root):]
+        with open_compressed(previous_path, 'rb') as previous_file:
+            self.write_to_csv(sorted_rows(merged_rows(previous_file)), output_path)
+        if output_path != self.output_path:
+            os.remove(self.output_path)
+            os.rename(output_path, self.output_path)
+
+    def write_to_jsonl(self, output_path=None):
+        """
+        Write a JSON Lines inventory at output_path with one record per
+        stored about object. The ABOUT files are all parsed beforehand; the
+        records are built and written one at a time rather than held in
+        memory. See about_object_jsonl_record for the record structure.
+        Return a tuple of (warnings count, errors count).
+        """
+        warnings_count = errors_count = 0
+        with open_compressed(output_path or self.output_path, 'wb',
+                             self.compression_level) as output_file:
+            for about_object in self.about_objects:
+                warnings_count += len(about_object.warnings)
+                errors_count += len(about_object.errors)
+                record = about_object_jsonl_record(self, about_object)
+                output_file.write(json_dumps(record, sort_keys=True) + '\n')
+                self._print_problems(record['about_file'], about_object)
+        return warnings_count, errors_count
+
+    def write_to_sqlite(self, about_data_list, output_path=None):
+        """
+        Upsert the rows of about_data_list, built in the order of the stored
+        about objects, and their problems in the SQLite inventory at
+        output_path. The components of removed ABOUT files are deleted: the
+        removed_about_files of a git range or otherwise the components under
+        the input path that were not collected in this run, leaving the
+        components of other input paths untouched.
+        Return the list of inserted or updated about_file.
+        """
+        inventory = SqliteInventory(output_path or self.output_path)
+        try:
+            components = []
+            for about_object, row in zip(self.about_objects, about_data_list):
+                problems = [[kind, problem.code, problem.field_name,
+                             problem.field_value, problem.message]
+                            for kind, problems in (('error', about_object.errors),
+                                                   ('warning', about_object.warnings))
+                            for problem in problems]
+                components.append((row[:len(COMPONENT_COLUMNS)], problems))
+            if self.git_revisions:
+                removed = set(self.about_file_path(location)
+                              for location in self.removed_about_files)
+            else:
+                collected = set(row[0] for row in about_data_list)
+                scope = self.about_file_path(self.input_path).rstrip('/')
+                removed = set(about_file for about_file in inventory.about_files()
+                              if about_file == scope
+                              or about_file.startswith(scope + '/')) - collected
+            inventory.delete(removed)
+            return inventory.upsert(components)
+        finally:
+            inventory.close()
 
     def generate_attribution(self, template_path='templates/default.html',
-                             sublist = []):
+                             sublist = [], fragment_cache=None):
+        """
+        Generates an attribution file from a list of ABOUT files.
+        The component and license fragments are reused from the optional
+        fragment_cache FragmentCache.
         """
-        Generates an attribution file from a list of ABOUT files
+        template = get_attribution_template(template_path)
+        if not template:
+            return
+
+        with self.profiler.phase('render'):
+            return render_attribution_template(
+                template, self.attribution_components(sublist), fragment_cache)
+
+    def attribution_components(self, sublist=None):
         """
+        Return a list of ComponentProxy for the ABOUT files with an
+        about_resource in sublist or for all the ABOUT files.
+        """
+        # the files referenced by the components are only read when used
+        file_cache = FileContentCache()
+        return [ComponentProxy(about_object.validated_fields,
+                               about_object.file_fields_locations,
+                               file_cache, about_object._read)
+                for about_object in self.about_objects
+                if not sublist
+                or about_object.about_resource_path in sublist]
+
+def get_attribution_template(template_path):
+    """
+    Return the Jinja2 attribution template at template_path or None if it
+    cannot be loaded.
+    """
+    try:
+        from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+    except ImportError:
+        print("""The Jinja2 library is required to generate the attribution.
+        You can install the dependencies using:
+        pip install -r requirements.txt""")
+        return
+
+    template_dir = dirname(template_path)
+    template_name = basename(template_path)
+    env = Environment(loader=FileSystemLoader(template_dir))
+    try:
+        return env.get_template(template_name)
+    except TemplateNotFound as e:
+        print (e.message)  # TODO: needs to return an error
+
+
+class FragmentCache(object):
+    """
+    On-disk cache of rendered attribution fragments, stored as UTF-8 files
+    named after their key in a directory.
+    """
+    def __init__(self, location):
+        self.location = location
+        if not exists(location):
+            os.makedirs(location)
+        # number of fragments reused and rendered
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts):
+        """
+        Return a cache key for a sequence of strings.
+        """
+        import hashlib
+        return hashlib.sha1('\0'.join(parts)).hexdigest()
+
+    def get(self, key):
+        """
+        Return the fragment cached for key or None.
+        """
+        try:
+            with open(join(self.location, key), 'rb') as fragment_file:
+                return fragment_file.read().decode('utf-8')
+        except IOError:
+            return None
+
+    def put(self, key, fragment):
+        """
+        Store the fragment for key. The fragment file is renamed in place so
+        that concurrent renderings never read a partial fragment.
+        """
+        import tempfile
+        fd, temp_location = tempfile.mkstemp(dir=self.location)
+        with os.fdopen(fd, 'wb') as fragment_file:
+            fragment_file.write(fragment.encode('utf-8'))
+        location = join(self.location, key)
+        if os.name == 'nt' and exists(location):
+            os.remove(location)
+        os.rename(temp_location, location)
+
+    def render(self, key, macro, *args):
+        """
+        Return the fragment cached for key or rendered by calling the template
+        macro with args.
+        """
+        fragment = self.get(key)
+        if fragment is None:
+            self.misses += 1
+            fragment = unicode(macro(*args))
+            self.put(key, fragment)
+        else:
+            self.hits += 1
+        return fragment
+
+
+# maximum number of file contents kept by a FileContentCache
+FILE_CONTENT_CACHE_SIZE = 256
+
+
+class FileContentCache(object):
+    """
+    Least recently used cache of the content of the files referenced by the
+    components of an attribution, such as the license texts shared by many
+    components.
+    """
+    def __init__(self, size=FILE_CONTENT_CACHE_SIZE):
+        self.size = size
+        # map of location to a tuple of (last use, content)
+        self.entries = {}
+        self.uses = 0
+        self.reads = 0
+
+    def read(self, location, reader):
+        """
+        Return the content of the file at location, read by calling reader
+        with the location if not cached, or an empty string if the file
+        cannot be read.
+        """
+        self.uses += 1
+        entry = self.entries.get(location)
+        if entry:
+            content = entry[1]
+        else:
+            try:
+                content = reader(location)
+            except (IOError, OSError):
+                content = ''
+            self.reads += 1
+            if len(self.entries) >= self.size:
+                oldest = min(self.entries, key=lambda loc: self.entries[loc][0])
+                del self.entries[oldest]
+        self.entries[location] = (self.uses, content)
+        return content
+
+
+def _read_text(location):
+    with open(location, 'rU') as text_file:
+        return text_file.read()
+
+
+class ComponentProxy(dict):
+    """
+    The validated fields of a component passed to an attribution template.
+    The content of the files referenced by its _file fields is only loaded
+    from a shared FileContentCache when the template uses it:
+     - license_text: the content of the license_text_file
+     - notice_text: the content of the notice_file
+     - file_content(field_name): the content of any _file field
+    """
+    def __init__(self, fields, file_locations, file_cache, reader=_read_text):
+        dict.__init__(self, fields)
+        self.file_locations = file_locations
+        self.file_cache = file_cache
+        self.reader = reader
+
+    def file_content(self, field_name):
+        """
+        Return the content of the file referenced by the field_name field or
+        an empty string.
+        """
+        location = self.file_locations.get(field_name)
+        if not location:
+            return ''
+        return self.file_cache.read(location, self.reader)
+
+    @property
+    def license_text(self):
+        return self.file_content('license_text_file')
+
+    @property
+    def notice_text(self):
+        return self.file_content('notice_file')
+
+
+class LazyList(object):
+    """
+    Read-only sequence of the values returned by function for each of the
+    items, computed when first accessed.
+    """
+    def __init__(self, items, function):
+        self.items = items
+        self.function = function
+        self.values = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self.items)
         try:
-            from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+            return self.values[index]
+        except KeyError:
+            value = self.values[index] = self.function(self.items[index])
+            return value
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def _fields_checksum(fields):
+    import hashlib
+    return hashlib.sha1(repr(sorted(_encode_strings(fields).items()))).hexdigest()
+
+
+def _render_fragment(fragment_cache, checksums, macro, *args):
+    """
+    Return the fragment rendered by calling the template macro with args,
+    reused from the fragment_cache if any for the same checksums.
+    """
+    if not fragment_cache:
+        return macro(*args)
+    key = fragment_cache.key(macro.name, *checksums)
+    return fragment_cache.render(key, macro, *args)
+
+
+def render_attribution_template(template, components, fragment_cache=None,
+                                **context):
+    """
+    Return the attribution rendered with a template from a list of
+    ComponentProxy. The template gets the components as about_objects and
+    their license texts as license_texts, both loaded only when used.
+    The table of contents lists the toc_objects components, each linked to
+    component_url(index). The component_ids are the identifiers of the
+    about_objects used in their anchors. These default to the components,
+    their anchors and their indexes and can be overridden in context, such
+    as for the pages of a split attribution.
+    A template can define component(about_object) and license(about_object,
+    license_text) macros: they are rendered for the components used by the
+    template as fragments passed in the component_fragments and
+    license_fragments lists. With a fragment_cache, the fragments are reused
+    when the fields, the content of the _file fields and the template of a
+    component are unchanged.
+    """
+    module = template.module
+    component = getattr(module, 'component', None)
+    license = getattr(module, 'license', None)
+    indexes = range(len(components))
+    component_fragments = []
+    license_fragments = []
+    if component or license:
+        if not template.filename:
+            # a template without a file cannot be part of the cache keys
+            fragment_cache = None
+        if fragment_cache:
+            import hashlib
+            with open(template.filename, 'rb') as template_file:
+                template_checksum = hashlib.sha1(template_file.read()).hexdigest()
+
+        def checksums(index):
+            if not fragment_cache:
+                return ()
+            about_object = components[index]
+            files = hashlib.sha1()
+            for field_name in sorted(about_object.file_locations):
+                if not field_name.endswith('_file'):
+                    continue
+                content = about_object.file_content(field_name)
+                if isinstance(content, unicode):
+                    content = content.encode('utf-8')
+                files.update('%s %d\n' % (field_name, len(content)))
+                files.update(content)
+            return (template_checksum, _fields_checksum(about_object),
+                    files.hexdigest())
+        keys = LazyList(indexes, checksums)
+
+        if component:
+            component_fragments = LazyList(indexes, lambda index: _render_fragment(
+                fragment_cache, keys[index], component, components[index]))
+        if license:
+            license_fragments = LazyList(indexes, lambda index: _render_fragment(
+                fragment_cache, keys[index], license, components[index],
+                components[index].license_text))
+    license_texts = LazyList(components, lambda about_object: about_object.license_text)
+    values = {
+        'about_objects': components,
+        'license_texts': license_texts,
+        'component_fragments': component_fragments,
+        'license_fragments': license_fragments,
+        'toc_objects': components,
+        'component_ids': indexes,
+        'component_url': component_anchor,
+    }
+    values.update(context)
+    return template.render(**values)
+
+
+def component_anchor(index):
+    """
+    Return the link to the component at index in an attribution page.
+    """
+    return '#component_%d' % index
+
+
+# minimum, maximum and default compression levels of the compressed output
+# codecs by file extension. The .zst zstd codec requires the zstandard
+# library.
+COMPRESSION_LEVELS = {'.gz': (1, 9, 6), '.zst': (1, 22, 3)}
+
+
+def compression_extension(location):
+    """
+    Return the compression extension of the file at location or None.
+    """
+    extension = os.path.splitext(location)[1].lower()
+    if extension in COMPRESSION_LEVELS:
+        return extension
+
+
+def strip_compression_extension(location):
+    """
+    Return location without its compression extension, if any.
+    """
+    if compression_extension(location):
+        return os.path.splitext(location)[0]
+    return location
+
+
+def check_compression(location, compression_level=None):
+    """
+    Return an error message if the file at location cannot be compressed or
+    decompressed, or cannot be compressed with compression_level, or None.
+    """
+    extension = compression_extension(location)
+    if not extension:
+        return
+    if extension == '.zst':
+        try:
+            import zstandard
         except ImportError:
-            print("""The Jinja2 library is required to generate the attribution.
-            You can install the dependencies using:
-            pip install -r requirements.txt""")
+            return ('The zstandard library is required for .zst files. '
+                    'You can install it using: pip install zstandard')
+    minimum, maximum, _ = COMPRESSION_LEVELS[extension]
+    if compression_level is not None and not minimum <= compression_level <= maximum:
+        return ('The compression level of %s files must be between %d and %d.'
+                % (extension, minimum, maximum))
+
+
+def open_compressed(location, mode='rb', compression_level=None):
+    """
+    Return a file object to read or write the file at location opened with
+    mode. The content of .gz and .zst files is decompressed as it is read or
+    compressed as it is written, in binary mode, with compression_level or
+    the default level of the codec. The universal newlines 'U' mode only
+    applies to files that are not compressed.
+    """
+    extension = compression_extension(location)
+    if not extension:
+        return open(location, mode)
+    mode = mode.replace('U', '')
+    if 'b' not in mode:
+        mode += 'b'
+    minimum, maximum, default_level = COMPRESSION_LEVELS[extension]
+    level = compression_level or default_level
+    writing = 'w' in mode or 'a' in mode
+    if extension == '.gz':
+        import gzip
+        if writing:
+            return gzip.GzipFile(location, mode, compresslevel=level)
+        return gzip.GzipFile(location, mode)
+    import io
+    import zstandard
+    raw_file = open(location, 'wb' if writing else 'rb')
+    if writing:
+        stream = zstandard.ZstdCompressor(level=level).stream_writer(raw_file)
+    else:
+        # buffered to iterate over the lines of the decompressed content
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw_file))
+    return ZstdFile(stream, raw_file, writing)
+
+
+class ZstdFile(object):
+    """
+    A zstd compression writer or buffered decompression reader stream over
+    a raw_file. Closing it ends the compressed frame when writing and
+    always closes the raw_file, whatever the zstandard version does when
+    closing the stream.
+    """
+    def __init__(self, stream, raw_file, writing):
+        self.stream = stream
+        self.raw_file = raw_file
+        self.writing = writing
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.raw_file.closed:
+            return
+        try:
+            if self.writing:
+                import zstandard
+                self.stream.flush(zstandard.FLUSH_FRAME)
+        finally:
+            self.raw_file.close()
+
+
+def is_csv_output(location):
+    return strip_compression_extension(location).lower().endswith('.csv')
+
+
+def is_jsonl_output(location):
+    return strip_compression_extension(location).lower().endswith('.jsonl')
+
+
+def problem_record(problem):
+    """
+    Return a mapping for a Warn or Error problem.
+    """
+    return {'code': problem.code, 'field_name': problem.field_name,
+            'field_value': problem.field_value, 'message': problem.message}
+
+
+def about_object_jsonl_record(collector, about_object):
+    """
+    Return a JSON Lines inventory record mapping for an about_object of a
+    collector with these keys:
+     - about_file: the about_file path as in the CSV inventory
+     - location: the location of the ABOUT file
+     - fields: a mapping of the validated field names and values
+     - file_locations: a mapping of the _file and about_resource field
+       names to the location of the referenced files
+     - warnings and errors: lists of problem mappings with code,
+       field_name, field_value and message keys
+    """
+    return {
+        'about_file': collector.about_file_path(about_object.location),
+        'location': about_object.location,
+        'fields': about_object.validated_fields,
+        'file_locations': about_object.file_fields_locations,
+        'warnings': [problem_record(w) for w in about_object.warnings],
+        'errors': [problem_record(e) for e in about_object.errors],
+    }
+
+
+def _escape_bytes(error):
+    """
+    Decoding error handler replacing each byte that is not valid UTF-8 with
+    a lone low surrogate U+DC80 to U+DCFF, reversed by _unescape_bytes.
+    """
+    return (u''.join(unichr(0xdc00 + ord(byte))
+                     for byte in error.object[error.start:error.end]),
+            error.end)
+
+codecs.register_error('aboutcode.escape', _escape_bytes)
+
+ESCAPED_BYTES = re.compile(u'[\udc80-\udcff]')
+
+
+def _unescape_bytes(value):
+    """
+    Return the UTF-8 byte string of a unicode value with the bytes escaped
+    by _escape_bytes restored.
+    """
+    if not ESCAPED_BYTES.search(value):
+        return value.encode('utf-8')
+    return ''.join(chr(ord(char) - 0xdc00) if ESCAPED_BYTES.match(char)
+                   else char.encode('utf-8') for char in value)
+
+
+def _decode_strings(value):
+    """
+    Return value with the byte strings decoded to unicode for JSON as
+    UTF-8. The bytes that are not valid UTF-8, such as in some ABOUT files
+    written on Windows, are escaped as lone surrogates that _encode_strings
+    turns back into the original bytes. Tuples become lists as in JSON.
+    """
+    if isinstance(value, str):
+        return value.decode('utf-8', 'aboutcode.escape')
+    if isinstance(value, dict):
+        return dict((_decode_strings(key), _decode_strings(item))
+                    for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_decode_strings(item) for item in value]
+    return value
+
+
+def json_dumps(value, **kwargs):
+    """
+    Return the JSON string of a value holding byte strings read from ABOUT
+    files, which may not be valid UTF-8. See _decode_strings and use
+    _encode_strings on the loaded value for the reverse.
+    """
+    import json
+    return json.dumps(_decode_strings(value), **kwargs)
+
+
+def _encode_strings(value):
+    """
+    Return value with the unicode strings decoded from JSON encoded to
+    byte strings, as read from ABOUT files: UTF-8 with the bytes escaped by
+    _decode_strings restored.
+    """
+    if isinstance(value, unicode):
+        return _unescape_bytes(value)
+    if isinstance(value, dict):
+        return dict((_encode_strings(key), _encode_strings(item))
+                    for key, item in value.items())
+    if isinstance(value, list):
+        return [_encode_strings(item) for item in value]
+    return value
+
+
+def read_jsonl_inventory(location):
+    """
+    Yield the records of the JSON Lines inventory at location one at a time.
+    See about_object_jsonl_record for the record structure.
+    """
+    import json
+    with open_compressed(location, 'rb') as inventory_file:
+        for line in inventory_file:
+            if line.strip():
+                yield _encode_strings(json.loads(line))
+
+
+def generate_attribution_from_records(records, template_path='templates/default.html',
+                                      sublist=None, fragment_cache=None):
+    """
+    Return an attribution rendered from an iterable of JSON Lines inventory
+    records, reading the referenced files such as the license texts from
+    the file_locations of the records when used by the template. The component and license fragments are
+    reused from the optional fragment_cache FragmentCache.
+    """
+    template = get_attribution_template(template_path)
+    if not template:
+        return
+
+    return render_attribution_template(
+        template, attribution_components_from_records(records, sublist),
+        fragment_cache)
+
+
+def attribution_components_from_records(records, sublist=None):
+    """
+    Return a list of ComponentProxy for the JSON Lines inventory records
+    with an about_resource in sublist or for all the records.
+    """
+    file_cache = FileContentCache()
+    components = []
+    for record in records:
+        fields = record['fields']
+        if sublist and fields.get('about_resource') not in sublist:
+            continue
+        components.append(ComponentProxy(fields, record['file_locations'],
+                                         file_cache))
+    return components
+
+
+def shard_index(path, count):
+    """
+    Return the zero-based index of the shard of a posix path among count
+    shards. The index only depends on the path so that it is the same on
+    every machine and run.
+    """
+    import hashlib
+    return int(hashlib.md5(path).hexdigest()[:8], 16) % count
+
+
+def parse_shard(value):
+    """
+    Return a tuple of (zero-based index, count) for a shard value of the form
+    "i/N" where i is a shard number from 1 to N. Raise a ValueError for an
+    invalid value.
+    """
+    number, _, count = value.partition('/')
+    number = int(number)
+    count = int(count)
+    if not 1 <= number <= count:
+        raise ValueError('Invalid shard: %s' % value)
+    return number - 1, count
+
+
+# number of rows sorted in memory before sorted runs are spilled to
+# temporary files
+SORT_BUFFER_ROWS = 10000
+
+
+def sorted_rows(rows, buffer_size=SORT_BUFFER_ROWS):
+    """
+    Yield the rows of an iterable of CSV rows sorted by about_file, their
+    first column. Up to buffer_size rows are sorted in memory. With more
+    rows, each sorted run of buffer_size rows is spilled to a temporary
+    file and the runs are merged, holding only one row per run in memory.
+    """
+    import heapq
+    import tempfile
+
+    def keyed_rows(index, rows):
+        # the run index keeps the sort stable for equal about_file
+        for row in rows:
+            yield row[0], index, row
+
+    runs = []
+    buffer = []
+    try:
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= buffer_size:
+                buffer.sort(key=lambda row: row[0])
+                run = tempfile.TemporaryFile()
+                csv.writer(run).writerows(buffer)
+                run.seek(0)
+                runs.append(run)
+                buffer = []
+        buffer.sort(key=lambda row: row[0])
+        if not runs:
+            for row in buffer:
+                yield row
             return
+        inputs = [keyed_rows(index, csv.reader(run))
+                  for index, run in enumerate(runs)]
+        inputs.append(keyed_rows(len(runs), buffer))
+        for _, _, row in heapq.merge(*inputs):
+            yield row
+    finally:
+        for run in runs:
+            run.close()
+
 
-        template_dir = dirname(template_path)
-        template_name = basename(template_path)
-        env = Environment(loader=FileSystemLoader(template_dir))
+def merge_sorted_csv(input_paths, output_path, compression_level=None):
+    """
+    Write at output_path the rows of the CSV inventories at input_paths,
+    which must be sorted by about_file, merged in about_file order. The
+    inventories are streamed: only one row per input is held in memory.
+    Compressed inputs and output are supported as with open_compressed.
+    Raise a ValueError if an input has other columns or is not sorted.
+    """
+    import heapq
+
+    def keyed_rows(index, reader, input_path):
+        previous = None
+        for row in reader:
+            if previous is not None and row[0] < previous:
+                raise ValueError('%s is not sorted by about_file.' % input_path)
+            previous = row[0]
+            # the input index keeps the merge stable for equal about_file
+            yield row[0], index, row
+
+    input_files = [open_compressed(input_path, 'rb') for input_path in input_paths]
+    try:
+        inputs = []
+        for index, (input_path, input_file) in enumerate(zip(input_paths, input_files)):
+            reader = csv.reader(input_file)
+            if next(reader, None) != CSV_COLUMNS:
+                raise ValueError('%s is not an ABOUT CSV inventory.' % input_path)
+            inputs.append(keyed_rows(index, reader, input_path))
+        with open_compressed(output_path, 'wb', compression_level) as output_file:
+            writer = csv.writer(output_file)
+            writer.writerow(CSV_COLUMNS)
+            for _, _, row in heapq.merge(*inputs):
+                writer.writerow(row)
+    finally:
+        for input_file in input_files:
+            input_file.close()
+
+
+def read_about_fields(location):
+    """
+    Return a mapping of lowercased field names to values read from the ABOUT
+    file at location, without validation.
+    """
+    about_file = AboutFile()
+    about_file.location = location
+    with open(location, 'rU') as file_in:
+        about_file.parse_headers(file_in)
+    about_file.normalize()
+    return about_file.validated_fields
+
+
+class ReferenceIndex(object):
+    """
+    Reverse index from the locations referenced by the about_resource and
+    _file fields of ABOUT files to the locations of these ABOUT files.
+    """
+    def __init__(self):
+        self.references = {}
+        # map of ABOUT file location to the locations it references
+        self.referenced = {}
+
+    @classmethod
+    def from_about_files(cls, locations):
+        index = cls()
+        for location in locations:
+            try:
+                index.add(location, read_about_fields(location))
+            except Exception:
+                # unreadable files are reported when validated
+                continue
+        return index
+
+    def add(self, about_location, fields):
+        about_dir = dirname(about_location)
+        for field_name, value in fields.items():
+            if not value.strip():
+                continue
+            if field_name == 'about_resource' or field_name.endswith('_file'):
+                referenced = abspath(join(about_dir, value.strip()))
+                self.references.setdefault(referenced, set()).add(about_location)
+                self.referenced.setdefault(about_location, set()).add(referenced)
+
+    def remove(self, about_location):
+        for referenced in self.referenced.pop(about_location, ()):
+            about_files = self.references[referenced]
+            about_files.discard(about_location)
+            if not about_files:
+                del self.references[referenced]
+
+    def about_files_for(self, locations):
+        """
+        Return the set of ABOUT file locations referencing any of the
+        locations, directly or through one of their parent directories.
+        """
+        about_files = set()
+        for location in locations:
+            location = abspath(location)
+            while True:
+                about_files.update(self.references.get(location, ()))
+                parent = dirname(location)
+                if parent == location:
+                    break
+                location = parent
+        return about_files
+
+
+def git_paths(location, *args):
+    """
+    Return the locations of the paths listed by the git command args run in
+    the location directory. Paths are relative to location.
+    """
+    import subprocess
+    command = ['git'] + list(args) + ['-z']
+    process = subprocess.Popen(command, cwd=location, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    output, error = process.communicate()
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode,
+                                            ' '.join(command), error)
+    return [abspath(join(location, *path.split('/')))
+            for path in output.split('\0') if path]
+
+
+def git_changed_about_files(location, revisions, reference_index=None):
+    """
+    Return a tuple of (ABOUT files to validate, ABOUT files removed) for the
+    git revisions range in the location directory, such as "HEAD~1..HEAD".
+    The ABOUT files to validate are the ABOUT files changed in this range
+    and the ABOUT files whose about_resource or _file fields reference a
+    changed file or a directory containing a changed file.
+    These references are looked up in the reference_index, such as built
+    from the previous inventory, or else read from all the ABOUT files.
+    """
+    changed = git_paths(location, 'diff', '--name-only', '--relative',
+                        '--no-renames', *revisions.split())
+
+    selected = set(path for path in changed if isvalid_about_file(path))
+    removed = sorted(path for path in selected if not exists(path))
+    selected.difference_update(removed)
+
+    if reference_index is None:
+        about_files = [path for path in git_paths(location, 'ls-files', '--cached',
+                                                  '--others', '--exclude-standard')
+                       if isvalid_about_file(path)]
+        reference_index = ReferenceIndex.from_about_files(
+            path for path in about_files if path not in selected and exists(path))
+    selected.update(path for path in reference_index.about_files_for(changed)
+                    if exists(path))
+    return sorted(selected), removed
+
+
+def find_git_mirror(mirrors_location, repository):
+    """
+    Return the location of the local git mirror of the vcs_repository
+    repository in the mirrors_location directory or None. A mirror is a
+    clone named after the last segment of the repository URL or path, with
+    or without a .git extension. Mirrors are only looked up in the
+    mirrors_location directory.
+    """
+    repository = repository.strip()
+    name = repository.rstrip('/').replace(':', '/').rpartition('/')[2]
+    if name.endswith('.git'):
+        name = name[:-len('.git')]
+    if not name:
+        return
+    for candidate in (name, name + '.git'):
+        location = join(mirrors_location, candidate)
+        if isdir(location):
+            return location
+
+
+def git_existing_objects(location, objects):
+    """
+    Return the set of the objects names, such as revisions or refs, that
+    exist in the git repository at location, either a bare repository or a
+    work tree. All the objects are resolved in a single git cat-file
+    --batch-check process. Names with whitespace are never valid object
+    names and are not looked up.
+    Raise a CalledProcessError if location is not a git repository.
+    """
+    import subprocess
+    git_dir = join(location, '.git')
+    if not isdir(git_dir):
+        git_dir = location
+    # an explicit git dir is never resolved against an enclosing work tree
+    command = ['git', '--git-dir=' + git_dir, 'cat-file', '--batch-check']
+    objects = [name for name in objects if is_git_object_name(name)]
+    if not objects:
+        return set()
+    process = subprocess.Popen(command, cwd=location, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, error = process.communicate(''.join(name + '\n' for name in objects))
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode,
+                                            ' '.join(command), error)
+    # there is one output line per object in the input order
+    lines = output.splitlines()
+    if len(lines) != len(objects):
+        raise ValueError('Expected %d lines of %s output, got %d.'
+                         % (len(objects), ' '.join(command), len(lines)))
+    return set(name for name, line in zip(objects, lines)
+               if not line.endswith(' missing'))
+
+
+def is_git_object_name(name):
+    """
+    Return True if name is not empty and has no whitespace, such that it
+    can be resolved on a line of git cat-file --batch-check.
+    """
+    return name.split() == [name]
+
+
+# map of VCS field to the git object names that may resolve a value
+GIT_VCS_OBJECTS = [
+    ('vcs_revision', ['%s^{commit}']),
+    ('vcs_tag', ['refs/tags/%s']),
+    ('vcs_branch', ['refs/heads/%s', 'refs/remotes/origin/%s']),
+]
+
+
+def verify_vcs_fields(about_objects, mirrors_location):
+    """
+    Add problems to the about_objects which have vcs_revision, vcs_tag or
+    vcs_branch values that do not exist in the local git mirror of their
+    vcs_repository in the mirrors_location directory. The ABOUT files are
+    grouped by repository to check the values of a repository at once.
+    Mirrors that cannot be read with git are reported as warnings.
+    """
+    import subprocess
+    by_mirror = {}
+    for about_object in about_objects:
+        fields = about_object.validated_fields
+        repository = fields.get('vcs_repository', '').strip()
+        if not repository or fields.get('vcs_tool', 'git').strip().lower() != 'git':
+            continue
+        checks = []
+        for field_name, patterns in GIT_VCS_OBJECTS:
+            value = fields.get(field_name, '').strip()
+            if not value:
+                continue
+            if not is_git_object_name(value):
+                msg = 'Not a valid git object name.'
+                about_object.errors.append(Error(VCS, field_name, value, msg))
+                continue
+            checks.append((field_name, value, patterns))
+        if not checks:
+            continue
+        mirror = find_git_mirror(mirrors_location, repository)
+        if not mirror:
+            about_object.warnings.append(Warn(VCS, 'vcs_repository', repository,
+                                              'No local mirror of the repository.'))
+            continue
+        by_mirror.setdefault(mirror, []).append((about_object, checks))
+
+    for mirror, components in by_mirror.items():
+        objects = set(pattern % value for _, checks in components
+                      for _, value, patterns in checks for pattern in patterns)
         try:
-            template = env.get_template(template_name)
-        except TemplateNotFound as e:
-            print (e.message)  # TODO: needs to return an error
+            existing = git_existing_objects(mirror, sorted(objects))
+        except (subprocess.CalledProcessError, OSError) as e:
+            for about_object, _ in components:
+                about_object.warnings.append(Warn(VCS, 'vcs_repository', mirror,
+                                                  'Cannot read the local mirror of the repository: %s',
+                                                  str(e).strip()))
+            continue
+        for about_object, checks in components:
+            for field_name, value, patterns in checks:
+                if not any(pattern % value in existing for pattern in patterns):
+                    msg = 'Not found in the local mirror of the repository.'
+                    about_object.errors.append(Error(VCS, field_name, value, msg))
+
+
+SQLITE_EXTENSIONS = ('.sqlite', '.db')
+
+COMPONENT_COLUMNS = ['about_file'] + MANDATORY_FIELDS + OPTIONAL_FIELDS
+
+PROBLEM_COLUMNS = ['about_file', 'kind', 'code', 'field_name', 'field_value',
+                   'message']
+
+
+def is_sqlite_output(location):
+    return location.lower().endswith(SQLITE_EXTENSIONS)
+
+
+class SqliteInventory(object):
+    """
+    Inventory stored in a SQLite database at location with a components
+    table of the ABOUT fields of each about_file, a problems table of their
+    warnings and errors and a licenses table of their SPDX license ids and
+    DejaCode license, indexed for lookups by path, name and version and
+    license.
+    Rows are upserted: a component row and its problems and licenses are
+    only written when its fields or problems changed since the last run.
+    """
+    batch_size = 500
+
+    def __init__(self, location):
+        import sqlite3
+        self.location = location
+        self.connection = sqlite3.connect(location)
+        self.connection.text_factory = str
+        self.create_schema()
+
+    def create_schema(self):
+        columns = ', '.join('"%s" TEXT' % column
+                            for column in COMPONENT_COLUMNS[1:])
+        problem_columns = ', '.join('"%s" TEXT' % column
+                                    for column in PROBLEM_COLUMNS[1:])
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS components (
+                    about_file TEXT PRIMARY KEY, %s, digest TEXT);
+                CREATE TABLE IF NOT EXISTS problems (about_file TEXT, %s);
+                CREATE TABLE IF NOT EXISTS licenses (about_file TEXT, license TEXT);
+                CREATE INDEX IF NOT EXISTS components_about_resource
+                    ON components (about_resource);
+                CREATE INDEX IF NOT EXISTS components_name_version
+                    ON components (name COLLATE NOCASE, version);
+                CREATE INDEX IF NOT EXISTS problems_about_file
+                    ON problems (about_file);
+                CREATE INDEX IF NOT EXISTS licenses_about_file
+                    ON licenses (about_file);
+                CREATE INDEX IF NOT EXISTS licenses_license
+                    ON licenses (license);
+            """ % (columns, problem_columns))
+
+    @staticmethod
+    def digest(row, problems):
+        import hashlib
+        return hashlib.sha1(repr((row, problems))).hexdigest()
+
+    def digests(self):
+        """
+        Return a mapping of about_file to the digest of the stored rows.
+        """
+        return dict(self.connection.execute(
+            'SELECT about_file, digest FROM components'))
+
+    def upsert(self, components):
+        """
+        Insert or update components from an iterable of (row, problems)
+        where row is a list of COMPONENT_COLUMNS values and problems is a
+        list of PROBLEM_COLUMNS values without the about_file.
+        Unchanged components are skipped. Writes are done in batches of
+        batch_size components per transaction.
+        Return the list of inserted or updated about_file.
+        """
+        existing = self.digests()
+        changed = []
+        batch = []
+        for row, problems in components:
+            digest = self.digest(row, problems)
+            if existing.get(row[0]) == digest:
+                continue
+            batch.append((row, problems, digest))
+            changed.append(row[0])
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+        return changed
+
+    def _write_batch(self, batch):
+        about_files = [(row[0],) for row, _, _ in batch]
+        placeholders = ', '.join('?' * (len(COMPONENT_COLUMNS) + 1))
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM problems WHERE about_file = ?', about_files)
+            self.connection.executemany(
+                'DELETE FROM licenses WHERE about_file = ?', about_files)
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO components VALUES (%s)' % placeholders,
+                [list(row) + [digest] for row, _, digest in batch])
+            self.connection.executemany(
+                'INSERT INTO problems VALUES (?, ?, ?, ?, ?, ?)',
+                [[row[0]] + list(problem)
+                 for row, problems, _ in batch for problem in problems])
+            self.connection.executemany(
+                'INSERT INTO licenses VALUES (?, ?)',
+                [(row[0], license) for row, _, _ in batch
+                 for license in self.row_licenses(row)])
+
+    @staticmethod
+    def row_licenses(row):
+        record = dict(zip(COMPONENT_COLUMNS, row))
+        return sorted(set(InventoryIndex.record_licenses(record)))
+
+    def delete(self, about_files):
+        """
+        Delete the components, problems and licenses of about_files.
+        """
+        about_files = [(about_file,) for about_file in about_files]
+        with self.connection:
+            for table in ('components', 'problems', 'licenses'):
+                self.connection.executemany(
+                    'DELETE FROM %s WHERE about_file = ?' % table, about_files)
+
+    def about_files(self):
+        return [about_file for (about_file,) in self.connection.execute(
+                'SELECT about_file FROM components ORDER BY about_file')]
+
+    def lookup(self, path=None, name=None, version=None, license=None):
+        """
+        Return the list of component records matching all the provided
+        criteria, sorted by about_file. A path matches the about_file or the
+        about_resource of a component. Name and license lookups are
+        case-insensitive.
+        """
+        conditions = []
+        params = []
+        if path:
+            path = posixpath.normpath(path)
+            conditions.append('(about_file = ? OR about_resource = ?)')
+            params += [path, posixpath.basename(path)]
+        if name:
+            conditions.append('name = ? COLLATE NOCASE')
+            params.append(name.strip())
+        if version:
+            conditions.append('version = ?')
+            params.append(version.strip())
+        if license:
+            conditions.append('about_file IN '
+                              '(SELECT about_file FROM licenses WHERE license = ?)')
+            params.append(license.strip().lower())
+        where = ' AND '.join(conditions) or '1'
+        columns = ', '.join('"%s"' % column for column in COMPONENT_COLUMNS)
+        cursor = self.connection.execute(
+            'SELECT %s FROM components WHERE %s ORDER BY about_file'
+            % (columns, where), params)
+        records = [dict(zip(COMPONENT_COLUMNS, row)) for row in cursor]
+        if path:
+            # an about_resource only matches in the directory of the about_file
+            records = [record for record in records if path in
+                       InventoryIndex.record_paths(record)]
+        return records
+
+    def problems(self, about_file):
+        """
+        Return the list of problem records of the about_file component.
+        """
+        cursor = self.connection.execute(
+            'SELECT * FROM problems WHERE about_file = ? ORDER BY rowid',
+            (about_file,))
+        return [dict(zip(PROBLEM_COLUMNS, row)) for row in cursor]
+
+    def close(self):
+        self.connection.close()
+
+
+# fields with an inverted index of their values to the components in an
+# InventoryIndex by default
+INDEXED_FIELDS = ['name', 'version', 'owner', 'dje_license',
+                  'license_spdx'] + FLAG_FIELDS
+
+
+class InventoryIndex(object):
+    """
+    In-memory index of an inventory for lookups of components by path, name,
+    version and license and for boolean queries over indexed fields.
+    Each component is a record mapping of its ABOUT fields with its
+    about_file path and warnings and errors lists.
+    Each indexed field has an inverted index of its values to the
+    about_file of the components: the license_spdx values are split in
+    license ids and the other values are used as a whole. Lookups are
+    case-insensitive for field values.
+    """
+    def __init__(self, fields=INDEXED_FIELDS):
+        self.records = {}
+        # map of ABOUT and resource paths to the about_file of a record
+        self.by_path = {}
+        # map of license_spdx ids and dje_license to about_file
+        self.by_license = {}
+        # sorted ABOUT and resource paths for lookups by directory
+        self.paths = []
+        # map of field name to the inverted index of this field values
+        self.fields = dict((field_name, {}) for field_name in fields)
+        for field_name in ('name', 'version'):
+            self.fields.setdefault(field_name, {})
+
+    @classmethod
+    def from_collector(cls, collector, fields=INDEXED_FIELDS):
+        index = cls(fields)
+        for about_object in collector.about_objects:
+            index.add(about_object_record(collector, about_object))
+        return index
+
+    @staticmethod
+    def record_paths(record):
+        about_file = record['about_file']
+        paths = [about_file]
+        resource = record.get('about_resource', '').strip()
+        if resource:
+            paths.append(posixpath.normpath(
+                posixpath.join(posixpath.dirname(about_file), resource)))
+        return paths
+
+    @staticmethod
+    def record_licenses(record):
+        licenses = spdx_license_ids(record.get('license_spdx', ''))
+        if record.get('dje_license', '').strip():
+            licenses.append(record['dje_license'].strip())
+        return [license.lower() for license in licenses]
+
+    @staticmethod
+    def field_tokens(field_name, value):
+        """
+        Return the indexed tokens of a field value.
+        """
+        if field_name == 'license_spdx':
+            return [sid.lower() for sid in spdx_license_ids(value)]
+        return [value.strip().lower()]
+
+    def add(self, record):
+        about_file = record['about_file']
+        self.remove(about_file)
+        self.records[about_file] = record
+        for path in self.record_paths(record):
+            if path not in self.by_path:
+                bisect.insort(self.paths, path)
+            self.by_path.setdefault(path, set()).add(about_file)
+        for license in self.record_licenses(record):
+            self.by_license.setdefault(license, set()).add(about_file)
+        for field_name, inverted in self.fields.items():
+            for token in self.field_tokens(field_name, record.get(field_name, '')):
+                inverted.setdefault(token, set()).add(about_file)
+
+    def remove(self, about_file):
+        record = self.records.pop(about_file, None)
+        if not record:
             return
+        for path in self.record_paths(record):
+            self._discard(self.by_path, path, about_file)
+            if path not in self.by_path:
+                del self.paths[bisect.bisect_left(self.paths, path)]
+        for license in self.record_licenses(record):
+            self._discard(self.by_license, license, about_file)
+        for field_name, inverted in self.fields.items():
+            for token in self.field_tokens(field_name, record.get(field_name, '')):
+                self._discard(inverted, token, about_file)
+
+    @staticmethod
+    def _discard(mapping, key, about_file):
+        about_files = mapping.get(key)
+        if about_files is not None:
+            about_files.discard(about_file)
+            if not about_files:
+                del mapping[key]
+
+    def update(self, collector, locations):
+        """
+        Update the records of the ABOUT files at locations from the current
+        about objects of the collector, e.g. after a collector refresh.
+        """
+        about_objects = dict((about_object.location, about_object)
+                             for about_object in collector.about_objects)
+        for location in locations:
+            self.remove(collector.about_file_path(location))
+            if location in about_objects:
+                self.add(about_object_record(collector, about_objects[location]))
+
+    def under(self, directory):
+        """
+        Return the set of about_file of the components with an ABOUT file or
+        resource under directory.
+        """
+        prefix = directory.rstrip('/') + '/'
+        about_files = set()
+        start = bisect.bisect_left(self.paths, prefix)
+        for path in self.paths[start:]:
+            if not path.startswith(prefix):
+                break
+            about_files.update(self.by_path[path])
+        return about_files
+
+    def find(self, field_name, value):
+        """
+        Return the set of about_file of the components with a field_name
+        matching value. Besides the fields, the "path", "under" and
+        "license" names can be used as for lookup. Fields that are not
+        indexed are matched with a scan of the records.
+        """
+        if field_name == 'path':
+            return set(self.by_path.get(value.rstrip('/'), ()))
+        if field_name == 'under':
+            return self.under(value)
+        if field_name == 'license':
+            return set(self.by_license.get(value.lower(), ()))
+        token = value.strip().lower()
+        if field_name in self.fields:
+            return set(self.fields[field_name].get(token, ()))
+        return set(about_file for about_file, record in self.records.items()
+                   if token in self.field_tokens(field_name,
+                                                 record.get(field_name, '')))
+
+    def lookup(self, path=None, under=None, name=None, version=None,
+               license=None):
+        """
+        Return the list of component records matching all the provided
+        criteria, sorted by about_file.
+        """
+        matches = None
+        criteria = [('path', path), ('under', under), ('name', name),
+                    ('version', version), ('license', license)]
+        for field_name, value in criteria:
+            if value is None:
+                continue
+            found = self.find(field_name, value)
+            matches = found if matches is None else matches & found
+        if matches is None:
+            matches = self.records
+        return [self.records[about_file] for about_file in sorted(matches)]
+
+    def query(self, expression):
+        """
+        Return the list of component records matching a boolean query
+        expression, sorted by about_file. An expression combines
+        field:value terms with the and, or and not operators and
+        parentheses, such as:
+            license_spdx:GPL-2.0 and redistribute:yes and not owner:"ACME Inc"
+        Terms are evaluated as set operations on the inverted indexes.
+        """
+        matches = QueryParser(self, expression).parse()
+        return [self.records[about_file] for about_file in sorted(matches)]
+
+    def save(self, location):
+        """
+        Save the records and indexes as JSON at location.
+        """
+        serialized = {
+            'records': self.records,
+            'by_path': self._serialize(self.by_path),
+            'by_license': self._serialize(self.by_license),
+            'fields': dict((field_name, self._serialize(inverted))
+                           for field_name, inverted in self.fields.items()),
+        }
+        with open(location, 'wb') as index_file:
+            index_file.write(json_dumps(serialized))
+
+    @staticmethod
+    def _serialize(mapping):
+        return dict((key, sorted(values)) for key, values in mapping.items())
+
+    @classmethod
+    def load(cls, location):
+        """
+        Return an InventoryIndex loaded from a JSON file saved at location.
+        """
+        import json
+        with open(location, 'rb') as index_file:
+            serialized = _encode_strings(json.load(index_file))
+        index = cls(serialized['fields'].keys())
+        index.records = serialized['records']
+        index.by_path = cls._deserialize(serialized['by_path'])
+        index.by_license = cls._deserialize(serialized['by_license'])
+        index.paths = sorted(index.by_path)
+        for field_name, inverted in serialized['fields'].items():
+            index.fields[field_name] = cls._deserialize(inverted)
+        return index
+
+    @staticmethod
+    def _deserialize(mapping):
+        return dict((key, set(values)) for key, values in mapping.items())
+
+
+class QueryParser(object):
+    """
+    Parse and evaluate a boolean query expression against an InventoryIndex.
+    The not operator binds tighter than and, which binds tighter than or.
+    """
+    tokenizer = re.compile(r'\(|\)|[^\s()"]+:"[^"]*"|"[^"]*"|[^\s()]+')
+
+    def __init__(self, index, expression):
+        self.index = index
+        self.tokens = self.tokenizer.findall(expression)
+        self.position = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError('Empty query.')
+        matches = self.parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError('Unexpected query token: %s'
+                             % self.tokens[self.position])
+        return matches
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError('Unexpected end of query.')
+        self.position += 1
+        return token
+
+    def parse_or(self):
+        matches = self.parse_and()
+        while (self.peek() or '').lower() == 'or':
+            self.next()
+            matches = matches | self.parse_and()
+        return matches
+
+    def parse_and(self):
+        matches = self.parse_not()
+        while (self.peek() or '').lower() == 'and':
+            self.next()
+            matches = matches & self.parse_not()
+        return matches
+
+    def parse_not(self):
+        if (self.peek() or '').lower() == 'not':
+            self.next()
+            return set(self.index.records) - self.parse_not()
+        return self.parse_term()
+
+    def parse_term(self):
+        token = self.next()
+        if token == '(':
+            matches = self.parse_or()
+            if self.next() != ')':
+                raise ValueError('Missing closing parenthesis in query.')
+            return matches
+        field_name, colon, value = token.partition(':')
+        if not colon or not field_name:
+            raise ValueError('Invalid query term, use field:value: %s' % token)
+        if value.startswith('"') and value.endswith('"') and len(value) > 1:
+            value = value[1:-1]
+        return self.index.find(field_name.lower(), value)
+
+
+def about_object_record(collector, about_object):
+    """
+    Return an inventory record mapping for an about_object of a collector.
+    """
+    record = dict(about_object.validated_fields)
+    record['about_file'] = collector.about_file_path(about_object.location)
+    record['warnings'] = [repr(w) for w in about_object.warnings]
+    record['errors'] = [repr(e) for e in about_object.errors]
+    return record
+
+
+class PollingWatcher(object):
+    """
+    Detect the files created, modified or deleted under a location by
+    comparing the modification time and size of all its files every interval
+    seconds.
+    """
+    def __init__(self, location, interval=1.0):
+        self.location = location
+        self.interval = interval
+        self.state = self.scan()
+
+    def scan(self):
+        if not isdir(self.location):
+            return {self.location: self.signature(self.location)}
+        state = {}
+        for root, _, filenames in walk(self.location):
+            for filename in filenames:
+                location = join(root, filename)
+                state[location] = self.signature(location)
+        return state
+
+    @staticmethod
+    def signature(location):
+        return stat_signature(location)
+
+    def wait(self):
+        """
+        Wait for interval seconds and return the list of changed locations.
+        """
+        time.sleep(self.interval)
+        previous, self.state = self.state, self.scan()
+        return [location for location in set(previous) | set(self.state)
+                if previous.get(location) != self.state.get(location)]
+
+    def close(self):
+        pass
+
 
-        # We only need the fields names and values to render the template
-        about_validated_fields = [about_object.validated_fields 
-                                  for about_object in self.about_objects 
-                                  if not sublist 
-                                  or about_object.about_resource_path in sublist]
+class InotifyWatcher(object):
+    """
+    Receive the files created, modified, moved or deleted under a location
+    from inotify events. This requires Linux and the pyinotify library.
+    """
+    def __init__(self, location, interval=1.0):
+        import pyinotify
+        self.interval = interval
+        self.changed = set()
+        self.watch_manager = pyinotify.WatchManager()
+        mask = (pyinotify.IN_CLOSE_WRITE | pyinotify.IN_CREATE
+                | pyinotify.IN_DELETE | pyinotify.IN_MOVED_FROM
+                | pyinotify.IN_MOVED_TO | pyinotify.IN_ATTRIB)
+        self.watch_manager.add_watch(location, mask, rec=True, auto_add=True)
+        self.notifier = pyinotify.Notifier(self.watch_manager,
+                                           default_proc_fun=self.add_event,
+                                           timeout=int(interval * 1000))
+
+    def add_event(self, event):
+        self.changed.add(event.pathname)
+
+    def wait(self):
+        """
+        Wait up to interval seconds for events and return the list of
+        changed locations.
+        """
+        if self.notifier.check_events():
+            self.notifier.read_events()
+            self.notifier.process_events()
+        changed, self.changed = list(self.changed), set()
+        return changed
+
+    def close(self):
+        self.notifier.stop()
+
+
+def get_watcher(location, interval=1.0):
+    """
+    Return an inotify watcher for location if pyinotify is available or a
+    polling watcher otherwise.
+    """
+    try:
+        return InotifyWatcher(location, interval)
+    except (ImportError, OSError):
+        return PollingWatcher(location, interval)
+
+
+def watch(collector, on_change, ignored=(), watcher=None):
+    """
+    Keep the collector inventory up to date until interrupted: on each change
+    of the files under the collector input path, re-validate the affected
+    ABOUT files and call on_change with the set of refreshed ABOUT file
+    locations. Changes to the ignored locations, such as the outputs, or
+    to files under an ignored directory are not reported. The ignored list
+    is read again after each change so that on_change can extend it with
+    the locations of new outputs.
+    """
+    watcher = watcher or get_watcher(collector.input_path)
+    try:
+        while True:
+            changed = [abspath(location) for location in watcher.wait()]
+            prefixes = [abspath(location) for location in ignored if location]
+            changed = [location for location in changed
+                       if not is_under(location, prefixes)]
+            if not changed:
+                continue
+            refreshed = collector.refresh(changed)
+            if refreshed:
+                on_change(refreshed)
+    finally:
+        watcher.close()
+
+
+def is_under(location, directories):
+    """
+    Return True if location is one of the directories or a path under one
+    of them.
+    """
+    for directory in directories:
+        if location == directory or location.startswith(directory.rstrip(os.sep) + os.sep):
+            return True
+    return False
 
-        about_license_text = [about_object.license_text() 
-                              for about_object in self.about_objects 
-                              if not sublist 
-                              or about_object.about_resource_path in sublist]
-        return template.render(about_objects = about_validated_fields, 
-                               license_texts = about_license_text)
 
 def isvalid_about_file(file_name):
     """
@@ -1020,15 +3748,19 @@ def syntax():
     print("""
 Syntax:
     about.py [Options] [Input] [Output]
-    Input can be a file or directory.
-    Output must be a file with a .csv extension.
+    Input can be a file, a directory or a zip or tar archive.
+    Output must be a file with a .csv or .jsonl extension or a SQLite database
+    with a .sqlite or .db extension. An existing SQLite database is updated in
+    place: only the changed components are written. A CSV or JSON Lines output
+    with an additional .gz or .zst extension is compressed with gzip or zstd.
 """)
 
 
 def option_usage():
     print("""
 Options:
-    --overwrite          Overwrites the output file if it exists
+    --overwrite          Overwrites the output file if it exists. Without this option,
+                         an existing SQLite output is updated in place
     -v,--version         Display current version, license notice, and copyright notice
     -h,--help            Display help
     --verbosity  <arg>   Print more or less verbose messages while processing ABOUT files
@@ -1036,6 +3768,50 @@ Options:
             0 - Do not print any warning or error messages, just a total count (default)
             1 - Print error messages
             2 - Print error and warning messages
+    --profile <path>     Write a JSON report of the wall and CPU time spent in each
+                         processing phase and validator to <path>
+    --pstats <path>      Dump the cProfile statistics of the run to a .pstats file
+    --memory-report <path>
+                         Write a JSON report of the peak RSS and top allocation sites
+                         after each processing phase to <path>
+    --git-range <revisions>
+                         Only validate the ABOUT files changed in a git revision
+                         range (e.g. HEAD~1..HEAD) of the input directory and the
+                         ABOUT files referencing files changed in this range. With
+                         --merge-into, these references are taken from the previous
+                         inventory. Otherwise, or if the about_file paths of the
+                         previous inventory are not under the input path, all the
+                         ABOUT files are read to find these references
+    --merge-into <path>  Merge the validated rows into the previous CSV inventory at
+                         <path>, dropping the rows of removed ABOUT files. The merged
+                         rows are sorted by about_file as with --sorted
+    --watch              Keep running after the first run and refresh the output when
+                         files change, re-validating only the affected ABOUT files
+    --verify-checksums   Verify the checksum_sha1, checksum_md5 and checksum_sha256
+                         fields against the about_resource files. The checksums of
+                         directories are computed from the checksums of their files
+                         and subdirectories
+    --checksum-cache <path>
+                         Verify the checksums, loading and saving the computed
+                         checksums in a JSON cache at <path> so that only the files
+                         and directories changed since the last run are read again
+    --vcs-mirrors <path> Verify the vcs_revision, vcs_tag and vcs_branch fields of git
+                         repositories against their local mirrors in the <path>
+                         directory, named after the last segment of vcs_repository
+    --shard <i/N>        Only process the ABOUT files of the i-th of N shards, assigned
+                         by a stable hash of their path, and sort the output rows by
+                         about_file. Merge the shard outputs with aboutmerge.py
+    --sorted             Sort the rows of a CSV output by about_file for a stable,
+                         diff-friendly output. Large outputs are sorted with temporary
+                         files rather than in memory. The rows of other runs are in
+                         the order the ABOUT files are found: use --sorted for a run
+                         comparable to merged shards or a --merge-into output
+    --summary            Print the number of warnings and errors by problem and field
+    --pipeline           Walk the input directory, read the ABOUT files and parse them
+                         concurrently, for input directories on high-latency storage
+    --compression-level <n>
+                         Compression level of a CSV or JSON Lines output compressed
+                         with gzip or zstd, as selected by a .gz or .zst extension
 """)
 
 
@@ -1058,6 +3834,12 @@ under the License.""" % __version__)
 def main(args, opts):
     overwrite = False
     opt_arg_num = '0'
+    profile_path = pstats_path = memory_report_path = None
+    git_revisions = merge_path = None
+    watch_mode = False
+    checksum_cache = checksum_cache_path = None
+    vcs_mirrors = shard = compression_level = None
+    sorted_output = show_summary = pipelined = False
     for opt, opt_arg in opts:
         invalid_opt = True
         if opt in ('-h', '--help'):
@@ -1083,6 +3865,80 @@ def main(args, opts):
             invalid_opt = False
             overwrite = True
 
+        if opt in ('--profile',):
+            invalid_opt = False
+            profile_path = abspath(opt_arg)
+
+        if opt in ('--pstats',):
+            invalid_opt = False
+            pstats_path = abspath(opt_arg)
+
+        if opt in ('--memory-report',):
+            invalid_opt = False
+            memory_report_path = abspath(opt_arg)
+
+        if opt in ('--git-range',):
+            invalid_opt = False
+            git_revisions = opt_arg
+
+        if opt in ('--merge-into',):
+            invalid_opt = False
+            if not exists(opt_arg):
+                print('The CSV inventory to merge into does not exist.')
+                option_usage()
+                sys.exit(errno.EINVAL)
+            merge_path = abspath(opt_arg)
+
+        if opt in ('--watch',):
+            invalid_opt = False
+            watch_mode = True
+
+        if opt in ('--verify-checksums',):
+            invalid_opt = False
+            checksum_cache = checksum_cache or ChecksumCache()
+
+        if opt in ('--checksum-cache',):
+            invalid_opt = False
+            checksum_cache_path = abspath(opt_arg)
+            checksum_cache = ChecksumCache.load(checksum_cache_path)
+
+        if opt in ('--vcs-mirrors',):
+            invalid_opt = False
+            if not isdir(opt_arg):
+                print('The VCS mirrors directory does not exist.')
+                option_usage()
+                sys.exit(errno.EINVAL)
+            vcs_mirrors = abspath(opt_arg)
+
+        if opt in ('--shard',):
+            invalid_opt = False
+            try:
+                shard = parse_shard(opt_arg)
+            except ValueError:
+                print('Invalid shard, use i/N with i from 1 to N.')
+                option_usage()
+                sys.exit(errno.EINVAL)
+
+        if opt in ('--sorted',):
+            invalid_opt = False
+            sorted_output = True
+
+        if opt in ('--summary',):
+            invalid_opt = False
+            show_summary = True
+
+        if opt in ('--pipeline',):
+            invalid_opt = False
+            pipelined = True
+
+        if opt in ('--compression-level',):
+            invalid_opt = False
+            if not opt_arg.isdigit():
+                print('Invalid compression level: %s' % opt_arg)
+                option_usage()
+                sys.exit(errno.EINVAL)
+            compression_level = int(opt_arg)
+
         if invalid_opt:
             assert False, 'Unsupported option.'
 
@@ -1109,28 +3965,91 @@ def main(args, opts):
         option_usage()
         sys.exit(errno.EISDIR)
 
-    if not output_path.endswith('.csv'):
-        print("Output file name must end with '.csv'")
+    if watch_mode and (git_revisions or merge_path):
+        print('The --watch option cannot be combined with --git-range or --merge-into.')
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    if git_revisions and not isdir(input_path):
+        print('Input must be a directory in a git repository when using --git-range.')
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    sqlite_output = is_sqlite_output(output_path)
+    if not (is_csv_output(output_path) or sqlite_output
+            or is_jsonl_output(output_path)):
+        print("Output file name must end with '.csv', '.jsonl', '.sqlite' or '.db', "
+              "optionally followed by '.gz' or '.zst' for a CSV or JSON Lines output")
         syntax()
         option_usage()
         sys.exit(errno.EINVAL)
 
-    if exists(output_path) and not overwrite:
+    compression_error = (check_compression(output_path, compression_level)
+                         or (merge_path and check_compression(merge_path)))
+    if compression_error:
+        print(compression_error)
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    if shard and (watch_mode or merge_path or not is_csv_output(output_path)):
+        print('The --shard option requires a CSV output and cannot be combined '
+              'with --watch or --merge-into.')
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    if (merge_path or sorted_output) and not is_csv_output(output_path):
+        print('The --merge-into and --sorted options only apply to a CSV output.')
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    if exists(output_path) and not overwrite and not sqlite_output:
         print('Output file already exists. Select a different file name or use '
               'the --overwrite option.')
         option_usage()
         sys.exit(errno.EEXIST)
 
-    if not exists(output_path) or (exists(output_path) and overwrite):
-        collector = AboutCollector(input_path, output_path, opt_arg_num)
-        collector.extract_about_info()
+    if not exists(output_path) or overwrite or sqlite_output:
+        if sqlite_output and overwrite and exists(output_path):
+            os.remove(output_path)
+        profiler = get_profiler(profile_path, pstats_path, memory_report_path)
+        profiler.start()
+        try:
+            collector = AboutCollector(input_path, output_path, opt_arg_num,
+                                       profiler, git_revisions, checksum_cache,
+                                       vcs_mirrors, shard, sorted_output,
+                                       pipelined, compression_level,
+                                       previous_inventory=merge_path)
+            collector.extract_about_info(merge_path)
+            if show_summary:
+                print_problems_summary(summarize_problems(collector.about_objects))
+            if checksum_cache_path:
+                checksum_cache.save(checksum_cache_path)
+        finally:
+            profiler.stop()
+
+        if watch_mode:
+            def on_change(refreshed):
+                collector.extract_about_info()
+                if checksum_cache_path:
+                    checksum_cache.save(checksum_cache_path)
+            print('Watching %s for changes. Press Ctrl+C to stop.' % input_path)
+            try:
+                watch(collector, on_change,
+                      ignored=[output_path, output_path + '-journal',
+                               checksum_cache_path])
+            except KeyboardInterrupt:
+                pass
     else:
         # we should never reach this
         assert False, "Unsupported option(s)."
 
 
 if __name__ == "__main__":
-    longopts = ['help', 'version', 'overwrite', 'verbosity=']
+    longopts = ['help', 'version', 'overwrite', 'verbosity=', 'profile=',
+                'pstats=', 'memory-report=', 'git-range=', 'merge-into=',
+                'watch', 'verify-checksums', 'checksum-cache=',
+                'vcs-mirrors=', 'shard=', 'sorted', 'summary', 'pipeline',
+                'compression-level=']
     try:
         opts, args = getopt.getopt(sys.argv[1:], 'hv', longopts)
     except Exception as e:
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+# =============================================================================
+#  Copyright (c) 2013 by nexB, Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# =============================================================================
+
+"""
+This is a tool to merge the CSV inventories written by about.py runs with
+the --shard option into a single inventory sorted by about_file, identical
+to the output of a single about.py run with the --sorted option.
+The shard inventories are streamed and never loaded in memory.
+"""
+
+from __future__ import print_function
+
+import errno
+import getopt
+import sys
+from os.path import abspath, exists, isdir
+
+from about import check_compression, is_csv_output, merge_sorted_csv
+
+
+__version__ = '0.9.0'
+
+
+def syntax():
+    print("""
+Syntax:
+    aboutmerge.py [Options] [Output] [Shard Inventory]...
+    Output must be a file with a .csv extension.
+    Each Shard Inventory is a CSV file written by about.py with the --shard
+    option, sorted by about_file.
+    The output and the shard inventories are compressed with gzip or zstd when
+    they have an additional .gz or .zst extension.
+""")
+
+
+def option_usage():
+    print("""
+Options:
+    --overwrite          Overwrites the output file if it exists
+    -v,--version         Display current version, license notice, and copyright notice
+    -h,--help            Display help
+    --compression-level <n>
+                         Compression level of an output compressed with gzip or zstd
+""")
+
+
+def version():
+    print("""
+ABOUT CODE: Version: %s
+Copyright (c) 2013 nexB Inc. All rights reserved.
+http://dejacode.org
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations
+under the License.""" % __version__)
+
+
+def main(args, opts):
+    overwrite = False
+    compression_level = None
+    for opt, opt_arg in opts:
+        invalid_opt = True
+        if opt in ('-h', '--help'):
+            syntax()
+            option_usage()
+            sys.exit(0)
+
+        if opt in ('-v', '--version'):
+            version()
+            sys.exit(0)
+
+        if opt in ('--overwrite',):
+            invalid_opt = False
+            overwrite = True
+
+        if opt in ('--compression-level',):
+            invalid_opt = False
+            if not opt_arg.isdigit():
+                print('Invalid compression level: %s' % opt_arg)
+                option_usage()
+                sys.exit(errno.EINVAL)
+            compression_level = int(opt_arg)
+
+        if invalid_opt:
+            assert False, 'Unsupported option.'
+
+    if len(args) < 2:
+        print('Output and shard inventories parameters are mandatory.')
+        syntax()
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    output_path = abspath(args[0])
+    input_paths = args[1:]
+
+    if not is_csv_output(output_path):
+        print("Output file name must end with '.csv', optionally followed by "
+              "'.gz' or '.zst'")
+        syntax()
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    if isdir(output_path):
+        print('Output must be a file, not a directory.')
+        option_usage()
+        sys.exit(errno.EISDIR)
+
+    if exists(output_path) and not overwrite:
+        print('Output file already exists. Select a different file name or use '
+              'the --overwrite option.')
+        option_usage()
+        sys.exit(errno.EEXIST)
+
+    for input_path in input_paths:
+        if not exists(input_path):
+            print('Shard inventory does not exist: %s' % input_path)
+            option_usage()
+            sys.exit(errno.EEXIST)
+        if abspath(input_path) == output_path:
+            print('Output must not be one of the shard inventories.')
+            option_usage()
+            sys.exit(errno.EINVAL)
+
+    compression_error = check_compression(output_path, compression_level)
+    for input_path in input_paths:
+        compression_error = compression_error or check_compression(input_path)
+    if compression_error:
+        print(compression_error)
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    try:
+        merge_sorted_csv(input_paths, output_path, compression_level)
+    except ValueError as e:
+        print(e)
+        sys.exit(errno.EINVAL)
+
+
+if __name__ == "__main__":
+    longopts = ['help', 'version', 'overwrite', 'compression-level=']
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hv', longopts)
+    except Exception as e:
+        print(repr(e))
+        syntax()
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    main(args, opts)
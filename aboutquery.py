@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+# =============================================================================
+#  Copyright (c) 2013 by nexB, Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# =============================================================================
+
+"""
+This is a tool to query the inventory of a set of .ABOUT files with boolean
+filters on indexed fields, such as:
+    license_spdx:GPL-2.0 and redistribute:yes
+The inventory index can be saved to avoid collecting the .ABOUT files again
+for repeated queries.
+"""
+
+from __future__ import print_function
+from __future__ import with_statement
+
+import errno
+import getopt
+import sys
+from os.path import abspath, exists
+
+from about import AboutCollector, InventoryIndex, INDEXED_FIELDS
+
+
+__version__ = '0.9.0'
+
+
+def load_index(input_path, fields=INDEXED_FIELDS):
+    """
+    Return an InventoryIndex loaded from a saved index if input_path is a
+    .json file or built by collecting the .ABOUT files at input_path.
+    """
+    if input_path.lower().endswith('.json'):
+        return InventoryIndex.load(input_path)
+    collector = AboutCollector(input_path, None, '0')
+    return InventoryIndex.from_collector(collector, fields)
+
+
+def syntax():
+    print("""
+Syntax:
+    aboutquery.py [Options] [Input] [Query]
+    Input can be a file, a directory, a zip or tar archive or a .json index
+    saved with the --save-index option.
+    Query combines field:value terms with the and, or and not operators and
+    parentheses, e.g.: 'license_spdx:GPL-2.0 and redistribute:yes'
+    Besides the ABOUT fields, the path, under and license terms look up
+    components by path, by directory and by SPDX or DejaCode license.
+    The about_file of each matching component is printed.
+""")
+
+
+def option_usage():
+    print("""
+Options:
+    -v,--version         Display current version, license notice, and copyright notice
+    -h,--help            Display help
+    --fields <names>     Comma-separated names of the fields to index
+                         (default: %s)
+    --save-index <path>  Save the inventory index as JSON to <path> for later queries
+    --show <names>       Comma-separated names of fields to print for each component
+""" % ','.join(INDEXED_FIELDS))
+
+
+def version():
+    print("""
+ABOUT CODE: Version: %s
+Copyright (c) 2013 nexB Inc. All rights reserved.
+http://dejacode.org
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations
+under the License.""" % __version__)
+
+
+def main(args, opts):
+    fields = INDEXED_FIELDS
+    index_path = None
+    shown_fields = []
+    for opt, opt_arg in opts:
+        invalid_opt = True
+        if opt in ('-h', '--help'):
+            syntax()
+            option_usage()
+            sys.exit(0)
+
+        if opt in ('-v', '--version'):
+            version()
+            sys.exit(0)
+
+        if opt in ('--fields',):
+            invalid_opt = False
+            fields = [name.strip().lower() for name in opt_arg.split(',')
+                      if name.strip()]
+
+        if opt in ('--save-index',):
+            invalid_opt = False
+            index_path = abspath(opt_arg)
+
+        if opt in ('--show',):
+            invalid_opt = False
+            shown_fields = [name.strip().lower() for name in opt_arg.split(',')
+                            if name.strip()]
+
+        if invalid_opt:
+            assert False, 'Unsupported option.'
+
+    if not (len(args) == 2 or (len(args) == 1 and index_path)):
+        print('Input and query parameters are mandatory.')
+        syntax()
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    input_path = args[0]
+    if not exists(input_path):
+        print('Input path does not exist.')
+        option_usage()
+        sys.exit(errno.EEXIST)
+
+    index = load_index(input_path, fields)
+    if index_path:
+        index.save(index_path)
+
+    if len(args) < 2:
+        return
+
+    try:
+        records = index.query(args[1])
+    except ValueError as e:
+        print(e)
+        syntax()
+        sys.exit(errno.EINVAL)
+
+    for record in records:
+        values = [record['about_file']] + [record.get(name, '')
+                                           for name in shown_fields]
+        print('\t'.join(values))
+
+
+if __name__ == "__main__":
+    longopts = ['help', 'version', 'fields=', 'save-index=', 'show=']
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hv', longopts)
+    except Exception as e:
+        print(repr(e))
+        syntax()
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    main(args, opts)
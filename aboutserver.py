@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+# =============================================================================
+#  Copyright (c) 2013 by nexB, Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# =============================================================================
+
+"""
+This is a local server that collects and validates a set of .ABOUT files once
+and keeps the inventory in memory to answer lookups of components by path,
+name, version and license over HTTP on localhost.
+"""
+
+from __future__ import print_function
+from __future__ import with_statement
+
+import errno
+import getopt
+import sys
+import time
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from os.path import exists, isabs, join
+
+from about import AboutCollector, InventoryIndex, json_dumps
+
+
+__version__ = '0.9.0'
+
+DEFAULT_PORT = 8723
+
+LOOKUP_CRITERIA = ['path', 'under', 'name', 'version', 'license']
+
+
+class InventoryServer(HTTPServer):
+    """
+    HTTP server holding a collector and its inventory index.
+    """
+    def __init__(self, collector, port=DEFAULT_PORT):
+        HTTPServer.__init__(self, ('127.0.0.1', port), InventoryRequestHandler)
+        self.collector = collector
+        self.index = InventoryIndex.from_collector(collector)
+
+    def refresh(self, paths=None):
+        """
+        Refresh the ABOUT files affected by a change of the files at paths,
+        relative to the collector input path, or collect all the ABOUT files
+        again if no path is provided. Return the refreshed ABOUT locations.
+        """
+        collector = self.collector
+        if not paths:
+            collector.collect_about_files()
+            collector.create_about_objects_from_files()
+            self.index = InventoryIndex.from_collector(collector)
+            return [about_object.location for about_object in collector.about_objects]
+
+        locations = [path if isabs(path) else join(collector.input_path, path)
+                     for path in paths]
+        refreshed = collector.refresh(locations)
+        self.index.update(collector, refreshed)
+        return sorted(refreshed)
+
+
+class InventoryRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answer these GET requests with JSON:
+     - /components?path=&under=&name=&version=&license= for the components
+       matching all the provided criteria
+     - /query?q= for the components matching a boolean query expression
+     - /refresh?path= to refresh the ABOUT files affected by changed paths
+       or all ABOUT files if no path is provided
+     - /stats for the inventory size
+    """
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        params = urlparse.parse_qs(url.query)
+        started = time.time()
+        if url.path == '/components':
+            criteria = dict((str(name), params[name][0])
+                            for name in LOOKUP_CRITERIA if name in params)
+            result = {'components': self.server.index.lookup(**criteria)}
+        elif url.path == '/query':
+            expression = params.get('q', [''])[0]
+            try:
+                result = {'components': self.server.index.query(expression)}
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+        elif url.path == '/refresh':
+            result = {'refreshed': self.server.refresh(params.get('path'))}
+        elif url.path == '/stats':
+            result = {'components': len(self.server.index.records)}
+        else:
+            self.send_error(404, 'Unknown request: %s' % url.path)
+            return
+        result['elapsed'] = time.time() - started
+        self.send_json(result)
+
+    def send_json(self, result):
+        content = json_dumps(result, sort_keys=True)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # only log requests when verbose
+        if self.server.collector.display_error_and_warning:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+def syntax():
+    print("""
+Syntax:
+    aboutserver.py [Options] [Input]
+    Input can be a file, a directory or a zip or tar archive.
+""")
+
+
+def option_usage():
+    print("""
+Options:
+    -v,--version         Display current version, license notice, and copyright notice
+    -h,--help            Display help
+    --port <int>         The localhost port to listen on (default %d)
+    --verbosity  <arg>   Print more or less verbose messages while processing ABOUT files
+        <arg>
+            0 - Do not print any warning or error messages (default)
+            1 - Print error messages
+            2 - Print error and warning messages and log requests
+""" % DEFAULT_PORT)
+
+
+def version():
+    print("""
+ABOUT CODE: Version: %s
+Copyright (c) 2013 nexB Inc. All rights reserved.
+http://dejacode.org
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations
+under the License.""" % __version__)
+
+
+def main(args, opts):
+    opt_arg_num = '0'
+    port = DEFAULT_PORT
+    for opt, opt_arg in opts:
+        invalid_opt = True
+        if opt in ('-h', '--help'):
+            syntax()
+            option_usage()
+            sys.exit(0)
+
+        if opt in ('-v', '--version'):
+            version()
+            sys.exit(0)
+
+        if opt in ('--verbosity',):
+            invalid_opt = False
+            valid_opt_args = ['0', '1', '2']
+            if not opt_arg or not opt_arg in valid_opt_args:
+                print("Invalid option argument.")
+                option_usage()
+                sys.exit(errno.EINVAL)
+            else:
+                opt_arg_num = opt_arg
+
+        if opt in ('--port',):
+            invalid_opt = False
+            if not opt_arg.isdigit():
+                print("Invalid option argument.")
+                option_usage()
+                sys.exit(errno.EINVAL)
+            port = int(opt_arg)
+
+        if invalid_opt:
+            assert False, 'Unsupported option.'
+
+    if not len(args) == 1:
+        print('Input parameter is mandatory.')
+        syntax()
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    input_path = args[0]
+    if not exists(input_path):
+        print('Input path does not exist.')
+        option_usage()
+        sys.exit(errno.EEXIST)
+
+    collector = AboutCollector(input_path, None, opt_arg_num)
+    server = InventoryServer(collector, port)
+    print('Serving the inventory of %d ABOUT files at http://127.0.0.1:%d/'
+          % (len(server.index.records), port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    longopts = ['help', 'version', 'verbosity=', 'port=']
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hv', longopts)
+    except Exception as e:
+        print(repr(e))
+        syntax()
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    main(args, opts)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+# =============================================================================
+#  Copyright (c) 2013 by nexB, Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# =============================================================================
+
+"""
+Benchmarks to track the performance of the ABOUT tool across changes.
+"""
+
+from __future__ import print_function
+
+import errno
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from os.path import abspath, dirname, join
+
+
+# modules that are only needed by some features and must not be imported at
+# startup by the command line tools
+LAZY_MODULES = ['httplib', 'socket', 'urlparse', 'datetime', 'email.parser',
+                'jinja2', 'json', 'cProfile', 'zipfile', 'tarfile',
+                'subprocess', 'pyinotify', 'sqlite3',
+                'hashlib', 'multiprocessing', 'threading', 'Queue', 'gzip',
+                'zstandard']
+
+CLI_MODULES = ['about', 'genabout', 'genattrib']
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.time()
+import %s
+elapsed = time.time() - start
+print(repr((elapsed, [m for m in %r if sys.modules.get(m)])))
+"""
+
+
+def import_module(module):
+    """
+    Return a tuple of (import time in seconds, lazy modules loaded) for the
+    import of module in a fresh interpreter.
+    """
+    script = IMPORT_SCRIPT % (module, LAZY_MODULES)
+    # measure imports from compiled modules, as installed tools do
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    output = subprocess.check_output([sys.executable, '-c', script],
+                                     cwd=dirname(abspath(__file__)), env=env)
+    elapsed, loaded = eval(output)
+    return elapsed, loaded
+
+
+def bench_import(modules=CLI_MODULES, runs=20):
+    """
+    Print the minimum and median import time of each module and the lazy
+    modules loaded at import.
+    """
+    for module in modules:
+        # a first import compiles the modules
+        import_module(module)
+        timings = []
+        for _ in range(runs):
+            elapsed, loaded = import_module(module)
+            timings.append(elapsed)
+        timings.sort()
+        print('import %-12s min: %7.2f ms  median: %7.2f ms  lazy modules loaded: %s'
+              % (module, timings[0] * 1000, timings[len(timings) // 2] * 1000,
+                 ', '.join(loaded) or 'none'))
+
+
+SAMPLE_ABOUT = """about_resource: component%(index)d.tar.gz
+name: Component %(index)d
+version: 1.%(index)d
+download_url: http://example.com/component%(index)d.tar.gz
+license_spdx: Apache-2.0
+copyright: Copyright (c) example.com
+"""
+
+
+def create_about_files(location, count):
+    """
+    Create count small ABOUT files spread in sub-directories of location.
+    """
+    for index in range(count):
+        directory = join(location, 'dir%d' % (index // 100))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(join(directory, 'component%d.ABOUT' % index), 'wb') as f:
+            f.write(SAMPLE_ABOUT % {'index': index})
+
+
+def drop_caches():
+    """
+    Drop the OS page cache and return True, or return False if this is not
+    permitted.
+    """
+    try:
+        subprocess.call(['sync'])
+        with open('/proc/sys/vm/drop_caches', 'wb') as f:
+            f.write('3\n')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def bench_files(count=5000, runs=3):
+    """
+    Print the files per second of reading and parsing many small ABOUT files
+    with file objects and pipelined reads, with cold and warm caches.
+    """
+    sys.path.insert(0, dirname(abspath(__file__)))
+    import about
+
+    def read_with_file_objects(locations):
+        for location in locations:
+            about.AboutFile(location)
+
+    def read_pipelined(locations):
+        for location, content in about.pipelined_reads(iter(locations)):
+            about.AboutFile.from_string(content, location)
+
+    readers = [('file objects', read_with_file_objects),
+               ('pipelined', read_pipelined)]
+
+    location = tempfile.mkdtemp()
+    try:
+        create_about_files(location, count)
+        locations = about.AboutCollector(location, None, '0').about_files
+        for caches in ('cold', 'warm'):
+            if caches == 'cold' and not drop_caches():
+                print('files: cold caches skipped: cannot drop the page cache')
+                continue
+            for name, read in readers:
+                timings = []
+                for _ in range(runs):
+                    if caches == 'cold':
+                        drop_caches()
+                    start = time.time()
+                    read(locations)
+                    timings.append(time.time() - start)
+                print('files %-12s %s caches: %8.0f files/s'
+                      % (name, caches, count / min(timings)))
+    finally:
+        shutil.rmtree(location)
+
+
+BENCHMARKS = {
+    'files': bench_files,
+    'import': bench_import,
+}
+
+
+def syntax():
+    print("""
+Syntax:
+    benchmarks.py [Benchmark]...
+    Benchmark can be one of: %s
+    All the benchmarks are run if none is provided.
+""" % ', '.join(sorted(BENCHMARKS)))
+
+
+def main(args):
+    for name in args:
+        if name not in BENCHMARKS:
+            print('Unknown benchmark: %s' % name)
+            syntax()
+            sys.exit(errno.EINVAL)
+
+    for name in args or sorted(BENCHMARKS):
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -64,6 +64,32 @@ class GenAboutTest(unittest.TestCase):
         self.assertFalse(gen.warnings, "No warnings should be returned.")
         self.assertTrue(len(list) == 1, "The length of the list should be 1.")
 
+    def test_read_input_jsonl(self):
+        gen = genabout.GenAbout()
+        test_input = "testdata/test_files_for_genabout/about.jsonl"
+        list = gen.read_input(test_input)
+        self.assertTrue(len(gen.errors) == 1, "This should return only 1 error.")
+        self.assertEqual([[{'about_file': 'about.py.ABOUT', 'about_resource': '.',
+                            'name': 'ABOUT tool', 'version': '0.8.1',
+                            'license_spdx': 'Apache-2.0'}]], list)
+        self.assertTrue(isinstance(list[0][0]['name'], str))
+
+    def test_read_input_gzip_compressed(self):
+        import gzip
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            test_input = os.path.join(tmp_dir, 'about.csv.gz')
+            with open("testdata/test_files_for_genabout/about.csv", 'rb') as f:
+                content = f.read()
+            compressed = gzip.GzipFile(test_input, 'wb')
+            compressed.write(content)
+            compressed.close()
+            gen = genabout.GenAbout()
+            expected = gen.read_input("testdata/test_files_for_genabout/about.csv")
+            self.assertEqual(expected, genabout.GenAbout().read_input(test_input))
+        finally:
+            shutil.rmtree(tmp_dir)
+
     def test_pre_generation_about_exists_action_0(self):
         gen = genabout.GenAbout()
         gen_location = "testdata/test_files_for_genabout/"
@@ -171,6 +197,75 @@ class GenAboutTest(unittest.TestCase):
         self.assertTrue(len(gen.warnings) == 1, "Should return 1 warning.")
         self.assertFalse(gen.errors, "No errors should be returned.")
 
+    def test_populate_checksums(self):
+        import hashlib
+        import about
+        tmpdir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(tmpdir, 'a.c'), 'wb') as f:
+                f.write('a content')
+            gen = genabout.GenAbout()
+            input_list = [[os.path.join(tmpdir, 'a.c.ABOUT'),
+                           {'about_resource': 'a.c', 'checksum_md5': 'bad'}],
+                          [os.path.join(tmpdir, 'b.c.ABOUT'),
+                           {'about_resource': 'a.c'}],
+                          [os.path.join(tmpdir, 'c.c.ABOUT'),
+                           {'about_resource': 'c.c'}]]
+            cache = about.ChecksumCache()
+            gen.populate_checksums(input_list, cache)
+            for items in input_list[:2]:
+                self.assertEqual(hashlib.sha1('a content').hexdigest(), items[1]['checksum_sha1'])
+                self.assertEqual(hashlib.md5('a content').hexdigest(), items[1]['checksum_md5'])
+                self.assertEqual(hashlib.sha256('a content').hexdigest(), items[1]['checksum_sha256'])
+            self.assertFalse('checksum_sha1' in input_list[2][1])
+            self.assertTrue(len(gen.warnings) == 2, "Should return 2 warnings.")
+
+            cache_location = os.path.join(tmpdir, 'cache.json')
+            cache.save(cache_location)
+            loaded = about.ChecksumCache.load(cache_location)
+            self.assertEqual(cache.entries, loaded.entries)
+            self.assertEqual({}, about.ChecksumCache.load(os.path.join(tmpdir, 'none')).entries)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_populate_checksums_of_unreadable_files(self):
+        import about
+        tmpdir = tempfile.mkdtemp()
+        original = about.compute_checksums
+        def compute_checksums(location, *args):
+            raise IOError('Permission denied')
+        about.compute_checksums = compute_checksums
+        try:
+            with open(os.path.join(tmpdir, 'a.c'), 'wb') as f:
+                f.write('a content')
+            gen = genabout.GenAbout()
+            input_list = [[os.path.join(tmpdir, 'a.c.ABOUT'), {'about_resource': 'a.c'}]]
+            gen.populate_checksums(input_list, about.ChecksumCache())
+            self.assertFalse('checksum_sha1' in input_list[0][1])
+            self.assertEqual(['about_resource'], [e.field_name for e in gen.errors])
+        finally:
+            about.compute_checksums = original
+            shutil.rmtree(tmpdir)
+
+    def test_populated_directory_checksums_verify(self):
+        import about
+        tmpdir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(tmpdir, 'a.c'), 'wb') as f:
+                f.write('a content')
+            with open(os.path.join(tmpdir, 'a.c.ABOUT'), 'wb') as f:
+                f.write('about_resource: a.c\nname: a\nversion: 1\n')
+            gen = genabout.GenAbout()
+            input_list = [[os.path.join(tmpdir, 'lib.ABOUT'),
+                           {'about_resource': '.', 'name': 'lib', 'version': '1'}]]
+            gen.populate_checksums(input_list, about.ChecksumCache())
+            gen.write_output(gen.format_output(input_list))
+            collector = about.AboutCollector(os.path.join(tmpdir, 'lib.ABOUT'), None, '0',
+                                             checksum_cache=about.ChecksumCache())
+            self.assertEqual([], collector.about_objects[0].errors)
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 if __name__ == "__main__":
     unittest.main()
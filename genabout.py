@@ -23,7 +23,7 @@ file location, origin and license of the software components etc.
 from __future__ import print_function
 from collections import namedtuple
 from os import makedirs
-from os.path import exists, dirname, join, abspath, isdir
+from os.path import exists, dirname, join, abspath, isdir, isfile
 import about
 import csv
 import errno
@@ -49,7 +49,10 @@ class GenAbout(object):
         self.errors = []
 
     def read_input(self, input_file):
-        csvfile = csv.DictReader(open(input_file, 'rb'))
+        if about.is_jsonl_output(input_file):
+            csvfile = self.read_jsonl_input(input_file)
+        else:
+            csvfile = csv.DictReader(about.open_compressed(input_file, 'rb'))
         components_list = []
         for line in csvfile:
             file_list = []
@@ -76,6 +79,19 @@ class GenAbout(object):
         return components_list
 
 
+    @staticmethod
+    def read_jsonl_input(input_file):
+        """
+        Yield a row mapping of the about_file and field values for each record
+        of a JSON Lines inventory, as read from a CSV input.
+        """
+        for record in about.read_jsonl_inventory(input_file):
+            line = dict.fromkeys(about.MANDATORY_FIELDS, '')
+            line.update(record['fields'])
+            line['about_file'] = record['about_file']
+            yield line
+
+
     def verify_license_files(self, input_list, path):
         """
         Verify the existence of the 'license text file'
@@ -173,6 +189,42 @@ class GenAbout(object):
         return output_list
 
 
+    def populate_checksums(self, input_list, checksum_cache):
+        """
+        Fill the checksum fields of the components to generate with the
+        checksums of their about_resource file or directory, located relative
+        to the generated ABOUT file. Each file is read once for all the checksums
+        and files already hashed with the same modification time and size
+        are taken from the checksum_cache.
+        """
+        resources = []
+        for items in input_list:
+            about_file_location = items[0]
+            line = items[1]
+            resource_location = abspath(join(dirname(about_file_location),
+                                             line['about_resource']))
+            if exists(resource_location):
+                resources.append((line, resource_location))
+            else:
+                self.warnings.append(Warn('about_resource', resource_location,
+                                          "File doesn't exist. Checksums are not populated."))
+
+        locations = [resource_location for _, resource_location in resources]
+        checksums = checksum_cache.checksums(filter(isfile, locations))
+        checksums.update(checksum_cache.tree_checksums(filter(isdir, locations)))
+        for line, resource_location in resources:
+            if checksums[resource_location] is None:
+                self.errors.append(Error('about_resource', resource_location,
+                                         "Cannot read the file. Checksums are not populated."))
+                continue
+            for field_name, digest in checksums[resource_location].items():
+                previous = line.get(field_name, '').strip().lower()
+                if previous and previous != digest:
+                    self.warnings.append(Warn(field_name, line[field_name],
+                                              "Replaced by the checksum of the about_resource file."))
+                line[field_name] = digest
+
+
     def format_output(self, input_list):
         """
         process the input and covert to the specific strings format
@@ -258,7 +310,8 @@ def syntax():
     print("""
 Syntax:
     genabout.py [Options] [Input File] [Generated Location]
-    Input File         - The input CSV file
+    Input File         - The input CSV file or a .jsonl inventory written by about.py,
+                         optionally compressed with a .gz or .zst extension
     Generated Location - the output location where the ABOUT files should be generated
 """)
 
@@ -303,6 +356,18 @@ Options:
         <Path>
             Path to the project location
                 e.g. /home/user/project/
+    --populate-checksums Fill the checksum_sha1, checksum_md5 and checksum_sha256 fields
+                         with the checksums of the about_resource files
+    --checksum-cache <Path>
+                         Load and save the checksums computed with --populate-checksums
+                         in a JSON cache at <Path> to avoid hashing the unchanged files
+                         again on the next generation
+    --profile <Path>     Write a JSON report of the wall and CPU time spent in each
+                         processing phase and validator to <Path>
+    --pstats <Path>      Dump the cProfile statistics of the run to a .pstats file
+    --memory-report <Path>
+                         Write a JSON report of the peak RSS and top allocation sites
+                         after each processing phase to <Path>
 """)
 
 
@@ -311,6 +376,9 @@ def main(args, opts):
     verb_arg_num = '0'
     all_in_one = False
     project_path = ''
+    profile_path = pstats_path = memory_report_path = None
+    populate_checksums = False
+    checksum_cache_path = None
     for opt, opt_arg in opts:
         invalid_opt = True
         if opt in ('-h', '--help'):
@@ -362,6 +430,26 @@ def main(args, opts):
             else:
                 project_path = opt_arg
 
+        if opt in ('--populate-checksums',):
+            invalid_opt = False
+            populate_checksums = True
+
+        if opt in ('--checksum-cache',):
+            invalid_opt = False
+            checksum_cache_path = abspath(opt_arg)
+
+        if opt in ('--profile',):
+            invalid_opt = False
+            profile_path = abspath(opt_arg)
+
+        if opt in ('--pstats',):
+            invalid_opt = False
+            pstats_path = abspath(opt_arg)
+
+        if opt in ('--memory-report',):
+            invalid_opt = False
+            memory_report_path = abspath(opt_arg)
+
         if invalid_opt:
             assert False, 'Unsupported option.'
 
@@ -383,20 +471,45 @@ def main(args, opts):
     if not _exists(gen_location):
         print(gen_location, ': Generated location does not exist.')
         sys.exit(errno.EIO)
+    compression_error = about.check_compression(input_file)
+    if compression_error:
+        print(compression_error)
+        sys.exit(errno.EINVAL)
 
-    gen = GenAbout()
-    input_list = gen.read_input(input_file)
-    if project_path:
-        license_list = gen.verify_license_files(input_list, project_path)
-        gen.copy_license_files(gen_location, license_list)
-
-    components_list = gen.pre_generation(gen_location, input_list, opt_arg_num, all_in_one)
-    formatted_output = gen.format_output(components_list)
-    gen.write_output(formatted_output)
-    gen.warnings_errors_summary(gen_location, verb_arg_num)
+    profiler = about.get_profiler(profile_path, pstats_path, memory_report_path)
+    profiler.start()
+    try:
+        gen = GenAbout()
+        with profiler.phase('read_input'):
+            input_list = gen.read_input(input_file)
+        if project_path:
+            with profiler.phase('copy_license'):
+                license_list = gen.verify_license_files(input_list, project_path)
+                gen.copy_license_files(gen_location, license_list)
+
+        with profiler.phase('pre_generation'):
+            components_list = gen.pre_generation(gen_location, input_list, opt_arg_num, all_in_one)
+        if populate_checksums:
+            with profiler.phase('checksum'):
+                if checksum_cache_path:
+                    checksum_cache = about.ChecksumCache.load(checksum_cache_path)
+                else:
+                    checksum_cache = about.ChecksumCache()
+                gen.populate_checksums(components_list, checksum_cache)
+                if checksum_cache_path:
+                    checksum_cache.save(checksum_cache_path)
+        with profiler.phase('format_output'):
+            formatted_output = gen.format_output(components_list)
+        with profiler.phase('write_output'):
+            gen.write_output(formatted_output)
+        gen.warnings_errors_summary(gen_location, verb_arg_num)
+    finally:
+        profiler.stop()
 
 if __name__ == "__main__":
-    longopts = ['help', 'version', 'action=', 'verbosity=', 'all-in-one=', 'copy_license=']
+    longopts = ['help', 'version', 'action=', 'verbosity=', 'all-in-one=',
+                'copy_license=', 'profile=', 'pstats=', 'memory-report=',
+                'populate-checksums', 'checksum-cache=']
     try:
         opts, args = getopt.getopt(sys.argv[1:], 'hv', longopts)
     except Exception as e:
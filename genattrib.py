@@ -22,25 +22,21 @@ Optionally, one could pass a subset list of specific components for set of
 
 from __future__ import print_function
 from __future__ import with_statement
-from about import AboutCollector
+from about import AboutCollector, FragmentCache, get_profiler, watch
+from about import generate_attribution_from_records, is_jsonl_output
+from about import read_jsonl_inventory, attribution_components_from_records
+from about import get_attribution_template, render_attribution_template
+from about import check_compression, open_compressed, strip_compression_extension
 
-import codecs
 import csv
 import errno
-import fnmatch
 import getopt
-import httplib
-import posixpath
-import socket
-import string
+import os
 import sys
-import urlparse
-from collections import namedtuple
-from datetime import datetime
-from email.parser import HeaderParser
-from os import listdir, walk
-from os.path import exists, dirname, join, abspath, isdir, basename, normpath
-from StringIO import StringIO
+import time
+from os.path import exists, abspath, isdir, basename, splitext
+
+
 __version__ = '0.9.0'
 
 # see http://dejacode.org
@@ -48,20 +44,286 @@ __about_spec_version__ = '0.8.0'
 
 def component_subset_to_sublist(input_path):
     sublist = []
-    with open(input_path, "rU") as f:
+    with open_compressed(input_path, "rU") as f:
         csv_dict = csv.DictReader(f)
         sublist = [row["about_resource"] for row in csv_dict
                    if "about_resource" in row.keys()]
 
     return sublist
 
+def write_attribution(output_path, attrib_str, compression_level=None):
+    if isinstance(attrib_str, unicode):
+        # the rendered templates are unicode, compressed streams take bytes
+        attrib_str = attrib_str.encode('utf-8')
+    with open_compressed(output_path, "w", compression_level) as f:
+        f.write(attrib_str)
+
+
+# the collector or inventory records, the optional FragmentCache and the
+# compression level shared by the batch rendering jobs. They are set before
+# the pool of processes is created so that the forked processes inherit the
+# parsed inventory instead of parsing it again.
+_batch_source = None
+_batch_fragment_cache = None
+_batch_compression_level = None
+
+
+def read_batch_manifest(manifest_path):
+    """
+    Return a list of (subset, template, output) jobs from a CSV manifest
+    with subset, template and output columns. The subset and template are
+    None when empty, to select all the components or the default template.
+    """
+    jobs = []
+    with open(manifest_path, "rU") as f:
+        for row in csv.DictReader(f):
+            subset = (row.get('subset') or '').strip() or None
+            template_path = (row.get('template') or '').strip() or None
+            output_path = (row.get('output') or '').strip()
+            jobs.append((subset, template_path,
+                         abspath(output_path) if output_path else None))
+    return jobs
+
+
+def render_attribution(source, template_path=None, sublist=None,
+                       fragment_cache=None):
+    """
+    Return the attribution rendered from a source AboutCollector or list of
+    JSON Lines inventory records.
+    """
+    kwargs = {'sublist': sublist, 'fragment_cache': fragment_cache}
+    if template_path:
+        kwargs['template_path'] = template_path
+    if isinstance(source, AboutCollector):
+        return source.generate_attribution(**kwargs)
+    return generate_attribution_from_records(source, **kwargs)
+
+
+def render_batch_job(job):
+    """
+    Render and write the attribution of a (subset, template, output) job
+    from the shared batch source. Return a tuple of (output, seconds, error)
+    where error is None or the message of the failure of the job.
+    """
+    subset, template_path, output_path = job
+    start = time.time()
+    try:
+        sublist = component_subset_to_sublist(subset) if subset else None
+        attrib_str = render_attribution(_batch_source, template_path, sublist,
+                                        _batch_fragment_cache)
+        if attrib_str is None:
+            error = 'Cannot load the template: %s' % template_path
+        else:
+            write_attribution(output_path, attrib_str, _batch_compression_level)
+            error = None
+    except Exception as e:
+        error = repr(e)
+    return output_path, time.time() - start, error
+
+
+def render_batch(source, jobs, processes=None, fragment_cache=None,
+                 compression_level=None):
+    """
+    Render the attribution (subset, template, output) jobs with a source
+    collector or list of records, concurrently in a pool of processes that
+    share the source, fragment_cache and compression_level. Return a list of
+    (output, seconds, error) tuples in the order of the jobs. Jobs are
+    rendered in this process if processes is 1 or if processes cannot be
+    forked.
+    """
+    global _batch_source, _batch_fragment_cache, _batch_compression_level
+    _batch_source = source
+    _batch_fragment_cache = fragment_cache
+    _batch_compression_level = compression_level
+    try:
+        if processes == 1 or len(jobs) < 2 or not hasattr(os, 'fork'):
+            return [render_batch_job(job) for job in jobs]
+        from multiprocessing import Pool
+        pool = Pool(processes)
+        try:
+            return pool.map(render_batch_job, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        _batch_source = None
+        _batch_fragment_cache = None
+        _batch_compression_level = None
+
+
+def split_pages(components, page_size=None, by_license=False):
+    """
+    Return a list of (title, indexes) pages splitting a list of components,
+    where indexes are the indexes of the components of a page. Pages have
+    at most page_size components or, by_license, the components of one
+    license each in the order of the first component of each license.
+    """
+    if by_license:
+        pages = []
+        pages_by_license = {}
+        for index, component in enumerate(components):
+            license = component.get('dje_license') or 'Other'
+            if license not in pages_by_license:
+                pages_by_license[license] = []
+                pages.append((license, pages_by_license[license]))
+            pages_by_license[license].append(index)
+        return pages
+    page_size = page_size or len(components) or 1
+    pages = []
+    for start in range(0, len(components), page_size):
+        indexes = range(start, min(start + page_size, len(components)))
+        title = component_name(components[indexes[0]])
+        if len(indexes) > 1:
+            title += ' - ' + component_name(components[indexes[-1]])
+        pages.append((title, indexes))
+    return pages
+
+
+def component_name(component):
+    return component.get('name') or component.get('about_resource') or ''
+
+
+def page_location(output_path, page_number):
+    """
+    Return the location of the page page_number of a split output_path.
+    """
+    root, extension = splitext(strip_compression_extension(output_path))
+    return '%s-%d%s' % (root, page_number, output_path[len(root):])
+
+
+# the template path, components, pages, page locations, index location,
+# component links, optional FragmentCache and compression level of the split
+# attribution being rendered, inherited by the forked processes rendering
+# the pages.
+_split_attribution = None
+
+
+def render_page(page_number):
+    """
+    Render and write the page page_number of the split attribution and
+    return a tuple of (page location, seconds, fragments reused, fragments
+    rendered) where the fragment counts are those of this page.
+    """
+    (template_path, components, pages, locations, output_path, urls,
+     fragment_cache, compression_level) = _split_attribution
+    start = time.time()
+    hits = misses = 0
+    if fragment_cache:
+        hits, misses = fragment_cache.hits, fragment_cache.misses
+    template = get_attribution_template(template_path)
+    indexes = pages[page_number][1]
+    attrib_str = render_attribution_template(
+        template, [components[index] for index in indexes], fragment_cache,
+        component_ids=indexes, component_url=urls.__getitem__, toc_objects=[],
+        index_url=basename(output_path))
+    write_attribution(locations[page_number], attrib_str, compression_level)
+    if fragment_cache:
+        hits, misses = fragment_cache.hits - hits, fragment_cache.misses - misses
+    return locations[page_number], time.time() - start, hits, misses
+
+
+def render_split(components, output_path, template_path='templates/default.html',
+                 page_size=None, by_license=False, processes=None,
+                 fragment_cache=None, compression_level=None):
+    """
+    Write a split attribution of the components: an index page at
+    output_path with the table of contents and one page per split of the
+    components at page_location(output_path, page_number). The pages are
+    rendered concurrently in a pool of processes and written as they are
+    rendered, with the fragment counts of the processes added to the
+    fragment_cache counts. Yield a tuple of (page location, seconds) as each
+    page is written, the index page last. The pages left from a previous
+    split in more pages are removed.
+    """
+    global _split_attribution
+    template = get_attribution_template(template_path)
+    if not template:
+        return
+    pages = split_pages(components, page_size, by_license)
+    locations = [page_location(output_path, page_number)
+                 for page_number in range(1, len(pages) + 1)]
+    # the stable links of the components to their anchors in their pages
+    urls = [None] * len(components)
+    for location, (title, indexes) in zip(locations, pages):
+        for index in indexes:
+            urls[index] = '%s#component_%d' % (basename(location), index)
+    _split_attribution = (template_path, components, pages, locations,
+                          output_path, urls, fragment_cache, compression_level)
+    try:
+        page_numbers = range(len(pages))
+        if processes == 1 or len(pages) < 2 or not hasattr(os, 'fork'):
+            for page_number in page_numbers:
+                yield render_page(page_number)[:2]
+        else:
+            from multiprocessing import Pool
+            pool = Pool(processes)
+            try:
+                for location, seconds, hits, misses in pool.imap_unordered(
+                        render_page, page_numbers):
+                    if fragment_cache:
+                        fragment_cache.hits += hits
+                        fragment_cache.misses += misses
+                    yield location, seconds
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _split_attribution = None
+
+    start = time.time()
+    attrib_str = render_attribution_template(
+        template, [], component_url=urls.__getitem__, toc_objects=components,
+        pages=[(title, basename(location))
+               for location, (title, indexes) in zip(locations, pages)])
+    write_attribution(output_path, attrib_str, compression_level)
+    remove_stale_pages(output_path, len(pages))
+    yield output_path, time.time() - start
+
+
+def remove_stale_pages(output_path, page_count):
+    """
+    Remove the pages of a previous split of output_path numbered after
+    page_count.
+    """
+    page_number = page_count + 1
+    while exists(page_location(output_path, page_number)):
+        os.remove(page_location(output_path, page_number))
+        page_number += 1
+
+
+def print_fragment_cache_stats(fragment_cache):
+    print('Fragments: %d reused, %d rendered'
+          % (fragment_cache.hits, fragment_cache.misses))
+
+
+def print_batch_summary(results, elapsed):
+    """
+    Print the outcome of each (output, seconds, error) job result and return
+    the number of failed jobs.
+    """
+    failed = 0
+    for output_path, seconds, error in results:
+        if error:
+            failed += 1
+            print('Failed %s in %.2f s: %s' % (output_path, seconds, error))
+        else:
+            print('Rendered %s in %.2f s' % (output_path, seconds))
+    print('Rendered %d of %d attributions in %.2f s'
+          % (len(results) - failed, len(results), elapsed))
+    return failed
+
+
 def syntax():
     print("""
 Syntax:
     genattrib.py [Options] [Input] [Output] [Component List]
-    Input can be a file or directory.
+    genattrib.py [Options] --batch <manifest> [Input]
+    Input can be a file or directory, or a .jsonl inventory written by about.py
+    to render the attribution without parsing the ABOUT files again.
     Output of rendered template must be a file (e.g. .html).
     Component List must be a .csv file which has at least an "about_resource" column.
+    The output, a .jsonl input and the Component List are compressed with gzip or
+    zstd when they have an additional .gz or .zst extension.
 """)
 
 
@@ -76,6 +338,34 @@ Options:
             0 - Do not print any warning or error messages, just a total count (default)
             1 - Print error messages
             2 - Print error and warning messages
+    --profile <path>     Write a JSON report of the wall and CPU time spent in each
+                         processing phase and validator to <path>
+    --pstats <path>      Dump the cProfile statistics of the run to a .pstats file
+    --memory-report <path>
+                         Write a JSON report of the peak RSS and top allocation sites
+                         after each processing phase to <path>
+    --watch              Keep running after the first run and render the attribution
+                         again when files change, re-validating only the affected
+                         ABOUT files
+    --batch <manifest>   Parse the input once and render the attribution jobs of a
+                         CSV manifest with subset, template and output columns
+                         concurrently. An empty subset selects all the components
+                         and an empty template the default template. Each row
+                         must have a different output. Exit with status 1 if any
+                         job fails
+    --jobs <n>           Number of processes rendering the batch jobs, defaults to
+                         the number of CPUs
+    --fragment-cache <path>
+                         Cache the rendered component and license sections of the
+                         template in the <path> directory and render again only the
+                         components, licenses or template that changed
+    --page-size <n>      Split the output in an index page with the table of contents
+                         and pages of <n> components each, named after the output
+                         with a -1, -2... suffix and rendered concurrently
+    --split-by-license   Split the output in an index page and one page per license
+    --compression-level <n>
+                         Compression level of the outputs compressed with gzip or
+                         zstd, as selected by a .gz or .zst extension
 """)
 
 
@@ -98,6 +388,14 @@ under the License.""" % __version__)
 def main(args, opts):
     overwrite = False
     opt_arg_num = '0'
+    profile_path = pstats_path = memory_report_path = None
+    watch_mode = False
+    manifest_path = None
+    processes = None
+    fragment_cache_path = None
+    page_size = None
+    split_by_license = False
+    compression_level = None
     for opt, opt_arg in opts:
         invalid_opt = True
         if opt in ('-h', '--help'):
@@ -123,9 +421,73 @@ def main(args, opts):
             invalid_opt = False
             overwrite = True
 
+        if opt in ('--profile',):
+            invalid_opt = False
+            profile_path = abspath(opt_arg)
+
+        if opt in ('--pstats',):
+            invalid_opt = False
+            pstats_path = abspath(opt_arg)
+
+        if opt in ('--memory-report',):
+            invalid_opt = False
+            memory_report_path = abspath(opt_arg)
+
+        if opt in ('--watch',):
+            invalid_opt = False
+            watch_mode = True
+
+        if opt in ('--batch',):
+            invalid_opt = False
+            manifest_path = opt_arg
+
+        if opt in ('--jobs',):
+            invalid_opt = False
+            if not opt_arg.isdigit() or not int(opt_arg):
+                print('Invalid number of jobs: %s' % opt_arg)
+                option_usage()
+                sys.exit(errno.EINVAL)
+            processes = int(opt_arg)
+
+        if opt in ('--fragment-cache',):
+            invalid_opt = False
+            fragment_cache_path = abspath(opt_arg)
+
+        if opt in ('--page-size',):
+            invalid_opt = False
+            if not opt_arg.isdigit() or not int(opt_arg):
+                print('Invalid page size: %s' % opt_arg)
+                option_usage()
+                sys.exit(errno.EINVAL)
+            page_size = int(opt_arg)
+
+        if opt in ('--split-by-license',):
+            invalid_opt = False
+            split_by_license = True
+
+        if opt in ('--compression-level',):
+            invalid_opt = False
+            if not opt_arg.isdigit():
+                print('Invalid compression level: %s' % opt_arg)
+                option_usage()
+                sys.exit(errno.EINVAL)
+            compression_level = int(opt_arg)
+
         if invalid_opt:
             assert False, 'Unsupported option.'
 
+    split = page_size or split_by_license
+    if manifest_path and split:
+        print('The --batch option cannot be used to split the output.')
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    if manifest_path:
+        main_batch(args, manifest_path, overwrite, opt_arg_num, processes,
+                   watch_mode, profile_path, pstats_path, memory_report_path,
+                   fragment_cache_path, compression_level)
+        return
+
     if len(args) < 2:
         print('Input and output parameters are mandatory.')
         syntax()
@@ -156,25 +518,193 @@ def main(args, opts):
         option_usage()
         sys.exit(errno.EEXIST)
 
+    compression_error = (check_compression(output_path, compression_level)
+                         or check_compression(input_path)
+                         or (component_subset_path
+                             and check_compression(component_subset_path)))
+    if compression_error:
+        print(compression_error)
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    jsonl_input = is_jsonl_output(input_path)
+    if jsonl_input and watch_mode:
+        print('The --watch option requires ABOUT files as input.')
+        option_usage()
+        sys.exit(errno.EINVAL)
+
     if component_subset_path and not exists(component_subset_path):
         print('Component Subset path does not exist.')
         option_usage()
         sys.exit(errno.EEXIST)
 
     if not exists(output_path) or (exists(output_path) and overwrite):
-        collector = AboutCollector(input_path, output_path, opt_arg_num)
-        sublist = None if not component_subset_path else component_subset_to_sublist(component_subset_path)
-        attrib_str = collector.generate_attribution( sublist = sublist )
-        with open(output_path, "w") as f:
-            f.write(attrib_str)
+        profiler = get_profiler(profile_path, pstats_path, memory_report_path)
+        profiler.start()
+        fragment_cache = None
+        if fragment_cache_path:
+            fragment_cache = FragmentCache(fragment_cache_path)
+
+        # the outputs are not watched for changes
+        ignored = [output_path, fragment_cache_path]
+
+        def write_split(components):
+            pages = render_split(components, output_path, page_size=page_size,
+                                 by_license=split_by_license,
+                                 processes=processes,
+                                 fragment_cache=fragment_cache,
+                                 compression_level=compression_level)
+            for location, seconds in pages:
+                if location not in ignored:
+                    ignored.append(location)
+                print('Wrote %s in %.2f s' % (location, seconds))
+
+        try:
+            sublist = None if not component_subset_path else component_subset_to_sublist(component_subset_path)
+            if jsonl_input and split:
+                with profiler.phase('render'):
+                    write_split(attribution_components_from_records(
+                        read_jsonl_inventory(input_path), sublist))
+            elif jsonl_input:
+                with profiler.phase('render'):
+                    attrib_str = generate_attribution_from_records(
+                        read_jsonl_inventory(input_path), sublist=sublist,
+                        fragment_cache=fragment_cache)
+            else:
+                collector = AboutCollector(input_path, output_path, opt_arg_num,
+                                           profiler)
+                if split:
+                    with profiler.phase('render'):
+                        write_split(collector.attribution_components(sublist))
+                else:
+                    attrib_str = collector.generate_attribution(
+                        sublist=sublist, fragment_cache=fragment_cache)
+            if not split:
+                with profiler.phase('write'):
+                    write_attribution(output_path, attrib_str, compression_level)
+        finally:
+            profiler.stop()
+        if fragment_cache:
+            print_fragment_cache_stats(fragment_cache)
+
+        if watch_mode:
+            def on_change(refreshed):
+                if split:
+                    write_split(collector.attribution_components(sublist))
+                    return
+                write_attribution(output_path,
+                                  collector.generate_attribution(
+                                      sublist=sublist,
+                                      fragment_cache=fragment_cache),
+                                  compression_level)
+            print('Watching %s for changes. Press Ctrl+C to stop.' % input_path)
+            try:
+                watch(collector, on_change, ignored=ignored)
+            except KeyboardInterrupt:
+                pass
 
     else:
         # we should never reach this
         assert False, "Unsupported option(s)."
 
 
+def main_batch(args, manifest_path, overwrite, opt_arg_num, processes,
+               watch_mode, profile_path, pstats_path, memory_report_path,
+               fragment_cache_path, compression_level):
+    if len(args) != 1:
+        print('The --batch option requires only an input parameter.')
+        syntax()
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    if watch_mode:
+        print('The --watch option cannot be used with the --batch option.')
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    input_path = args[0]
+    if not exists(input_path):
+        print('Input path does not exist.')
+        option_usage()
+        sys.exit(errno.EEXIST)
+
+    if not exists(manifest_path):
+        print('Batch manifest path does not exist.')
+        option_usage()
+        sys.exit(errno.EEXIST)
+
+    compression_error = check_compression(input_path)
+    if compression_error:
+        print(compression_error)
+        option_usage()
+        sys.exit(errno.EINVAL)
+
+    jobs = read_batch_manifest(manifest_path)
+    outputs = set()
+    for subset, template_path, output_path in jobs:
+        if not output_path:
+            print('Each batch manifest row must have an output.')
+            option_usage()
+            sys.exit(errno.EINVAL)
+
+        # concurrent jobs would write the same file
+        if output_path in outputs:
+            print('Each batch manifest row must have a different output: %s'
+                  % output_path)
+            option_usage()
+            sys.exit(errno.EINVAL)
+        outputs.add(output_path)
+
+        if isdir(output_path):
+            print('Output must be a file, not a directory: %s' % output_path)
+            option_usage()
+            sys.exit(errno.EISDIR)
+
+        if exists(output_path) and not overwrite:
+            print('Output file already exists: %s. Select a different file name '
+                  'or use the --overwrite option.' % output_path)
+            option_usage()
+            sys.exit(errno.EEXIST)
+
+        if subset and not exists(subset):
+            print('Component Subset path does not exist: %s' % subset)
+            option_usage()
+            sys.exit(errno.EEXIST)
+
+        compression_error = (check_compression(output_path, compression_level)
+                             or (subset and check_compression(subset)))
+        if compression_error:
+            print(compression_error)
+            option_usage()
+            sys.exit(errno.EINVAL)
+
+    profiler = get_profiler(profile_path, pstats_path, memory_report_path)
+    profiler.start()
+    try:
+        if is_jsonl_output(input_path):
+            with profiler.phase('collect_and_parse'):
+                source = list(read_jsonl_inventory(input_path))
+        else:
+            source = AboutCollector(input_path, None, opt_arg_num, profiler)
+        fragment_cache = None
+        if fragment_cache_path:
+            fragment_cache = FragmentCache(fragment_cache_path)
+        start = time.time()
+        with profiler.phase('render'):
+            results = render_batch(source, jobs, processes, fragment_cache,
+                                   compression_level)
+    finally:
+        profiler.stop()
+    if print_batch_summary(results, time.time() - start):
+        # callers such as CI jobs detect the failed jobs from the exit status
+        sys.exit(1)
+
+
 if __name__ == "__main__":
-    longopts = ['help', 'version', 'overwrite', 'verbosity=']
+    longopts = ['help', 'version', 'overwrite', 'verbosity=', 'profile=',
+                'pstats=', 'memory-report=', 'watch', 'batch=', 'jobs=',
+                'fragment-cache=', 'page-size=', 'split-by-license',
+                'compression-level=']
     try:
         opts, args = getopt.getopt(sys.argv[1:], 'hv', longopts)
     except Exception as e:
@@ -13,6 +13,7 @@ setup(
     interesting information about third-party software components that you use
     in your project.""",
     license='Apache License 2.0',
-    py_modules=['about', 'genabout'],
+    py_modules=['about', 'genabout', 'aboutserver',
+                'aboutquery', 'aboutmerge'],
     zip_safe=False
 )
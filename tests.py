@@ -16,14 +16,39 @@
 
 from __future__ import with_statement
 
+import csv
 import os
 import shutil
 import string
 from StringIO import StringIO
+import sys
 import tempfile
 import unittest
 
 import about
+import genattrib
+
+
+class TempDirTestCase(unittest.TestCase):
+    """
+    Base class of the tests that write files in a temporary directory
+    removed after each test.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, path):
+        return os.path.join(self.tmpdir, path)
+
+    def write(self, path, content):
+        location = self.path(path)
+        if not os.path.exists(os.path.dirname(location)):
+            os.makedirs(os.path.dirname(location))
+        with open(location, 'wb') as f:
+            f.write(content)
 
 
 class BasicTest(unittest.TestCase):
@@ -220,6 +245,31 @@ version: 1.2.3
         result, warn = about.AboutFile.pre_process(about_obj, StringIO(text_input))
         self.assertEqual(expected, result.read())
 
+    def test_pre_process_well_formed_file_removes_empty_lines(self):
+        text_input = '''
+about_resource: jquery.js
+
+name: jQuery
+ continued
+version: 1.2.3'''
+        expected = '''about_resource: jquery.js
+name: jQuery
+ continued
+version: 1.2.3'''
+        self.assertTrue(about.WELL_FORMED_ABOUT.match(text_input))
+        about_obj = about.AboutFile()
+        result, warn = about.AboutFile.pre_process(about_obj, StringIO(text_input))
+        self.assertEqual([], warn)
+        self.assertEqual(expected, result.read())
+
+    def test_well_formed_check_rejects_lines_needing_diagnostics(self):
+        for text_input in ('name: jQuery\n\n continued\n',
+                           'name : jQuery\n',
+                           'na-me: jQuery\n',
+                           'name: jQuery\nversion\n',
+                           'name: jQuery\n  \n\t\n'):
+            self.assertFalse(about.WELL_FORMED_ABOUT.match(text_input), text_input)
+
     def test_handles_last_line_is_a_continuation_line(self):
         about_obj = about.AboutFile()
         warnings = []
@@ -472,5 +522,1243 @@ about_resource: about.py
         result = about_collector.generate_attribution('testdata/attrib/test.template')
         self.assertEqual(result, expected)
 
+
+class ArchiveTest(TempDirTestCase):
+    about_content = ('about_resource: jquery.js\r\n'
+                     'name: jQuery\r\n'
+                     'version: 1.7.2\r\n'
+                     'license_text_file: jquery.LICENSE\r\n'
+                     'notice_file: jquery.NOTICE\r\n')
+
+    def make_archive(self, name):
+        import tarfile
+        import zipfile
+        members = [('pkg/jquery.js.ABOUT', self.about_content),
+                   ('pkg/jquery.js', 'code'),
+                   ('pkg/jquery.LICENSE', 'MIT license text')]
+        location = os.path.join(self.tmpdir, name)
+        if name.endswith('.zip'):
+            archive = zipfile.ZipFile(location, 'w')
+            for member, content in members:
+                archive.writestr(member, content)
+        else:
+            archive = tarfile.open(location, 'w:gz')
+            for member, content in members:
+                info = tarfile.TarInfo('./' + member)
+                info.size = len(content)
+                archive.addfile(info, StringIO(content))
+        archive.close()
+        return location
+
+    def test_about_file_from_string(self):
+        content = self.about_content.replace('jquery.js', 'jquery-1.7.2.js')
+        about_file = about.AboutFile.from_string(content,
+                                                 'testdata/thirdparty/jquery.js.ABOUT')
+        self.assertEqual('jQuery', about_file.validated_fields['name'])
+        self.assertEqual('1.7.2', about_file.validated_fields['version'])
+        # the about_resource is resolved relative to the location
+        self.assertEqual([], about_file.errors)
+
+    def test_is_archive(self):
+        self.assertTrue(about.is_archive(self.make_archive('pkg.zip')))
+        self.assertTrue(about.is_archive(self.make_archive('pkg.tar.gz')))
+        self.assertFalse(about.is_archive('testdata/thirdparty/elasticsearch-0.19.8.zip'))
+        self.assertFalse(about.is_archive('testdata/thirdparty'))
+
+    def check_collect_from_archive(self, name):
+        location = self.make_archive(name)
+        collector = about.AboutCollector(location, None, '0')
+        self.assertEqual(1, len(collector.about_objects))
+        about_object = collector.about_objects[0]
+        self.assertEqual(os.path.join(location, 'pkg', 'jquery.js.ABOUT'), about_object.location)
+        self.assertEqual([], about_object.errors)
+        # the notice_file is not an archive member
+        self.assertEqual([(about.FILE, 'notice_file')],
+                         [(w.code, w.field_name) for w in about_object.warnings])
+        self.assertEqual('MIT license text', about_object.license_text())
+        row = about_object.get_about_info('pkg/jquery.js.ABOUT', about_object)
+        self.assertEqual('jquery.js', row[1])
+
+    def test_collect_from_zip(self):
+        self.check_collect_from_archive('pkg.zip')
+
+    def test_collect_from_tar(self):
+        self.check_collect_from_archive('pkg.tar.gz')
+
+    def test_archive_index_resolves_members(self):
+        location = self.make_archive('pkg.zip')
+        index = about.ArchiveIndex(location)
+        self.assertTrue(index.exists(os.path.join(location, 'pkg')))
+        self.assertTrue(index.isdir(os.path.join(location, 'pkg')))
+        self.assertFalse(index.exists(os.path.join(location, 'other')))
+        self.assertFalse(index.exists(self.tmpdir))
+        self.assertEqual(['jquery.LICENSE', 'jquery.js', 'jquery.js.ABOUT'],
+                         index.listdir(os.path.join(location, 'pkg')))
+        self.assertEqual('code', index.read(os.path.join(location, 'pkg', 'jquery.js')))
+        index.close()
+
+
+class GitChangesTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.git('init', '-q')
+        self.write('a.ABOUT', 'about_resource: a.c\nname: a\nversion: 1\n')
+        self.write('a.c', '')
+        self.write('lib/b.ABOUT', 'about_resource: .\nname: b\nversion: 1\n')
+        self.write('lib/b.c', '')
+        self.write('c.ABOUT', 'about_resource: c.c\nname: c\nversion: 1\n'
+                              'license_text_file: c.LICENSE\n')
+        self.write('c.c', '')
+        self.write('c.LICENSE', 'license')
+        self.write('d.ABOUT', 'about_resource: d.c\nname: d\nversion: 1\n')
+        self.write('d.c', '')
+        self.commit()
+
+    def git(self, *args):
+        import subprocess
+        subprocess.check_call(['git', '-c', 'user.name=test',
+                               '-c', 'user.email=test@example.com'] + list(args),
+                              cwd=self.tmpdir)
+
+    def commit(self):
+        self.git('add', '-A')
+        self.git('commit', '-q', '-m', 'commit')
+
+    def change_tree(self):
+        self.write('a.ABOUT', 'about_resource: a.c\nname: a\nversion: 2\n')
+        self.write('lib/b.c', 'changed')
+        self.write('c.LICENSE', 'changed license')
+        os.remove(os.path.join(self.tmpdir, 'd.ABOUT'))
+        self.commit()
+
+    def test_reference_index_resolves_parent_directories(self):
+        index = about.ReferenceIndex()
+        index.add('/p/lib/b.ABOUT', {'about_resource': '.', 'name': 'b'})
+        index.add('/p/c.ABOUT', {'about_resource': 'c.c', 'license_text_file': 'c.LICENSE'})
+        self.assertEqual(set(['/p/lib/b.ABOUT']), index.about_files_for(['/p/lib/x/y.c']))
+        self.assertEqual(set(['/p/c.ABOUT']), index.about_files_for(['/p/c.LICENSE']))
+        self.assertEqual(set(), index.about_files_for(['/p/d.c']))
+
+    def test_git_changed_about_files(self):
+        self.change_tree()
+        selected, removed = about.git_changed_about_files(self.tmpdir, 'HEAD~1..HEAD')
+        names = [os.path.relpath(path, self.tmpdir) for path in selected]
+        self.assertEqual(['a.ABOUT', 'c.ABOUT', os.path.join('lib', 'b.ABOUT')], names)
+        self.assertEqual([os.path.join(self.tmpdir, 'd.ABOUT')], removed)
+
+    def test_collector_with_git_revisions_merges_into_previous_csv(self):
+        import csv
+        previous = os.path.join(self.tmpdir, 'previous.csv')
+        about.AboutCollector(self.tmpdir, previous, '0').extract_about_info()
+        self.change_tree()
+        output = os.path.join(self.tmpdir, 'output.csv')
+        collector = about.AboutCollector(self.tmpdir, output, '0',
+                                         git_revisions='HEAD~1..HEAD')
+        self.assertEqual(3, len(collector.about_objects))
+        collector.extract_about_info(previous)
+        rows = dict((row['name'], row) for row in csv.DictReader(open(output, 'rb')))
+        self.assertEqual(['a', 'b', 'c'], sorted(rows))
+        self.assertEqual('2', rows['a']['version'])
+
+    def test_collector_with_git_revisions_uses_previous_csv_references(self):
+        previous = os.path.join(self.tmpdir, 'previous.csv')
+        about.AboutCollector(self.tmpdir, previous, '0').extract_about_info()
+        self.change_tree()
+        original = about.ReferenceIndex.__dict__['from_about_files']
+        def from_about_files(locations):
+            raise AssertionError('The ABOUT files should not be read.')
+        about.ReferenceIndex.from_about_files = staticmethod(from_about_files)
+        try:
+            collector = about.AboutCollector(self.tmpdir, None, '0',
+                                             git_revisions='HEAD~1..HEAD',
+                                             previous_inventory=previous)
+        finally:
+            about.ReferenceIndex.from_about_files = original
+        names = [os.path.relpath(path, self.tmpdir) for path in collector.about_files]
+        self.assertEqual(['a.ABOUT', 'c.ABOUT', os.path.join('lib', 'b.ABOUT')], names)
+
+    def test_previous_csv_of_another_input_path_reads_all_about_files(self):
+        previous = os.path.join(self.tmpdir, 'previous.csv')
+        with open(previous, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(about.CSV_COLUMNS)
+            writer.writerow(['/elsewhere/c.ABOUT'] + [''] * (len(about.CSV_COLUMNS) - 1))
+        self.change_tree()
+        output = StringIO()
+        stdout = sys.stdout
+        sys.stdout = output
+        try:
+            collector = about.AboutCollector(self.tmpdir, None, '0',
+                                             git_revisions='HEAD~1..HEAD',
+                                             previous_inventory=previous)
+        finally:
+            sys.stdout = stdout
+        self.assertTrue('no about_file of the previous inventory' in output.getvalue())
+        names = [os.path.relpath(path, self.tmpdir) for path in collector.about_files]
+        self.assertEqual(['a.ABOUT', 'c.ABOUT', os.path.join('lib', 'b.ABOUT')], names)
+
+
+class ShardTest(TempDirTestCase):
+    def read_rows(self, location):
+        with open(location, 'rb') as f:
+            return list(csv.reader(f))
+
+    def test_shards_merge_into_a_single_run_inventory(self):
+        collector = about.AboutCollector('testdata/thirdparty', None, '0')
+        expected = sorted(collector._extract_rows()[0])
+
+        shard_paths = []
+        shard_files = []
+        for index in range(3):
+            shard_path = os.path.join(self.tmpdir, 'shard%d.csv' % index)
+            collector = about.AboutCollector('testdata/thirdparty', shard_path, '0',
+                                             shard=(index, 3))
+            collector.extract_about_info()
+            shard_paths.append(shard_path)
+            shard_files.extend(collector.about_files)
+        self.assertEqual(sorted(set(shard_files)), sorted(shard_files))
+        self.assertEqual(len(expected), len(shard_files))
+
+        output = os.path.join(self.tmpdir, 'merged.csv')
+        about.merge_sorted_csv(shard_paths, output)
+        self.assertEqual([about.CSV_COLUMNS] + expected, self.read_rows(output))
+
+    def test_merged_shards_match_a_default_single_run(self):
+        default = os.path.join(self.tmpdir, 'default.csv')
+        about.AboutCollector('testdata/thirdparty', default, '0').extract_about_info()
+        single = os.path.join(self.tmpdir, 'sorted.csv')
+        about.AboutCollector('testdata/thirdparty', single, '0',
+                             sorted_output=True).extract_about_info()
+        shard_paths = []
+        for index in range(2):
+            shard_path = os.path.join(self.tmpdir, 'shard%d.csv' % index)
+            about.AboutCollector('testdata/thirdparty', shard_path, '0',
+                                 shard=(index, 2)).extract_about_info()
+            shard_paths.append(shard_path)
+        merged = os.path.join(self.tmpdir, 'merged.csv')
+        about.merge_sorted_csv(shard_paths, merged)
+
+        # a default run has the same rows in the order of the walk
+        self.assertEqual(sorted(self.read_rows(default)), sorted(self.read_rows(merged)))
+        self.assertEqual(self.read_rows(single), self.read_rows(merged))
+
+        # merging into the default run sorts it too
+        output = os.path.join(self.tmpdir, 'output.csv')
+        about.AboutCollector('testdata/thirdparty', output, '0').extract_about_info(default)
+        self.assertEqual(self.read_rows(single), self.read_rows(output))
+
+    def test_shard_assignment_is_stable(self):
+        self.assertEqual(about.shard_index('lib/a.ABOUT', 7),
+                         about.shard_index('lib/a.ABOUT', 7))
+        self.assertEqual((1, 4), about.parse_shard('2/4'))
+        for value in ['0/4', '5/4', '1', 'a/b']:
+            self.assertRaises(ValueError, about.parse_shard, value)
+
+    def test_merge_rejects_unsorted_inventories(self):
+        location = os.path.join(self.tmpdir, 'unsorted.csv')
+        with open(location, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(about.CSV_COLUMNS)
+            writer.writerow(['b.ABOUT'] + [''] * (len(about.CSV_COLUMNS) - 1))
+            writer.writerow(['a.ABOUT'] + [''] * (len(about.CSV_COLUMNS) - 1))
+        self.assertRaises(ValueError, about.merge_sorted_csv, [location],
+                          os.path.join(self.tmpdir, 'merged.csv'))
+
+
+class SortedOutputTest(TempDirTestCase):
+    def test_sorted_rows_spills_sorted_runs(self):
+        import random
+        rows = [['%04d.ABOUT' % i, 'line\nbreak', str(i)] for i in range(100)]
+        random.Random(0).shuffle(rows)
+        for buffer_size in (1, 7, 100, 1000):
+            self.assertEqual(sorted(rows), list(about.sorted_rows(iter(rows), buffer_size)))
+
+    def test_sorted_output_is_identical_across_runs(self):
+        output = os.path.join(self.tmpdir, 'output.csv')
+        collector = about.AboutCollector('testdata/thirdparty', output, '0',
+                                         sorted_output=True)
+        collector.about_objects.reverse()
+        collector.extract_about_info()
+        with open(output, 'rb') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(about.CSV_COLUMNS, rows[0])
+        self.assertEqual(sorted(collector._extract_rows()[0]), rows[1:])
+
+
+class VcsVerificationTest(TempDirTestCase):
+    def setUp(self):
+        import subprocess
+        TempDirTestCase.setUp(self)
+        self.mirror = os.path.join(self.tmpdir, 'mirrors', 'project.git')
+        os.makedirs(self.mirror)
+        self.git('init', '-q')
+        self.git('commit', '-q', '--allow-empty', '-m', 'commit')
+        self.git('tag', 'v1.0')
+        self.git('branch', 'stable')
+        self.revision = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                                cwd=self.mirror).strip()
+        os.makedirs(os.path.join(self.tmpdir, 'about'))
+
+    def git(self, *args):
+        import subprocess
+        subprocess.check_call(['git', '-c', 'user.name=test',
+                               '-c', 'user.email=test@example.com'] + list(args),
+                              cwd=self.mirror)
+
+    def write_about(self, path, fields):
+        content = 'about_resource: .\nname: %s\nversion: 1\n' % path
+        content += ''.join('%s: %s\n' % field for field in fields)
+        self.write(os.path.join('about', path + '.ABOUT'), content)
+
+    def test_find_git_mirror(self):
+        mirrors = os.path.join(self.tmpdir, 'mirrors')
+        for repository in ['https://github.com/org/project.git', 'git@github.com:org/project',
+                           'https://github.com/org/project/', self.mirror]:
+            self.assertEqual(self.mirror, about.find_git_mirror(mirrors, repository))
+        self.assertEqual(None, about.find_git_mirror(mirrors, 'https://github.com/org/other.git'))
+
+    def test_vcs_fields_are_checked_in_one_batch_per_repository(self):
+        repository = ('vcs_repository', 'https://github.com/org/project.git')
+        self.write_about('good', [repository, ('vcs_revision', self.revision[:10]),
+                            ('vcs_tag', 'v1.0'), ('vcs_branch', 'stable')])
+        self.write_about('bad', [repository, ('vcs_revision', '0' * 40),
+                           ('vcs_tag', 'v2.0'), ('vcs_branch', 'v1.0')])
+        self.write_about('other', [('vcs_repository', 'https://github.com/org/other.git'),
+                             ('vcs_tag', 'v1.0')])
+        self.write_about('svn', [('vcs_tool', 'svn'), repository, ('vcs_tag', 'v2.0')])
+
+        calls = []
+        original = about.git_existing_objects
+        def git_existing_objects(location, objects):
+            calls.append(location)
+            return original(location, objects)
+        about.git_existing_objects = git_existing_objects
+        try:
+            collector = about.AboutCollector(os.path.join(self.tmpdir, 'about'), None, '0',
+                                             vcs_mirrors=os.path.join(self.tmpdir, 'mirrors'))
+        finally:
+            about.git_existing_objects = original
+
+        self.assertEqual([self.mirror], calls)
+        about_objects = dict((o.validated_fields['name'], o) for o in collector.about_objects)
+        self.assertEqual([], about_objects['good'].errors)
+        self.assertEqual(['vcs_branch', 'vcs_revision', 'vcs_tag'],
+                         sorted(e.field_name for e in about_objects['bad'].errors))
+        self.assertEqual([about.VCS], [w.code for w in about_objects['other'].warnings
+                                       if w.field_name == 'vcs_repository'])
+        self.assertEqual([], about_objects['svn'].errors)
+
+    def test_mirrors_that_are_not_git_repositories_are_warnings(self):
+        # a mirror nested in the work tree of another repository is not
+        # resolved against this enclosing repository
+        mirrors = os.path.join(self.mirror, 'nested')
+        os.makedirs(os.path.join(mirrors, 'other'))
+        self.write_about('other', [('vcs_repository', 'https://github.com/org/other.git'),
+                             ('vcs_tag', 'v1.0')])
+        collector = about.AboutCollector(os.path.join(self.tmpdir, 'about'), None, '0',
+                                         vcs_mirrors=mirrors)
+        about_object = collector.about_objects[0]
+        self.assertEqual([], about_object.errors)
+        self.assertEqual([(about.VCS, 'vcs_repository', os.path.join(mirrors, 'other'))],
+                         [(w.code, w.field_name, w.field_value)
+                          for w in about_object.warnings if w.code == about.VCS])
+        self.assertEqual(None, about.find_git_mirror(mirrors, self.mirror))
+
+    def test_vcs_values_with_whitespace_are_errors(self):
+        self.assertEqual(set(['refs/tags/v1.0']),
+                         about.git_existing_objects(self.mirror, ['zzz\nmaster^{commit}',
+                                                                  'refs/tags/nope',
+                                                                  'refs/tags/v1.0']))
+        self.write_about('spaces', [('vcs_repository', 'https://github.com/org/project.git'),
+                              ('vcs_tag', 'v1.0'), ('vcs_branch', 'stable\n other')])
+        collector = about.AboutCollector(os.path.join(self.tmpdir, 'about'), None, '0',
+                                         vcs_mirrors=os.path.join(self.tmpdir, 'mirrors'))
+        errors = collector.about_objects[0].errors
+        self.assertEqual([(about.VCS, 'vcs_branch')], [(e.code, e.field_name) for e in errors])
+
+
+class WatchTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.write('a.ABOUT', 'about_resource: a.c\nname: a\nversion: 1\n'
+                              'license_text_file: a.LICENSE\n')
+        self.write('a.c', '')
+        self.write('b.ABOUT', 'about_resource: b.c\nname: b\nversion: 1\n')
+        self.write('b.c', '')
+
+    def test_refresh_revalidates_only_affected_about_files(self):
+        collector = about.AboutCollector(self.tmpdir, None, '0')
+        a, b = sorted(collector.about_objects, key=lambda o: o.location)
+        self.assertEqual(1, len(a.warnings))
+
+        self.write('a.LICENSE', 'license')
+        self.assertEqual(set([self.path('a.ABOUT')]),
+                         collector.refresh([self.path('a.LICENSE')]))
+        refreshed = dict((o.location, o) for o in collector.about_objects)
+        self.assertEqual([], refreshed[self.path('a.ABOUT')].warnings)
+        self.assertTrue(refreshed[self.path('b.ABOUT')] is b)
+
+    def test_refresh_handles_created_and_deleted_about_files(self):
+        collector = about.AboutCollector(self.tmpdir, None, '0')
+        os.remove(self.path('b.ABOUT'))
+        self.write('c.ABOUT', 'about_resource: a.c\nname: c\nversion: 1\n')
+        collector.refresh([self.path('b.ABOUT'), self.path('c.ABOUT')])
+        names = sorted(o.validated_fields['name'] for o in collector.about_objects)
+        self.assertEqual(['a', 'c'], names)
+
+    def test_polling_watcher_reports_changes(self):
+        watcher = about.PollingWatcher(self.tmpdir, interval=0)
+        self.assertEqual([], watcher.wait())
+        os.remove(self.path('b.c'))
+        self.write('d.c', 'new')
+        self.assertEqual(sorted([self.path('b.c'), self.path('d.c')]),
+                         sorted(watcher.wait()))
+
+    def test_watch_refreshes_and_ignores_outputs(self):
+        class FakeWatcher(object):
+            def __init__(self, changes):
+                self.changes = changes
+                self.closed = False
+            def wait(self):
+                if not self.changes:
+                    raise KeyboardInterrupt
+                return self.changes.pop(0)
+            def close(self):
+                self.closed = True
+
+        collector = about.AboutCollector(self.tmpdir, None, '0')
+        output = self.path('output.csv')
+        watcher = FakeWatcher([[output], [self.path('b.ABOUT')]])
+        calls = []
+        self.assertRaises(KeyboardInterrupt, about.watch, collector,
+                          calls.append, [output], watcher)
+        self.assertEqual([set([self.path('b.ABOUT')])], calls)
+        self.assertTrue(watcher.closed)
+
+    def test_watch_ignores_directories_and_added_outputs(self):
+        class FakeWatcher(object):
+            def __init__(self, changes):
+                self.changes = changes
+            def wait(self):
+                if not self.changes:
+                    raise KeyboardInterrupt
+                return self.changes.pop(0)
+            def close(self):
+                pass
+
+        collector = about.AboutCollector(self.tmpdir, None, '0')
+        self.write('cache-other.ABOUT', 'about_resource: a.c\nname: c\nversion: 1\n')
+        page = self.path('attribution-2.html')
+        ignored = [self.path('output.html'), self.path('cache')]
+        watcher = FakeWatcher([[self.path('cache/ab/fragment')], [self.path('b.ABOUT')],
+                               [page], [self.path('cache-other.ABOUT')]])
+        changes = []
+        refresh = collector.refresh
+        def refresh_changes(changed):
+            changes.append(changed)
+            return refresh(changed)
+        collector.refresh = refresh_changes
+        def on_change(refreshed):
+            ignored.append(page)
+        self.assertRaises(KeyboardInterrupt, about.watch, collector,
+                          on_change, ignored, watcher)
+        self.assertEqual([[self.path('b.ABOUT')], [self.path('cache-other.ABOUT')]],
+                         changes)
+
+
+class InventoryIndexTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.collector = about.AboutCollector('testdata/thirdparty', None, '0')
+        self.index = about.InventoryIndex.from_collector(self.collector)
+
+    def names(self, records):
+        return sorted(record['name'] for record in records)
+
+    def test_lookup_by_name_version_and_license(self):
+        self.assertEqual(['jQuery', 'jQuery'], self.names(self.index.lookup(name='jquery')))
+        self.assertEqual(['jQuery', 'jQuery'], self.names(self.index.lookup(name='jQuery', version='1.7.2')))
+        self.assertEqual([], self.index.lookup(name='jQuery', version='1.4.2'))
+        self.assertEqual(['OKFN Annotator', 'jQuery', 'jQuery', 'jquery.jsPlumb', 'underscore.js', 'underscore.js'],
+                         self.names(self.index.lookup(license='MIT')))
+        self.assertEqual([], self.index.lookup(name='jQuery', license='zpl-2.1'))
+
+    def test_lookup_by_path(self):
+        records = self.index.lookup(path='testdata/thirdparty/underscore-min.js')
+        self.assertEqual(['testdata/thirdparty/underscore-min.js.ABOUT'],
+                         [record['about_file'] for record in records])
+        records = self.index.lookup(path='testdata/thirdparty/jquery.js.ABOUT')
+        self.assertEqual('jQuery', records[0]['name'])
+        self.assertEqual(len(self.collector.about_objects),
+                         len(self.index.lookup(under='testdata/thirdparty/')))
+        self.assertEqual([], self.index.lookup(under='testdata/third'))
+
+    def test_update_and_remove(self):
+        self.index.remove('testdata/thirdparty/jquery.js.ABOUT')
+        self.assertEqual(1, len(self.index.lookup(name='jQuery')))
+        self.assertEqual(['testdata/thirdparty/jquery.min.js.ABOUT'],
+                         [record['about_file'] for record in
+                          self.index.lookup(path='testdata/thirdparty/jquery-1.7.2.min.js')])
+        location = [o.location for o in self.collector.about_objects
+                    if o.location.endswith('jquery.js.ABOUT')]
+        self.index.update(self.collector, location)
+        self.assertEqual(2, len(self.index.lookup(name='jQuery')))
+
+    def test_query_combines_terms(self):
+        self.assertEqual(['jQuery', 'jQuery'],
+                         self.names(self.index.query('name:jquery and dje_license:mit')))
+        self.assertEqual(['jQuery', 'jQuery', 'underscore.js', 'underscore.js'],
+                         self.names(self.index.query('name:jquery OR name:"underscore.js"')))
+        self.assertEqual(['OKFN Annotator', 'jquery.jsPlumb'],
+                         self.names(self.index.query('license:mit and not (name:jquery or name:underscore.js)')))
+        self.assertEqual(['underscore.js'],
+                         self.names(self.index.query('under:testdata/thirdparty/ and path:testdata/thirdparty/underscore-min.js')))
+
+    def test_query_rejects_invalid_expressions(self):
+        for expression in ['', 'name', 'name:jquery and', '(name:jquery', 'name:jquery)']:
+            self.assertRaises(ValueError, self.index.query, expression)
+
+    def test_saved_index_answers_the_same_queries(self):
+        location = self.path('index.json')
+        self.index.save(location)
+        loaded = about.InventoryIndex.load(location)
+        expression = 'dje_license:zpl-2.1 or name:"font-awesome"'
+        self.assertEqual(self.index.query(expression), loaded.query(expression))
+        self.assertEqual(self.names(self.index.lookup(license='MIT')),
+                         self.names(loaded.lookup(license='MIT')))
+
+    def test_saved_index_of_values_not_in_utf8(self):
+        collector = about.AboutCollector('testdata/filesfields', None, '0')
+        index = about.InventoryIndex.from_collector(collector)
+        location = self.path('index.json')
+        index.save(location)
+        loaded = about.InventoryIndex.load(location)
+        records = loaded.lookup(under='testdata/filesfields')
+        self.assertEqual(len(collector.about_objects), len(records))
+        for record in records:
+            self.assertTrue(isinstance(record['about_file'], str))
+
+    def test_server_answers_lookups(self):
+        import json
+        import threading
+        import urllib2
+        import aboutserver
+        server = aboutserver.InventoryServer(self.collector, 0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            url = 'http://127.0.0.1:%d' % server.server_address[1]
+            result = json.load(urllib2.urlopen(url + '/components?name=underscore.js&license=mit'))
+            self.assertEqual(['underscore.js', 'underscore.js'], self.names(result['components']))
+            result = json.load(urllib2.urlopen(url + '/refresh?path=underscore.js'))
+            self.assertEqual([os.path.abspath('testdata/thirdparty/underscore.js.ABOUT')],
+                             result['refreshed'])
+            result = json.load(urllib2.urlopen(url + '/query?q=name%3Ajquery+and+not+path%3Atestdata%2Fthirdparty%2Fjquery.js.ABOUT'))
+            self.assertEqual(['testdata/thirdparty/jquery.min.js.ABOUT'],
+                             [record['about_file'] for record in result['components']])
+            result = json.load(urllib2.urlopen(url + '/stats'))
+            self.assertEqual(len(self.collector.about_objects), result['components'])
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+    def test_server_answers_lookups_of_values_not_in_utf8(self):
+        import json
+        import threading
+        import urllib2
+        import aboutserver
+        collector = about.AboutCollector('testdata/filesfields', None, '0')
+        server = aboutserver.InventoryServer(collector, 0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            url = 'http://127.0.0.1:%d' % server.server_address[1]
+            result = json.load(urllib2.urlopen(url + '/components?under=testdata/filesfields'))
+            self.assertEqual(len(collector.about_objects), len(result['components']))
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+class ChecksumTest(TempDirTestCase):
+    content = 'resource content\n'
+
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.write('a.c', self.content)
+
+    def test_compute_checksums_in_one_pass(self):
+        import hashlib
+        checksums = about.compute_checksums(os.path.join(self.tmpdir, 'a.c'), chunk_size=4)
+        self.assertEqual(hashlib.sha1(self.content).hexdigest(), checksums['checksum_sha1'])
+        self.assertEqual(hashlib.md5(self.content).hexdigest(), checksums['checksum_md5'])
+        self.assertEqual(hashlib.sha256(self.content).hexdigest(), checksums['checksum_sha256'])
+
+    def test_cache_is_invalidated_by_stat_signature(self):
+        location = os.path.join(self.tmpdir, 'a.c')
+        cache = about.ChecksumCache()
+        first = cache.checksums([location, location])[location]
+        self.assertTrue(cache.checksums([location])[location] is first)
+        self.write('a.c', self.content * 2)
+        self.assertNotEqual(first, cache.checksums([location])[location])
+
+    def test_verify_checksums_of_shared_resources(self):
+        import hashlib
+        sha1 = hashlib.sha1(self.content).hexdigest()
+        md5 = hashlib.md5(self.content).hexdigest()
+        self.write('a.ABOUT', 'about_resource: a.c\nname: a\nversion: 1\n'
+                              'checksum_sha1: %s\n' % sha1.upper())
+        self.write('b.ABOUT', 'about_resource: a.c\nname: b\nversion: 1\n'
+                              'checksum_sha1: %s\nchecksum_md5: %s\n' % (sha1, sha1))
+        self.write('c.ABOUT', 'about_resource: a.c\nname: c\nversion: 1\n')
+        cache = about.ChecksumCache()
+        collector = about.AboutCollector(self.tmpdir, None, '0', checksum_cache=cache)
+        errors = dict((o.validated_fields['name'], o.errors) for o in collector.about_objects)
+        self.assertEqual([], errors['a'])
+        self.assertEqual([], errors['c'])
+        self.assertEqual([(about.CHECKSUM, 'checksum_md5', sha1)],
+                         [(e.code, e.field_name, e.field_value) for e in errors['b']])
+        self.assertTrue(md5 in errors['b'][0].message)
+        self.assertEqual([os.path.join(self.tmpdir, 'a.c')], list(cache.entries))
+
+    def test_unreadable_resources_are_reported_per_about_file(self):
+        self.write('b.c', self.content)
+        self.write('a.ABOUT', 'about_resource: a.c\nname: a\nversion: 1\n'
+                              'checksum_sha1: 0\n')
+        self.write('b.ABOUT', 'about_resource: b.c\nname: b\nversion: 1\n'
+                              'checksum_sha1: 0\n')
+        unreadable = os.path.join(self.tmpdir, 'a.c')
+        original = about.compute_checksums
+        def compute_checksums(location, *args):
+            if location == unreadable:
+                raise IOError('Permission denied')
+            return original(location, *args)
+        about.compute_checksums = compute_checksums
+        try:
+            cache = about.ChecksumCache(workers=2)
+            collector = about.AboutCollector(self.tmpdir, None, '0', checksum_cache=cache)
+        finally:
+            about.compute_checksums = original
+        errors = dict((o.validated_fields['name'], o.errors) for o in collector.about_objects)
+        self.assertEqual([(about.FILE, 'about_resource', 'a.c')],
+                         [(e.code, e.field_name, e.field_value) for e in errors['a']])
+        self.assertEqual([(about.CHECKSUM, 'checksum_sha1')],
+                         [(e.code, e.field_name) for e in errors['b']])
+        self.assertEqual([os.path.join(self.tmpdir, 'b.c')], list(cache.entries))
+
+
+class TreeChecksumTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.write('lib/a.c', 'a')
+        self.write('lib/sub/b.c', 'b')
+
+    def test_tree_checksums_are_merkle_digests(self):
+        import hashlib
+        cache = about.ChecksumCache()
+        checksums = cache.tree_checksums([self.path('lib'), self.path('lib/sub')])
+        sub = 'f %s b.c\n' % hashlib.sha1('b').hexdigest()
+        self.assertEqual(hashlib.sha1(sub).hexdigest(),
+                         checksums[self.path('lib/sub')]['checksum_sha1'])
+        lib = ('f %s a.c\n' % hashlib.sha1('a').hexdigest()
+               + 'd %s sub\n' % hashlib.sha1(sub).hexdigest())
+        self.assertEqual(hashlib.sha1(lib).hexdigest(),
+                         checksums[self.path('lib')]['checksum_sha1'])
+
+    def test_only_changed_subtrees_are_listed_again(self):
+        cache = about.ChecksumCache()
+        before = cache.tree_checksums([self.path('lib')])[self.path('lib')]
+        listing = cache.listings[self.path('lib')]
+        self.write('lib/sub/c.c', 'c')
+        os.utime(self.path('lib/sub'), (0, 0))
+        after = cache.tree_checksums([self.path('lib')])[self.path('lib')]
+        self.assertNotEqual(before, after)
+        self.assertTrue(cache.listings[self.path('lib')] is listing)
+        self.assertEqual(['b.c', 'c.c'], cache.listings[self.path('lib/sub')][2])
+
+    def test_saved_cache_of_file_names_not_in_utf8(self):
+        self.write('lib/caf\xe9.c', 'c')
+        cache = about.ChecksumCache()
+        expected = cache.tree_checksums([self.path('lib')])
+        self.assertTrue(expected[self.path('lib')])
+        cache_location = self.path('cache.json')
+        cache.save(cache_location)
+        loaded = about.ChecksumCache.load(cache_location)
+        self.assertEqual(cache.entries, loaded.entries)
+        self.assertEqual(cache.listings, loaded.listings)
+        self.assertEqual(expected, loaded.tree_checksums([self.path('lib')]))
+
+    def test_saved_cache_and_directory_resource_verification(self):
+        cache = about.ChecksumCache()
+        expected = cache.tree_checksums([self.path('lib')])[self.path('lib')]
+        cache_location = self.path('cache.json')
+        cache.save(cache_location)
+        loaded = about.ChecksumCache.load(cache_location)
+        self.assertEqual(cache.entries, loaded.entries)
+        self.assertEqual(cache.listings, loaded.listings)
+
+        self.write('lib.ABOUT', 'about_resource: lib\nname: lib\nversion: 1\n'
+                                'checksum_sha256: %s\n' % expected['checksum_sha256'])
+        self.write('sub.ABOUT', 'about_resource: lib/sub\nname: sub\nversion: 1\n'
+                                'checksum_sha256: 0\n')
+        collector = about.AboutCollector(self.path('lib.ABOUT'), None, '0',
+                                         checksum_cache=loaded)
+        self.assertEqual([], collector.about_objects[0].errors)
+        collector = about.AboutCollector(self.path('sub.ABOUT'), None, '0',
+                                         checksum_cache=loaded)
+        self.assertEqual([about.CHECKSUM],
+                         [e.code for e in collector.about_objects[0].errors])
+
+
+class JsonLinesTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.output = self.path('inventory.jsonl')
+
+    def test_write_and_read_records(self):
+        collector = about.AboutCollector('testdata/thirdparty', self.output, '0')
+        warnings_count, errors_count = collector.write_to_jsonl()
+        records = list(about.read_jsonl_inventory(self.output))
+        self.assertEqual(len(collector.about_objects), len(records))
+        self.assertEqual(sum(len(o.warnings) for o in collector.about_objects),
+                         warnings_count)
+        for about_object, record in zip(collector.about_objects, records):
+            self.assertEqual(collector.about_file_path(about_object.location),
+                             record['about_file'])
+            self.assertEqual(about_object.validated_fields, record['fields'])
+            self.assertEqual([(e.code, e.field_name, e.field_value, e.message)
+                              for e in about_object.errors],
+                             [(e['code'], e['field_name'], e['field_value'], e['message'])
+                              for e in record['errors']])
+
+    def test_write_and_read_records_not_in_utf8(self):
+        collector = about.AboutCollector('testdata/filesfields', self.output, '0')
+        collector.write_to_jsonl()
+        records = list(about.read_jsonl_inventory(self.output))
+        self.assertEqual(len(collector.about_objects), len(records))
+        not_utf8 = 0
+        for about_object, record in zip(collector.about_objects, records):
+            self.assertEqual(about_object.validated_fields, record['fields'])
+            problems = about_object.warnings + about_object.errors
+            self.assertEqual([about.problem_record(problem) for problem in problems],
+                             record['warnings'] + record['errors'])
+            for problem in problems:
+                try:
+                    (problem.field_value or '').decode('utf-8')
+                except UnicodeDecodeError:
+                    not_utf8 += 1
+        # the bytes that are not valid UTF-8 are read back unchanged
+        self.assertTrue(not_utf8)
+
+    def test_attribution_from_records(self):
+        collector = about.AboutCollector('testdata/attrib/attrib.ABOUT', self.output, '0')
+        collector.write_to_jsonl()
+        records = about.read_jsonl_inventory(self.output)
+        self.assertEqual(collector.generate_attribution('testdata/attrib/test.template'),
+                         about.generate_attribution_from_records(
+                             records, 'testdata/attrib/test.template'))
+        records = about.read_jsonl_inventory(self.output)
+        self.assertEqual('', about.generate_attribution_from_records(
+            records, 'testdata/attrib/test.template', sublist=['other.tar.gz']))
+
+
+class SqliteInventoryTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.input = self.path('input')
+        self.write('input/a.ABOUT', 'about_resource: a.c\nname: a\nversion: 1\n'
+                              'license_spdx: GPL-2.0 or MIT\n')
+        self.write('input/a.c', '')
+        self.write('input/b.ABOUT', 'about_resource: b.c\nname: B\nversion: 2\n')
+        self.output = self.path('inventory.sqlite')
+
+    def run_collector(self):
+        collector = about.AboutCollector(self.input, self.output, '0')
+        return collector.write_to_sqlite(collector._extract_rows()[0])
+
+    def test_write_and_lookup_components(self):
+        self.assertEqual(2, len(self.run_collector()))
+        inventory = about.SqliteInventory(self.output)
+        try:
+            self.assertEqual(['a'], [r['name'] for r in inventory.lookup(license='mit')])
+            self.assertEqual(['B'], [r['name'] for r in inventory.lookup(name='b', version='2')])
+            about_file = inventory.lookup(name='b')[0]['about_file']
+            self.assertEqual([about_file], [r['about_file'] for r in inventory.lookup(path=about_file)])
+            problems = inventory.problems(about_file)
+            self.assertEqual(['error'], [p['kind'] for p in problems])
+            self.assertEqual('b.c', problems[0]['field_value'])
+        finally:
+            inventory.close()
+
+    def test_incremental_runs_only_write_changed_components(self):
+        self.run_collector()
+        self.assertEqual([], self.run_collector())
+        self.write('input/b.c', '')
+        changed = self.run_collector()
+        self.assertEqual(1, len(changed))
+        self.assertTrue(changed[0].endswith('b.ABOUT'))
+        os.remove(os.path.join(self.input, 'a.ABOUT'))
+        self.assertEqual([], self.run_collector())
+        inventory = about.SqliteInventory(self.output)
+        try:
+            self.assertEqual(changed, inventory.about_files())
+            self.assertEqual([], inventory.problems(changed[0]))
+            self.assertEqual([], inventory.lookup(license='gpl-2.0'))
+        finally:
+            inventory.close()
+
+    def test_runs_on_part_of_the_input_keep_other_components(self):
+        self.run_collector()
+        self.write('input/sub/c.ABOUT', 'about_resource: .\nname: c\nversion: 1\n')
+        for input_path in (os.path.join(self.input, 'a.ABOUT'),
+                           os.path.join(self.input, 'sub')):
+            collector = about.AboutCollector(input_path, self.output, '0')
+            collector.write_to_sqlite(collector._extract_rows()[0])
+        inventory = about.SqliteInventory(self.output)
+        try:
+            self.assertEqual(['a.ABOUT', 'b.ABOUT', 'sub/c.ABOUT'],
+                             [os.path.relpath(about_file, self.input)
+                              for about_file in inventory.about_files()])
+        finally:
+            inventory.close()
+        os.remove(os.path.join(self.input, 'sub', 'c.ABOUT'))
+        self.run_collector()
+        inventory = about.SqliteInventory(self.output)
+        try:
+            self.assertEqual(2, len(inventory.about_files()))
+        finally:
+            inventory.close()
+
+
+class PipelineTest(unittest.TestCase):
+    def test_pipelined_collection_matches_sequential_collection(self):
+        for input_path in ('testdata', 'testdata/thirdparty'):
+            sequential = about.AboutCollector(input_path, None, '0')
+            pipelined = about.AboutCollector(input_path, None, '0', pipelined=True)
+            self.assertEqual(sequential.about_files, pipelined.about_files)
+            self.assertEqual(sequential._extract_rows(), pipelined._extract_rows())
+            self.assertEqual([o.unique_identifier for o in sequential.about_objects],
+                             [o.unique_identifier for o in pipelined.about_objects])
+
+    def test_pipelined_reads_keep_order_with_a_small_window(self):
+        locations = ['testdata/thirdparty/jquery.js.ABOUT', 'testdata/missing.ABOUT',
+                     'testdata/thirdparty/underscore.js.ABOUT'] * 5
+        results = list(about.pipelined_reads(iter(locations), readers=3, window=2))
+        self.assertEqual(locations, [location for location, _ in results])
+        self.assertEqual(None, results[1][1])
+        with open(locations[0], 'rb') as f:
+            self.assertEqual(f.read(), results[0][1])
+
+    def test_pipelined_reads_report_walk_failures(self):
+        def locations():
+            yield 'testdata/thirdparty/jquery.js.ABOUT'
+            raise OSError('walk failed')
+        reads = about.pipelined_reads(locations())
+        self.assertRaises(OSError, list, reads)
+
+
+class BatchAttributionTest(TempDirTestCase):
+    def test_render_batch_renders_each_job_once_parsed(self):
+        subset = os.path.join(self.tmpdir, 'subset.csv')
+        with open(subset, 'wb') as f:
+            f.write('about_resource\nother.tar.gz\n')
+        jobs = [(None, 'testdata/attrib/test.template', os.path.join(self.tmpdir, 'all.txt')),
+                (subset, 'testdata/attrib/test.template', os.path.join(self.tmpdir, 'none.txt')),
+                (None, 'testdata/attrib/missing.template', os.path.join(self.tmpdir, 'missing.txt'))]
+        manifest = os.path.join(self.tmpdir, 'manifest.csv')
+        with open(manifest, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(['subset', 'template', 'output'])
+            writer.writerows(jobs)
+        self.assertEqual(jobs, genattrib.read_batch_manifest(manifest))
+
+        collector = about.AboutCollector('testdata/attrib/attrib.ABOUT', None, '0')
+        for processes in (1, 2):
+            results = genattrib.render_batch(collector, jobs, processes)
+            self.assertEqual([job[2] for job in jobs], [r[0] for r in results])
+            self.assertEqual([None, None], [r[2] for r in results[:2]])
+            self.assertTrue(results[2][2])
+            with open(jobs[0][2]) as f:
+                self.assertEqual(collector.generate_attribution('testdata/attrib/test.template'),
+                                 f.read())
+            with open(jobs[1][2]) as f:
+                self.assertEqual('', f.read())
+            self.assertFalse(os.path.exists(jobs[2][2]))
+
+    def batch_exit_status(self, jobs):
+        manifest = os.path.join(self.tmpdir, 'manifest.csv')
+        with open(manifest, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(['subset', 'template', 'output'])
+            writer.writerows(jobs)
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            genattrib.main_batch(['testdata/attrib/attrib.ABOUT'], manifest, True, '0', 1,
+                                 False, None, None, None, None, None)
+        except SystemExit as e:
+            return e.code
+        finally:
+            sys.stdout = stdout
+
+    def test_batch_exit_status(self):
+        import errno
+        output = os.path.join(self.tmpdir, 'all.txt')
+        missing = os.path.join(self.tmpdir, 'missing.txt')
+        self.assertEqual(None, self.batch_exit_status(
+            [('', 'testdata/attrib/test.template', output)]))
+        self.assertEqual(1, self.batch_exit_status(
+            [('', 'testdata/attrib/test.template', output),
+             ('', 'testdata/attrib/missing.template', missing)]))
+        self.assertEqual(errno.EINVAL, self.batch_exit_status(
+            [('', 'testdata/attrib/test.template', output),
+             ('', '', output)]))
+
+
+class SplitAttributionTest(TempDirTestCase):
+    def test_split_pages(self):
+        components = [{'name': 'a', 'dje_license': 'mit'}, {'name': 'b'},
+                      {'name': 'c', 'dje_license': 'mit'}]
+        self.assertEqual([('a - b', [0, 1]), ('c', [2])],
+                         genattrib.split_pages(components, page_size=2))
+        self.assertEqual([('mit', [0, 2]), ('Other', [1])],
+                         genattrib.split_pages(components, by_license=True))
+        self.assertEqual([], genattrib.split_pages([], page_size=2))
+
+    def test_render_split_links_components_to_their_pages(self):
+        collector = about.AboutCollector('testdata/thirdparty', None, '0')
+        components = collector.attribution_components()
+        output = os.path.join(self.tmpdir, 'attribution.html')
+        for processes in (1, 2):
+            written = list(genattrib.render_split(components, output, page_size=5,
+                                                  processes=processes))
+            pages = [genattrib.page_location(output, number)
+                     for number in range(1, (len(components) + 4) // 5 + 1)]
+            self.assertEqual(sorted(pages), sorted(location for location, _ in written[:-1]))
+            self.assertEqual(output, written[-1][0])
+
+            with open(output) as f:
+                index = f.read()
+            self.assertFalse('oss-component' in index)
+            self.assertTrue('href="attribution-2.html#component_7"' in index)
+            with open(pages[1]) as f:
+                page = f.read()
+            self.assertEqual(5, page.count('class="oss-component"'))
+            self.assertTrue('id="component_7"' in page)
+            self.assertTrue('href="attribution.html"' in page)
+
+    def test_render_split_counts_fragments_of_all_processes(self):
+        collector = about.AboutCollector('testdata/thirdparty', None, '0')
+        components = collector.attribution_components()
+        output = os.path.join(self.tmpdir, 'attribution.html')
+        counts = []
+        for processes in (1, 2):
+            cache = about.FragmentCache(os.path.join(self.tmpdir, 'fragments%d' % processes))
+            list(genattrib.render_split(components, output, page_size=5,
+                                        processes=processes, fragment_cache=cache))
+            counts.append((cache.hits, cache.misses))
+        self.assertEqual(counts[0], counts[1])
+        self.assertTrue(counts[0][1])
+
+    def test_render_split_removes_stale_pages(self):
+        collector = about.AboutCollector('testdata/thirdparty', None, '0')
+        components = collector.attribution_components()
+        output = os.path.join(self.tmpdir, 'attribution.html')
+        list(genattrib.render_split(components, output, page_size=2, processes=1))
+        written = list(genattrib.render_split(components, output, page_size=5, processes=1))
+        pages = sorted(location for location, _ in written[:-1])
+        self.assertEqual(sorted(pages + [output]),
+                         sorted(os.path.join(self.tmpdir, name)
+                                for name in os.listdir(self.tmpdir)))
+
+
+class FragmentCacheTest(TempDirTestCase):
+    def test_fragments_are_rendered_again_only_for_changed_components(self):
+        collector = about.AboutCollector('testdata/thirdparty', None, '0')
+        expected = collector.generate_attribution()
+        # the default template only uses the license fragments of the
+        # components with a dje_license
+        licensed = [bool(about_object.validated_fields.get('dje_license'))
+                    for about_object in collector.about_objects]
+        count = len(licensed) + sum(licensed)
+
+        cache = about.FragmentCache(os.path.join(self.tmpdir, 'fragments'))
+        self.assertEqual(expected, collector.generate_attribution(fragment_cache=cache))
+        self.assertEqual((0, count), (cache.hits, cache.misses))
+
+        collector.about_objects[0].validated_fields['copyright'] = 'Copyright changed'
+        expected = collector.generate_attribution()
+        self.assertTrue('Copyright changed' in expected)
+        cache = about.FragmentCache(os.path.join(self.tmpdir, 'fragments'))
+        self.assertEqual(expected, collector.generate_attribution(fragment_cache=cache))
+        changed = 1 + licensed[0]
+        self.assertEqual((count - changed, changed), (cache.hits, cache.misses))
+
+    def test_fragments_are_rendered_again_for_changed_notice_files(self):
+        component_dir = os.path.join(self.tmpdir, 'component')
+        os.mkdir(component_dir)
+        for name, content in [('a.c', 'a'), ('NOTICE', 'First notice'),
+                              ('a.c.ABOUT', 'about_resource: a.c\nname: a\nversion: 1\n'
+                                            'notice_file: NOTICE\n')]:
+            with open(os.path.join(component_dir, name), 'wb') as f:
+                f.write(content)
+        cache_location = os.path.join(self.tmpdir, 'fragments')
+        collector = about.AboutCollector(component_dir, None, '0')
+        cache = about.FragmentCache(cache_location)
+        self.assertTrue('First notice' in collector.generate_attribution(fragment_cache=cache))
+
+        with open(os.path.join(component_dir, 'NOTICE'), 'wb') as f:
+            f.write('Second notice')
+        collector = about.AboutCollector(component_dir, None, '0')
+        cache = about.FragmentCache(cache_location)
+        attribution = collector.generate_attribution(fragment_cache=cache)
+        self.assertTrue('Second notice' in attribution)
+        self.assertEqual(1, cache.misses)
+
+    def test_templates_without_macros_are_rendered_without_fragments(self):
+        cache = about.FragmentCache(os.path.join(self.tmpdir, 'fragments'))
+        collector = about.AboutCollector('testdata/attrib/attrib.ABOUT', None, '0')
+        self.assertEqual(collector.generate_attribution('testdata/attrib/test.template'),
+                         collector.generate_attribution('testdata/attrib/test.template',
+                                                        fragment_cache=cache))
+        self.assertEqual([], os.listdir(cache.location))
+
+
+class ComponentProxyTest(unittest.TestCase):
+    def test_files_are_read_once_and_only_when_used(self):
+        reads = []
+        def reader(location):
+            reads.append(location)
+            if location == 'missing':
+                raise IOError(location)
+            return 'content of %s' % location
+        file_cache = about.FileContentCache(size=2)
+        first = about.ComponentProxy({'name': 'first'},
+                                     {'license_text_file': 'mit.LICENSE',
+                                      'notice_file': 'missing'},
+                                     file_cache, reader)
+        second = about.ComponentProxy({'name': 'second'},
+                                      {'license_text_file': 'mit.LICENSE',
+                                       'changelog_file': 'CHANGELOG'},
+                                      file_cache, reader)
+        self.assertEqual('first', first['name'])
+        self.assertEqual([], reads)
+        self.assertEqual('content of mit.LICENSE', first.license_text)
+        self.assertEqual('content of mit.LICENSE', second.license_text)
+        self.assertEqual('', first.notice_text)
+        self.assertEqual('', second.notice_text)
+        self.assertEqual(['mit.LICENSE', 'missing'], reads)
+        # the least recently used content is evicted
+        self.assertEqual('content of CHANGELOG', second.file_content('changelog_file'))
+        first.notice_text
+        self.assertEqual(['mit.LICENSE', 'missing', 'CHANGELOG'], reads)
+        first.license_text
+        self.assertEqual(['mit.LICENSE', 'missing', 'CHANGELOG', 'mit.LICENSE'], reads)
+
+    def test_lazy_list_computes_values_when_accessed(self):
+        calls = []
+        def double(value):
+            calls.append(value)
+            return value * 2
+        values = about.LazyList([1, 2, 3], double)
+        self.assertEqual(3, len(values))
+        self.assertEqual([], calls)
+        self.assertEqual(6, values[-1])
+        self.assertEqual([2, 4], values[:2])
+        self.assertEqual([2, 4, 6], list(values))
+        self.assertEqual([3, 1, 2], calls)
+
+
+class CompressionTest(TempDirTestCase):
+    def test_compression_extensions(self):
+        self.assertEqual('.gz', about.compression_extension('inventory.csv.GZ'))
+        self.assertEqual(None, about.compression_extension('inventory.csv'))
+        self.assertTrue(about.is_csv_output('inventory.csv.gz'))
+        self.assertTrue(about.is_jsonl_output('inventory.jsonl.zst'))
+        self.assertFalse(about.is_csv_output('inventory.sqlite.gz'))
+        self.assertEqual('attribution-2.html.gz',
+                         genattrib.page_location('attribution.html.gz', 2))
+
+    def test_subset_csv_with_cr_line_endings(self):
+        import gzip
+        content = 'about_file,about_resource\r/jquery.js.ABOUT,jquery.js\r'
+        plain = os.path.join(self.tmpdir, 'subset.csv')
+        with open(plain, 'wb') as f:
+            f.write(content)
+        self.assertEqual(['jquery.js'], genattrib.component_subset_to_sublist(plain))
+        compressed = os.path.join(self.tmpdir, 'subset.csv.gz')
+        with gzip.GzipFile(compressed, 'wb') as f:
+            f.write(content.replace('\r', '\n'))
+        self.assertEqual(['jquery.js'], genattrib.component_subset_to_sublist(compressed))
+
+    def test_check_compression_levels(self):
+        self.assertEqual(None, about.check_compression('inventory.csv', 42))
+        self.assertEqual(None, about.check_compression('inventory.csv.gz', 9))
+        self.assertTrue(about.check_compression('inventory.csv.gz', 10))
+
+    def test_csv_and_jsonl_outputs_are_compressed(self):
+        plain = os.path.join(self.tmpdir, 'inventory.csv')
+        compressed = os.path.join(self.tmpdir, 'inventory.csv.gz')
+        about.AboutCollector('testdata/thirdparty', plain, '0').extract_about_info()
+        about.AboutCollector('testdata/thirdparty', compressed, '0',
+                             compression_level=1).extract_about_info()
+        with open(plain, 'rb') as f:
+            expected = f.read()
+        with open(compressed, 'rb') as f:
+            self.assertEqual('\x1f\x8b', f.read(2))
+        with about.open_compressed(compressed) as f:
+            self.assertEqual(expected, f.read())
+
+        jsonl = os.path.join(self.tmpdir, 'inventory.jsonl.gz')
+        collector = about.AboutCollector('testdata/thirdparty', jsonl, '0')
+        collector.extract_about_info()
+        self.assertEqual(len(collector.about_objects),
+                         len(list(about.read_jsonl_inventory(jsonl))))
+
+    def test_zstd_round_trip(self):
+        try:
+            import zstandard
+        except ImportError:
+            return
+        plain = os.path.join(self.tmpdir, 'inventory.csv')
+        compressed = os.path.join(self.tmpdir, 'inventory.csv.zst')
+        about.AboutCollector('testdata/thirdparty', plain, '0').extract_about_info()
+        about.AboutCollector('testdata/thirdparty', compressed, '0',
+                             compression_level=19).extract_about_info()
+        with open(plain, 'rb') as f:
+            expected = f.read()
+        with about.open_compressed(compressed) as f:
+            self.assertEqual(expected, f.read())
+        with about.open_compressed(compressed) as f:
+            self.assertEqual(expected.splitlines(True), list(f))
+
+        attribution = os.path.join(self.tmpdir, 'attribution.html.zst')
+        genattrib.write_attribution(attribution, u'caf\xe9 attribution', 3)
+        with about.open_compressed(attribution) as f:
+            self.assertEqual('caf\xc3\xa9 attribution', f.read())
+            self.assertFalse(f.raw_file.closed)
+        self.assertTrue(f.raw_file.closed)
+
+    def test_merge_sorted_csv_streams_compressed_inventories(self):
+        shards = []
+        for index in range(2):
+            shard = os.path.join(self.tmpdir, 'shard%d.csv.gz' % index)
+            about.AboutCollector('testdata/thirdparty', shard, '0',
+                                 shard=(index, 2)).extract_about_info()
+            shards.append(shard)
+        merged = os.path.join(self.tmpdir, 'merged.csv.gz')
+        about.merge_sorted_csv(shards, merged)
+        expected = os.path.join(self.tmpdir, 'sorted.csv')
+        about.AboutCollector('testdata/thirdparty', expected, '0',
+                             sorted_output=True).extract_about_info()
+        with about.open_compressed(merged) as f:
+            with open(expected, 'rb') as e:
+                self.assertEqual(e.read(), f.read())
+
+
+class ProblemTest(unittest.TestCase):
+    def test_problems_share_interned_names_and_templates(self):
+        field_name = ''.join(['scm_', 'tool'])
+        template = ''.join(['Should be ', "'%s'."])
+        first = about.Warn(about.SPDX, field_name, 'mit', template, 'MIT')
+        second = about.Warn(about.SPDX, 'scm_tool', 'mit', "Should be '%s'.", 'MIT')
+        self.assertTrue(first.field_name is second.field_name)
+        self.assertTrue(first.template is second.template)
+        self.assertEqual("Should be 'MIT'.", first.message)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, about.Error(about.SPDX, 'scm_tool', 'mit', "Should be '%s'.", 'MIT'))
+        self.assertEqual("Field: scm_tool, Value: mit, Message: Should be 'MIT'.", repr(first))
+        self.assertEqual('100% done', about.Warn(about.VALUE, None, None, '100% done').message)
+
+    def test_summarize_problems_by_code_and_field(self):
+        collector = about.AboutCollector('testdata/thirdparty', None, '0')
+        summary = about.summarize_problems(collector.about_objects)
+        self.assertEqual((10, 'warning', about.IGNORED, 'scm_repository'), summary[0])
+        self.assertEqual(sum(len(o.warnings) + len(o.errors) for o in collector.about_objects),
+                         sum(item[0] for item in summary))
+
+
+class StartupTest(unittest.TestCase):
+    def test_cli_modules_do_not_import_lazy_modules(self):
+        import benchmarks
+        for module in benchmarks.CLI_MODULES:
+            _elapsed, loaded = benchmarks.import_module(module)
+            self.assertEqual([], loaded)
+
+    def test_spdx_license_ids_are_built_on_first_use(self):
+        license_ids = about.get_spdx_license_ids()
+        self.assertTrue(license_ids is about.get_spdx_license_ids())
+        self.assertEqual('Apache-2.0', license_ids['apache-2.0'])
+        self.assertEqual(len(about.SPDX_LICENSES), len(license_ids))
+
+
+class ProfilerTest(TempDirTestCase):
+    def test_null_profiler_does_not_wrap_validators(self):
+        original = about.AboutFile.__dict__['validate_spdx_license']
+        profiler = about.get_profiler()
+        profiler.start()
+        with profiler.phase('parse'):
+            about.AboutFile('testdata/spdx_licenses/incorrect_spdx.about')
+        profiler.stop()
+        self.assertTrue(profiler is about.NO_PROFILER)
+        self.assertTrue(about.AboutFile.__dict__['validate_spdx_license'] is original)
+        self.assertEqual({}, profiler.report())
+
+    def test_profiler_records_phases_and_validators(self):
+        original = about.AboutFile.__dict__['validate_spdx_license']
+        profiler = about.PhaseProfiler()
+        profiler.start()
+        try:
+            collector = about.AboutCollector('testdata/spdx_licenses', None, '0', profiler)
+        finally:
+            profiler.stop()
+        self.assertTrue(about.AboutFile.__dict__['validate_spdx_license'] is original)
+        report = profiler.report()
+        self.assertEqual(1, report['phases']['collect']['calls'])
+        self.assertEqual(1, report['phases']['parse']['calls'])
+        self.assertEqual(len(collector.about_objects),
+                         report['validators']['validate_about_resource_exist']['calls'])
+        self.assertTrue(report['validators']['validate_spdx_license']['calls'] > 0)
+
+    def test_profiler_writes_json_report_and_pstats(self):
+        import json
+        import pstats
+        report_path = self.path('profile.json')
+        pstats_path = self.path('profile.pstats')
+        output = self.path('output.csv')
+        about.main(['testdata/basic', output],
+                   [('--profile', report_path), ('--pstats', pstats_path)])
+        report = json.load(open(report_path))
+        for phase in ('collect', 'parse', 'extract', 'write_csv'):
+            self.assertTrue(phase in report['phases'])
+        self.assertTrue('wall' in report['total'])
+        self.assertTrue(pstats.Stats(pstats_path).total_calls > 0)
+
+    def test_memory_profiler_snapshots_each_phase(self):
+        profiler = about.MemoryProfiler(limit=3)
+        profiler.start()
+        try:
+            collector = about.AboutCollector('testdata/basic', None, '0', profiler)
+        finally:
+            profiler.stop()
+        phases = [snapshot['phase'] for snapshot in profiler.report()['phases']]
+        self.assertEqual(['collect', 'parse'], phases)
+        for snapshot in profiler.snapshots:
+            self.assertTrue(snapshot.get('top_allocations') or snapshot.get('top_types'))
+            self.assertTrue(len(snapshot.get('top_allocations') or snapshot.get('top_types')) <= 3)
+
+    def test_memory_report_and_profile_can_be_combined(self):
+        import json
+        report_path = self.path('profile.json')
+        memory_path = self.path('memory.json')
+        output = self.path('output.csv')
+        about.main(['testdata/basic', output],
+                   [('--profile', report_path), ('--memory-report', memory_path)])
+        phases = [snapshot['phase'] for snapshot in json.load(open(memory_path))['phases']]
+        self.assertEqual(['collect', 'parse', 'extract', 'write_csv'], phases)
+        self.assertTrue('write_csv' in json.load(open(report_path))['phases'])
+
 if __name__ == "__main__":
     unittest.main()